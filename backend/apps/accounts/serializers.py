@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
+from core.images import ResponsiveImageField
 from .models import User, UserSkill, UserEducation, UserExperience
 
 
@@ -69,12 +70,13 @@ class UserProfileSerializer(serializers.ModelSerializer):
     skills = UserSkillSerializer(many=True, read_only=True)
     education = UserEducationSerializer(many=True, read_only=True)
     experience = UserExperienceSerializer(many=True, read_only=True)
+    profile_picture_srcset = ResponsiveImageField(source='profile_picture')
     
     class Meta:
         model = User
         fields = (
             'id', 'email', 'username', 'first_name', 'last_name', 'user_type',
-            'phone_number', 'date_of_birth', 'profile_picture', 'bio', 'location',
+            'phone_number', 'date_of_birth', 'profile_picture', 'profile_picture_srcset', 'bio', 'location',
             'university', 'field_of_study', 'graduation_year', 'linkedin_profile',
             'github_profile', 'portfolio_website', 'profile_public',
             'email_notifications', 'push_notifications', 'email_verified',
@@ -84,7 +86,12 @@ class UserProfileSerializer(serializers.ModelSerializer):
 
 
 class UserSerializer(serializers.ModelSerializer):
+    profile_picture_srcset = ResponsiveImageField(source='profile_picture')
+
     class Meta:
         model = User
-        fields = ('id', 'email', 'username', 'first_name', 'last_name', 'user_type', 'profile_picture', 'bio', 'location')
+        fields = (
+            'id', 'email', 'username', 'first_name', 'last_name', 'user_type', 'profile_picture',
+            'profile_picture_srcset', 'bio', 'location'
+        )
         read_only_fields = ('id', 'email')
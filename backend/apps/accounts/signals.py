@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+# Sent by LoginView after a successful API login, with ``request`` and ``user``.
+# Unlike django.contrib.auth's user_logged_in it has no built-in receivers
+# (such as the last_login update), so only the project's own handlers run.
+user_signed_in = Signal()
@@ -1,3 +1,28 @@
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
 
-# Create your tests here.
+from apps.gamification.models import UserProfile
+
+from .models import User
+
+
+class LoginViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='learner', email='learner@example.com', password='password', first_name='Ada', last_name='L'
+        )
+
+    def test_login_records_the_streak_without_touching_last_login(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('accounts:login'), {'email': 'learner@example.com', 'password': 'password'}
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('access', response.json())
+        self.user.refresh_from_db()
+        self.assertIsNone(self.user.last_login)
+        profile = UserProfile.objects.get(user=self.user)
+        self.assertEqual((profile.current_login_streak, profile.last_login_date), (1, timezone.now().date()))
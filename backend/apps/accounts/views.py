@@ -9,6 +9,7 @@ from .serializers import (
     UserRegistrationSerializer, UserLoginSerializer, UserProfileSerializer,
     UserSerializer, UserSkillSerializer, UserEducationSerializer, UserExperienceSerializer
 )
+from .signals import user_signed_in
 
 
 class RegisterView(generics.CreateAPIView):
@@ -57,6 +58,7 @@ class LoginView(generics.GenericAPIView):
         
         # Generate JWT tokens
         refresh = RefreshToken.for_user(user)
+        user_signed_in.send(sender=user.__class__, request=request, user=user)
         
         # Check if onboarding is needed
         needs_onboarding = False
@@ -1,3 +1,96 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.db import DatabaseError
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+
+from apps.opportunities.models import Opportunity, OpportunityCategory, OpportunityView
+from apps.resources.models import Resource, ResourceCategory, ResourceView
+
+from .view_tracking import TrackedView, ViewTracker
+
+User = get_user_model()
+
+
+def view_request(ip_address, user_agent='browser'):
+    request = RequestFactory().get('/', REMOTE_ADDR=ip_address, HTTP_USER_AGENT=user_agent)
+    request.user = AnonymousUser()
+    return request
+
+
+@mock.patch('apps.analytics.view_tracking.FLUSH_INTERVAL', 0)
+class ViewTrackerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user('author', 'author@example.com', 'password')
+        category = ResourceCategory.objects.create(name='Careers', slug='careers')
+        cls.resources = [
+            Resource.objects.create(
+                title=f'Guide {i}', slug=f'guide-{i}', description='...', resource_type='guide',
+                category=category, author=author,
+            )
+            for i in range(2)
+        ]
+        cls.opportunity = Opportunity.objects.create(
+            title='Internship', description='Description', short_description='Short',
+            category=OpportunityCategory.objects.create(name='Internships'), organization='Org',
+            application_deadline=timezone.now(), created_by=author,
+        )
+
+    def setUp(self):
+        self.tracker = ViewTracker()
+        self.on_flush = mock.Mock()
+        self.resource_views = TrackedView(ResourceView, 'resource', 'view_count', on_flush=self.on_flush)
+        self.opportunity_views = TrackedView(OpportunityView, 'opportunity', 'views_count', unique=True)
+
+    def view_count(self, resource):
+        return Resource.objects.values_list('view_count', flat=True).get(pk=resource.pk)
+
+    def test_repeat_views_inside_the_window_are_recorded_once(self):
+        first, second = self.resources
+        self.tracker.record(self.resource_views, first.pk, view_request('10.0.0.1'))
+        self.tracker.record(self.resource_views, first.pk, view_request('10.0.0.1'))
+        self.tracker.record(self.resource_views, first.pk, view_request('10.0.0.2'))
+        self.tracker.record(self.resource_views, second.pk, view_request('10.0.0.1'))
+
+        self.assertEqual(self.tracker.flush(), 3)
+        self.assertEqual(ResourceView.objects.count(), 3)
+        self.assertEqual((self.view_count(first), self.view_count(second)), (2, 1))
+        self.on_flush.assert_called_once_with({first.pk: 2, second.pk: 1}, timezone.localdate())
+        self.assertEqual(self.tracker.flush(), 0)
+
+    def test_unique_views_skip_viewers_that_already_have_a_row(self):
+        OpportunityView.objects.create(opportunity=self.opportunity, ip_address='10.0.0.1')
+        self.tracker.record(self.opportunity_views, self.opportunity.pk, view_request('10.0.0.1'))
+        self.tracker.record(self.opportunity_views, self.opportunity.pk, view_request('10.0.0.2'))
+
+        self.assertEqual(self.tracker.flush(), 1)
+        self.assertEqual(OpportunityView.objects.filter(opportunity=self.opportunity).count(), 2)
+        self.opportunity.refresh_from_db()
+        self.assertEqual(self.opportunity.views_count, 1)
+
+        # Another process that never saw these viewers doesn't count them again
+        other_tracker = ViewTracker()
+        other_tracker.record(self.opportunity_views, self.opportunity.pk, view_request('10.0.0.2'))
+        self.assertEqual(other_tracker.flush(), 0)
+
+    def test_failed_batch_is_retried_row_by_row(self):
+        bulk_create = ResourceView.objects.bulk_create
+
+        def failing_bulk_create(rows, **kwargs):
+            if len(rows) > 1 or rows[0].user_agent == 'bad':
+                raise DatabaseError('insert failed')
+            return bulk_create(rows, **kwargs)
+
+        first, second = self.resources
+        self.tracker.record(self.resource_views, first.pk, view_request('10.0.0.1'))
+        self.tracker.record(self.resource_views, first.pk, view_request('10.0.0.2', user_agent='bad'))
+        self.tracker.record(self.resource_views, second.pk, view_request('10.0.0.3'))
+
+        with mock.patch.object(ResourceView.objects, 'bulk_create', side_effect=failing_bulk_create):
+            self.assertEqual(self.tracker.flush(), 2)
+        self.assertEqual(ResourceView.objects.count(), 2)
+        self.assertEqual((self.view_count(first), self.view_count(second)), (1, 1))
+        self.on_flush.assert_called_once_with({first.pk: 1, second.pk: 1}, timezone.localdate())
@@ -0,0 +1,277 @@
+"""
+Buffered view tracking shared by discussions, opportunities and resources.
+
+Read endpoints call ``view_tracker.record(...)``, which only appends to an
+in-process buffer (after dropping repeat views inside the dedup window), so
+serving a page never writes to the database. A background thread flushes the
+buffer every ``VIEW_TRACKING_FLUSH_INTERVAL`` seconds (or as soon as the buffer
+fills up): view rows are written with ``bulk_create`` and the denormalized
+counters are bumped with one aggregated ``F()`` update per distinct increment,
+counting only the rows actually stored. If the batch insert fails, rows are
+retried one at a time so a single bad row doesn't cost the whole batch.
+
+Views recorded since the last flush are lost if the process dies; counters
+are analytics, not accounting, so that trade-off is deliberate.
+"""
+import atexit
+import ipaddress
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Seconds between background flushes; 0 disables the flusher thread
+FLUSH_INTERVAL = getattr(settings, 'VIEW_TRACKING_FLUSH_INTERVAL', 10)
+
+# A buffer this large is flushed right away instead of waiting for the timer
+MAX_BUFFERED_EVENTS = getattr(settings, 'VIEW_TRACKING_MAX_BUFFER', 5000)
+
+# Repeat views of the same object by the same viewer inside this many seconds
+# are not recorded again
+DEDUP_WINDOW = getattr(settings, 'VIEW_TRACKING_DEDUP_WINDOW', 30 * 60)
+
+# Bound on remembered (object, viewer) pairs used for dedup
+MAX_SEEN_VIEWERS = 100000
+
+
+def valid_ip(value):
+    """``value`` normalized if it is an IPv4/IPv6 address, else None"""
+    try:
+        return str(ipaddress.ip_address((value or '').strip()))
+    except ValueError:
+        return None
+
+
+def get_client_ip(request, forwarded=True):
+    """
+    Client IP address: the first ``X-Forwarded-For`` entry when ``forwarded``
+    and it is a valid address, else ``REMOTE_ADDR``. None if neither is valid.
+    """
+    if forwarded:
+        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+        ip_address = valid_ip(x_forwarded_for.split(',')[0]) if x_forwarded_for else None
+        if ip_address:
+            return ip_address
+    return valid_ip(request.META.get('REMOTE_ADDR'))
+
+
+class TrackedView:
+    """
+    Describes how views of one kind of object are stored.
+
+    ``event_model`` gets one row per recorded view, pointing at the viewed
+    object through ``target_field``. ``counter_field`` on the viewed model is
+    incremented for every stored row. With ``unique=True`` the event model
+    enforces one row per (object, user, ip), and views that already have a
+    row are neither stored nor counted again. ``forwarded`` takes the client
+    IP from ``X-Forwarded-For`` when present; otherwise ``REMOTE_ADDR`` is used.
+    """
+
+    def __init__(self, event_model, target_field, counter_field, unique=False, forwarded=True, on_flush=None):
+        self.event_model = event_model
+        self.target_field = target_field
+        self.counter_field = counter_field
+        self.unique = unique
+        self.forwarded = forwarded
+        # Called with ({target_id: new views}, day viewed) for each day in a
+        # flush, inside the flush transaction, for subscribers such as rollups
+        # and rankings
+        self.on_flush = on_flush
+
+    @property
+    def target_model(self):
+        return self.event_model._meta.get_field(self.target_field).related_model
+
+    @property
+    def ip_required(self):
+        return not self.event_model._meta.get_field('ip_address').null
+
+    def __str__(self):
+        return self.event_model._meta.label
+
+
+class ViewTracker:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buffer = defaultdict(list)
+        self.buffered = 0
+        self.seen = {}
+        self.flusher = None
+        self.wake = threading.Event()
+        self.overflow_flush = None
+
+    def record(self, tracked_view, target_id, request):
+        """Buffer a view of ``target_id`` by the requesting user; never touches the database"""
+        user = request.user if request.user.is_authenticated else None
+        ip_address = get_client_ip(request, tracked_view.forwarded)
+        if ip_address is None and tracked_view.ip_required:
+            return
+        now = time.monotonic()
+        viewer_key = (tracked_view, target_id, user.pk if user else None, ip_address)
+
+        with self.lock:
+            last_seen = self.seen.get(viewer_key)
+            if last_seen is not None and now - last_seen < DEDUP_WINDOW:
+                return
+            self._remember(viewer_key, now)
+
+            self.buffer[tracked_view].append({
+                'target_id': target_id,
+                'user_id': user.pk if user else None,
+                'ip_address': ip_address,
+                'user_agent': request.META.get('HTTP_USER_AGENT', ''),
+                'day': timezone.localdate(),
+            })
+            self.buffered += 1
+            flush_now = self.buffered >= MAX_BUFFERED_EVENTS
+
+        self._ensure_flusher()
+        if flush_now:
+            self._request_flush()
+
+    def _remember(self, viewer_key, now):
+        if len(self.seen) >= MAX_SEEN_VIEWERS:
+            cutoff = now - DEDUP_WINDOW
+            self.seen = {key: seen_at for key, seen_at in self.seen.items() if seen_at >= cutoff}
+            if len(self.seen) >= MAX_SEEN_VIEWERS:
+                self.seen = {}
+        self.seen[viewer_key] = now
+
+    def flush(self):
+        """Write all buffered views; returns the number of stored view rows"""
+        with self.lock:
+            pending, self.buffer = self.buffer, defaultdict(list)
+            self.buffered = 0
+
+        stored = 0
+        for tracked_view, events in pending.items():
+            try:
+                stored += self._flush_events(tracked_view, events)
+            except Exception as e:
+                logger.error(f"Error flushing {len(events)} views for {tracked_view}: {str(e)}")
+        return stored
+
+    def _flush_events(self, tracked_view, events):
+        target_column = f'{tracked_view.target_field}_id'
+
+        with transaction.atomic():
+            if tracked_view.unique:
+                # Concurrent flushes of the same objects wait here, so the
+                # existing-row check below sees everything they stored
+                list(
+                    tracked_view.target_model.objects.select_for_update()
+                    .filter(pk__in={event['target_id'] for event in events})
+                    .order_by('pk').values_list('pk', flat=True)
+                )
+                existing = set(
+                    tracked_view.event_model.objects.filter(**{
+                        f'{target_column}__in': {event['target_id'] for event in events},
+                        'ip_address__in': {event['ip_address'] for event in events},
+                    }).values_list(target_column, 'user_id', 'ip_address')
+                )
+                unique_events = []
+                for event in events:
+                    key = (event['target_id'], event['user_id'], event['ip_address'])
+                    if key not in existing:
+                        existing.add(key)
+                        unique_events.append(event)
+                events = unique_events
+
+            events = self._insert(tracked_view, target_column, events)
+
+            views = Counter(event['target_id'] for event in events)
+            apply_counter_increments(tracked_view.target_model, tracked_view.counter_field, views)
+            if tracked_view.on_flush is not None:
+                by_day = defaultdict(Counter)
+                for event in events:
+                    by_day[event['day']][event['target_id']] += 1
+                for day, day_views in sorted(by_day.items()):
+                    tracked_view.on_flush(day_views, day)
+
+        return len(events)
+
+    def _insert(self, tracked_view, target_column, events):
+        """Store view rows; returns the events whose rows were stored"""
+        def rows(events):
+            return [
+                tracked_view.event_model(**{
+                    target_column: event['target_id'],
+                    'user_id': event['user_id'],
+                    'ip_address': event['ip_address'],
+                    'user_agent': event['user_agent'],
+                })
+                for event in events
+            ]
+
+        try:
+            with transaction.atomic():
+                tracked_view.event_model.objects.bulk_create(rows(events), ignore_conflicts=tracked_view.unique)
+            return events
+        except DatabaseError as e:
+            logger.warning(f"Batch insert of {len(events)} views for {tracked_view} failed, retrying one by one: {str(e)}")
+
+        stored = []
+        for event in events:
+            try:
+                with transaction.atomic():
+                    tracked_view.event_model.objects.bulk_create(rows([event]), ignore_conflicts=tracked_view.unique)
+            except DatabaseError as e:
+                logger.error(f"Dropping view of {tracked_view} {event['target_id']}: {str(e)}")
+            else:
+                stored.append(event)
+        return stored
+
+    def _request_flush(self):
+        """Flush soon without waiting for the timer; at most one extra flush runs at a time"""
+        if self.flusher is not None:
+            self.wake.set()
+            return
+        with self.lock:
+            if self.overflow_flush is not None and self.overflow_flush.is_alive():
+                return
+            self.overflow_flush = threading.Thread(target=self._flush_in_thread, daemon=True)
+            self.overflow_flush.start()
+
+    def _flush_in_thread(self):
+        try:
+            self.flush()
+        finally:
+            connection.close()
+
+    def _ensure_flusher(self):
+        if self.flusher is not None or not FLUSH_INTERVAL:
+            return
+        with self.lock:
+            if self.flusher is None:
+                self.flusher = threading.Thread(target=self._run_flusher, name='view-tracker', daemon=True)
+                self.flusher.start()
+
+    def _run_flusher(self):
+        while True:
+            self.wake.wait(FLUSH_INTERVAL)
+            self.wake.clear()
+            self._flush_in_thread()
+
+
+def apply_counter_increments(model, field, increments):
+    """
+    Add ``increments`` ({pk: amount}) to ``field`` with one UPDATE per
+    distinct amount rather than one per row.
+    """
+    by_amount = defaultdict(list)
+    for pk, amount in increments.items():
+        if amount:
+            by_amount[amount].append(pk)
+    for amount, pks in by_amount.items():
+        model.objects.filter(pk__in=pks).update(**{field: F(field) + amount})
+
+
+view_tracker = ViewTracker()
+atexit.register(view_tracker.flush)
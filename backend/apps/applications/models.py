@@ -49,6 +49,17 @@ class Application(models.Model):
     def __str__(self):
         return f"{self.user.full_name} → {self.opportunity.title}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered so post_save receivers can tell a status change from a re-save
+        instance._saved_status = instance.__dict__.get('status')
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._saved_status = self.status
+
 
 class ApplicationDocument(models.Model):
     """
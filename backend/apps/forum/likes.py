@@ -0,0 +1,88 @@
+"""
+Like toggling and "liked by me" lookups for discussions and replies.
+
+A toggle is a DELETE of the user's like followed, if nothing was deleted, by
+an ``INSERT ... ON CONFLICT DO NOTHING`` on the (user, target) unique
+constraint. The affected row count of whichever statement ran tells whether
+a like was actually removed or added, and the target's ``likes_count`` is
+moved by exactly that much with an ``F()`` update in the same transaction.
+Concurrent toggles of the same like block on its row or index entry and see
+a count of zero, so double taps neither raise a duplicate-key error nor move
+the counter twice. ``sync_likes_count`` recounts from the likes table; it is
+only used to repair counters (``manage.py sync_forum_likes``).
+"""
+from django.db import connection, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core.loaders import ViewerLoader
+
+from .models import Discussion, DiscussionLike
+
+
+def like_field(target):
+    return 'discussion' if isinstance(target, Discussion) else 'reply'
+
+
+def toggle_like(user, target):
+    """Like ``target`` if the user hasn't yet, otherwise unlike it; returns whether it is now liked"""
+    field = like_field(target)
+    with transaction.atomic():
+        if DiscussionLike.objects.filter(user=user, **{field: target}).delete()[0]:
+            adjust_likes_count(target, -1)
+            return False
+        if insert_like(user, field, target):
+            adjust_likes_count(target, 1)
+    return True
+
+
+def remove_like(user, target):
+    """Unlike ``target``; returns whether there was a like to remove"""
+    field = like_field(target)
+    with transaction.atomic():
+        removed = DiscussionLike.objects.filter(user=user, **{field: target}).delete()[0] > 0
+        if removed:
+            adjust_likes_count(target, -1)
+    return removed
+
+
+def insert_like(user, field, target):
+    """Store a like unless the user already has one; returns whether a row was inserted"""
+    quote = connection.ops.quote_name
+    meta = DiscussionLike._meta
+    columns = ', '.join(quote(meta.get_field(name).column) for name in ('user', field, 'created_at'))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(meta.db_table)} ({columns}) VALUES (%s, %s, %s) ON CONFLICT DO NOTHING',
+            [user.pk, target.pk, timezone.now()],
+        )
+        return cursor.rowcount > 0
+
+
+def adjust_likes_count(target, delta):
+    type(target).objects.filter(pk=target.pk).update(likes_count=F('likes_count') + delta)
+
+
+def sync_likes_count(model, pks=None):
+    """Recount ``likes_count`` of ``model`` rows (all, or just ``pks``) from the likes table; returns rows updated"""
+    field = 'discussion' if model is Discussion else 'reply'
+    likes = (
+        DiscussionLike.objects
+        .filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    rows = model.objects.all() if pks is None else model.objects.filter(pk__in=pks)
+    return rows.update(likes_count=Coalesce(Subquery(likes), 0))
+
+
+def liked_by_user_loader(field):
+    """Serializer loader for whether the viewer liked each discussion or reply (``field``)"""
+    def fetch(user, ids):
+        liked = DiscussionLike.objects.filter(user=user, **{f'{field}_id__in': ids})
+        return dict.fromkeys(liked.values_list(f'{field}_id', flat=True), True)
+
+    return ViewerLoader(fetch, default=False)
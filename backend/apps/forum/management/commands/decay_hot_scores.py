@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.forum.ranking import decay_hot_scores
+
+
+class Command(BaseCommand):
+    help = 'Re-apply time decay to discussion hot scores (run periodically, e.g. every 15 minutes from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Discussions rescored per query')
+
+    def handle(self, *args, **options):
+        rescored = decay_hot_scores(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rescored {rescored} discussions'))
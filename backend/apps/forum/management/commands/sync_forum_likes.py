@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from apps.forum.likes import sync_likes_count
+from apps.forum.models import Discussion, Reply
+
+
+class Command(BaseCommand):
+    help = 'Recount likes_count of every discussion and reply from the likes table (repairs drifted counters)'
+
+    def handle(self, *args, **options):
+        discussions = sync_likes_count(Discussion)
+        replies = sync_likes_count(Reply)
+        self.stdout.write(self.style.SUCCESS(f'Recounted likes of {discussions} discussions and {replies} replies'))
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:01
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_reply_paths(apps, schema_editor):
+    """Backfill materialized paths and depths for existing replies"""
+    Reply = apps.get_model('forum', 'Reply')
+
+    parents = dict(Reply.objects.values_list('id', 'parent_id'))
+    paths = {}
+
+    def resolve(reply_id):
+        # Walk up iteratively; threads can be deeper than the recursion limit
+        chain = []
+        while reply_id is not None and reply_id not in paths:
+            chain.append(reply_id)
+            reply_id = parents.get(reply_id)
+        prefix, depth = paths.get(reply_id, ('', -1))
+        for ancestor_id in reversed(chain):
+            prefix, depth = prefix + f'{ancestor_id:010d}', depth + 1
+            paths[ancestor_id] = (prefix, depth)
+
+    for reply_id in parents:
+        resolve(reply_id)
+
+    replies = []
+    for reply_id, (path, depth) in paths.items():
+        replies.append(Reply(id=reply_id, path=path, depth=depth))
+        if len(replies) >= 1000:
+            Reply.objects.bulk_update(replies, ['path', 'depth'])
+            replies = []
+    if replies:
+        Reply.objects.bulk_update(replies, ['path', 'depth'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forum', '0002_discussion_slug_forumcategory_slug'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reply',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='reply',
+            name='path',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='reply',
+            index=models.Index(fields=['discussion', 'path'], name='forum_repli_discuss_747010_idx'),
+        ),
+        migrations.RunPython(populate_reply_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:06
+
+import math
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def hot_score(likes_count, replies_count, views_count, created_at, now):
+    """The hot ranking formula as of this migration (see apps/forum/ranking.py)"""
+    age_hours = max((now - created_at).total_seconds() / 3600, 0)
+    points = 1 + 2.0 * likes_count + 3.0 * replies_count + math.log2(1 + views_count)
+    return points / (age_hours + 2) ** getattr(settings, 'FORUM_HOT_GRAVITY', 1.5)
+
+
+def populate_hot_scores(apps, schema_editor):
+    """Score existing discussions so the hot feed isn't empty until the first sweep"""
+    Discussion = apps.get_model('forum', 'Discussion')
+    now = timezone.now()
+    discussions = []
+    for discussion in Discussion.objects.only(
+        'id', 'likes_count', 'replies_count', 'views_count', 'created_at'
+    ).iterator():
+        discussion.hot_score = hot_score(
+            discussion.likes_count, discussion.replies_count, discussion.views_count, discussion.created_at, now
+        )
+        discussions.append(discussion)
+        if len(discussions) >= 1000:
+            Discussion.objects.bulk_update(discussions, ['hot_score'])
+            discussions = []
+    if discussions:
+        Discussion.objects.bulk_update(discussions, ['hot_score'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forum', '0003_reply_materialized_path'),
+        ('taggit', '0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discussion',
+            name='hot_score',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='discussion',
+            index=models.Index(fields=['-hot_score'], name='forum_discu_hot_sco_1c231e_idx'),
+        ),
+        migrations.RunPython(populate_hot_scores, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,21 @@
-from django.db import models
+import re
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Max, Q, Value
+from django.db.models.functions import Concat, Substr
 from django.conf import settings
 from django.utils import timezone
+from django.utils.crypto import get_random_string
 from django.utils.text import slugify
 from taggit.managers import TaggableManager
 
+from .ranking import hot_score
+from .threads import MAX_REPLY_DEPTH, allocate_id, path_segment, subtree_upper_bound
+
+# Tries before giving up when concurrent posts race for the same slug
+SLUG_SAVE_ATTEMPTS = 3
+
 
 class ForumCategory(models.Model):
     """
@@ -60,6 +72,8 @@ class Discussion(models.Model):
     views_count = models.PositiveIntegerField(default=0)
     likes_count = models.PositiveIntegerField(default=0)
     replies_count = models.PositiveIntegerField(default=0)
+    # Precomputed "hot" rank, see ranking.py
+    hot_score = models.FloatField(default=0, editable=False)
     
     # Status
     is_pinned = models.BooleanField(default=False)
@@ -81,18 +95,43 @@ class Discussion(models.Model):
             models.Index(fields=['category', 'is_pinned']),
             models.Index(fields=['last_activity']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['-hot_score']),
         ]
     
     def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(self.title)
-            slug = base_slug
-            counter = 1
-            while Discussion.objects.filter(slug=slug).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
+        if self._state.adding:
+            self.hot_score = hot_score(self.likes_count, self.replies_count, self.views_count, timezone.now())
+        if self.slug:
+            return super().save(*args, **kwargs)
+        
+        base_slug = slugify(self.title)[:200] or 'discussion'
+        self.slug = Discussion.next_available_slug(base_slug)
+        for attempt in range(SLUG_SAVE_ATTEMPTS):
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                # Only a concurrent post taking the same slug is retried; a
+                # random suffix can't collide with the numbered ones
+                if attempt == SLUG_SAVE_ATTEMPTS - 1 or not Discussion.objects.filter(slug=self.slug).exists():
+                    raise
+                self.slug = f"{base_slug}-{get_random_string(6, 'abcdefghijklmnopqrstuvwxyz0123456789')}"
+    
+    @classmethod
+    def next_available_slug(cls, base_slug):
+        """First free slug after the highest of base_slug, base_slug-1, base_slug-2, ... in one query"""
+        # A prefix match can use the slug index; other slugs sharing the
+        # prefix (base_slug-for-students) are skipped here
+        taken = cls.objects.filter(Q(slug=base_slug) | Q(slug__startswith=f'{base_slug}-')).values_list('slug', flat=True)
+        numbered = re.compile(rf'{re.escape(base_slug)}(?:-([0-9]+))?')
+        numbers = []
+        for slug in taken.iterator():
+            match = numbered.fullmatch(slug)
+            if match:
+                numbers.append(int(match.group(1) or 0))
+        if not numbers:
+            return base_slug
+        return f"{base_slug}-{max(numbers) + 1}"
     
     def __str__(self):
         return self.title
@@ -115,12 +154,73 @@ class Reply(models.Model):
     is_solution = models.BooleanField(default=False)  # For marking best answer
     is_edited = models.BooleanField(default=False)
     
+    # Materialized path: zero-padded ids from the top-level reply down to this one
+    path = models.CharField(max_length=255, blank=True, editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'forum_replies'
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['discussion', 'path']),
+        ]
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered so save() can tell when a reply is moved to another parent
+        instance._saved_parent_id = instance.__dict__.get('parent_id')
+        return instance
+    
+    def set_path(self):
+        parent_path = self.parent.path if self.parent_id else ''
+        self.path = parent_path + path_segment(self.pk)
+        self.depth = self.parent.depth + 1 if self.parent_id else 0
+    
+    def save(self, *args, **kwargs):
+        if self._state.adding and not self.path:
+            # The path ends with our own id; where the database can hand one
+            # out up front the row goes in with its path in a single INSERT
+            if self.pk is None:
+                self.pk = allocate_id(Reply)
+                if self.pk is not None:
+                    kwargs['force_insert'] = True
+            if self.pk is not None:
+                self.set_path()
+        elif not self._state.adding and self.parent_id != getattr(self, '_saved_parent_id', self.parent_id):
+            return self.move(*args, **kwargs)
+        
+        super().save(*args, **kwargs)
+        self._saved_parent_id = self.parent_id
+        if not self.path:
+            self.set_path()
+            Reply.objects.filter(pk=self.pk).update(path=self.path, depth=self.depth)
+    
+    def move(self, *args, **kwargs):
+        """Save a reply that changed parent, moving its subtree's paths along with it"""
+        old_path, old_depth = self.path, self.depth
+        subtree = Reply.objects.filter(
+            discussion_id=self.discussion_id, path__gte=old_path, path__lt=subtree_upper_bound(old_path)
+        )
+        if self.parent_id and self.parent.path.startswith(old_path):
+            raise ValidationError('A reply cannot be moved under one of its own replies.')
+        self.set_path()
+        deepest = subtree.aggregate(deepest=Max('depth'))['deepest'] or old_depth
+        if deepest - old_depth + self.depth >= MAX_REPLY_DEPTH:
+            raise ValidationError('This thread is nested too deeply to move the reply there.')
+        
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'path', 'depth'}
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            subtree.exclude(pk=self.pk).update(
+                path=Concat(Value(self.path), Substr('path', len(old_path) + 1)),
+                depth=F('depth') + (self.depth - old_depth),
+            )
+        self._saved_parent_id = self.parent_id
     
     def __str__(self):
         return f"Reply to {self.discussion.title} by {self.author.email}"
@@ -0,0 +1,82 @@
+"""
+"Hot" ranking for discussions.
+
+A discussion's score is its engagement divided by a power of its age, so
+activity lifts it and time pulls it back down. The score is stored in the
+indexed ``Discussion.hot_score`` column: it is refreshed for a discussion
+whenever its likes, replies or views change, and a periodic sweep
+(``manage.py decay_hot_scores``) applies the time decay to the rest, so the
+hot feed is an index scan on ``-hot_score``.
+"""
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+LIKE_WEIGHT = 2.0
+REPLY_WEIGHT = 3.0
+# Views are plentiful and cheap, so they count logarithmically
+VIEW_WEIGHT = 1.0
+
+# Higher gravity makes scores fall off faster with age
+GRAVITY = getattr(settings, 'FORUM_HOT_GRAVITY', 1.5)
+
+# Age in hours added before decaying, so brand new posts don't divide by ~0
+AGE_OFFSET_HOURS = 2
+
+# The sweep only rescores discussions younger than this; older ones have
+# decayed to (practically) nothing and are zeroed once
+DECAY_HORIZON_DAYS = getattr(settings, 'FORUM_HOT_DECAY_HORIZON_DAYS', 30)
+
+SCORE_FIELDS = ('likes_count', 'replies_count', 'views_count', 'created_at')
+
+
+def hot_score(likes_count, replies_count, views_count, created_at, now=None):
+    now = now or timezone.now()
+    age_hours = max((now - created_at).total_seconds() / 3600, 0)
+    points = (
+        1
+        + LIKE_WEIGHT * likes_count
+        + REPLY_WEIGHT * replies_count
+        + VIEW_WEIGHT * math.log2(1 + views_count)
+    )
+    return points / (age_hours + AGE_OFFSET_HOURS) ** GRAVITY
+
+
+def refresh_hot_scores(discussion_ids, now=None):
+    """Recompute and store the score of the given discussions with one read and one bulk update"""
+    from .models import Discussion
+
+    now = now or timezone.now()
+    discussions = list(Discussion.objects.filter(id__in=discussion_ids).only('id', *SCORE_FIELDS))
+    for discussion in discussions:
+        discussion.hot_score = hot_score(
+            discussion.likes_count,
+            discussion.replies_count,
+            discussion.views_count,
+            discussion.created_at,
+            now,
+        )
+    Discussion.objects.bulk_update(discussions, ['hot_score'])
+    return len(discussions)
+
+
+def decay_hot_scores(batch_size=1000, now=None):
+    """Re-apply time decay to every recent discussion; returns the number rescored"""
+    from .models import Discussion
+
+    now = now or timezone.now()
+    horizon = now - timedelta(days=DECAY_HORIZON_DAYS)
+
+    Discussion.objects.filter(created_at__lt=horizon, hot_score__gt=0).update(hot_score=0)
+
+    ids = Discussion.objects.filter(created_at__gte=horizon).values_list('id', flat=True).order_by('id')
+    rescored = 0
+    last_id = 0
+    while True:
+        batch = list(ids.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            return rescored
+        rescored += refresh_hot_scores(batch, now)
+        last_id = batch[-1]
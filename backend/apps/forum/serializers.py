@@ -1,9 +1,14 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError as DjangoValidationError
 from .models import (
     ForumCategory, Discussion, Reply, DiscussionLike, 
     UserForumProfile
 )
+from core.images import ResponsiveImageField
+from core.loaders import ViewerBatchListSerializer
+from .likes import liked_by_user_loader
+from .threads import MAX_REPLY_DEPTH, build_reply_tree, load_subtrees, thread_queryset, walk_thread
 
 User = get_user_model()
 
@@ -33,10 +38,14 @@ class UserForumSerializer(serializers.ModelSerializer):
     """Serializer for user info in forum context"""
     full_name = serializers.CharField(source='get_full_name', read_only=True)
     forum_profile = serializers.SerializerMethodField()
+    profile_picture_srcset = ResponsiveImageField(source='profile_picture')
     
     class Meta:
         model = User
-        fields = ['id', 'email', 'first_name', 'last_name', 'full_name', 'profile_picture', 'forum_profile']
+        fields = [
+            'id', 'email', 'first_name', 'last_name', 'full_name', 'profile_picture', 'profile_picture_srcset',
+            'forum_profile'
+        ]
     
     def get_forum_profile(self, obj):
         try:
@@ -58,6 +67,13 @@ class UserForumSerializer(serializers.ModelSerializer):
             }
 
 
+class ReplyListSerializer(ViewerBatchListSerializer):
+    """Batches viewer lookups for nested replies too, since they are rendered by the same serializer"""
+    
+    def batch_items(self, items):
+        return list(walk_thread(items))
+
+
 class ReplySerializer(serializers.ModelSerializer):
     """Serializer for forum replies"""
     author = UserForumSerializer(read_only=True)
@@ -66,6 +82,8 @@ class ReplySerializer(serializers.ModelSerializer):
     can_edit = serializers.SerializerMethodField()
     can_delete = serializers.SerializerMethodField()
     
+    liked_loader = liked_by_user_loader('reply')
+    
     class Meta:
         model = Reply
         fields = [
@@ -74,17 +92,25 @@ class ReplySerializer(serializers.ModelSerializer):
             'child_replies', 'is_liked_by_user', 'can_edit', 'can_delete'
         ]
         read_only_fields = ['likes_count', 'is_edited', 'created_at', 'updated_at']
+        list_serializer_class = ReplyListSerializer
+    
+    def update(self, instance, validated_data):
+        try:
+            return super().update(instance, validated_data)
+        except DjangoValidationError as e:
+            # Moving a reply under its own subtree or too deep
+            raise serializers.ValidationError({'parent': e.messages})
     
     def get_child_replies(self, obj):
-        if obj.child_replies.exists():
-            return ReplySerializer(obj.child_replies.all(), many=True, context=self.context).data
-        return []
+        children = getattr(obj, 'thread_children', None)
+        if children is None:
+            # Not loaded as part of a thread: fetch the whole subtree at once
+            subtree = load_subtrees([obj])
+            children = subtree[0].thread_children if subtree else []
+        return ReplySerializer(children, many=True, context=self.context).data
     
     def get_is_liked_by_user(self, obj):
-        user = self.context['request'].user
-        if user.is_authenticated:
-            return obj.likes.filter(user=user).exists()
-        return False
+        return self.liked_loader.load(self, obj)
     
     def get_can_edit(self, obj):
         user = self.context['request'].user
@@ -107,6 +133,8 @@ class DiscussionListSerializer(serializers.ModelSerializer):
     is_liked_by_user = serializers.SerializerMethodField()
     tag_list = serializers.StringRelatedField(source='tags', many=True, read_only=True)
     
+    liked_loader = liked_by_user_loader('discussion')
+    
     class Meta:
         model = Discussion
         fields = [
@@ -116,6 +144,7 @@ class DiscussionListSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at', 'last_activity',
             'latest_reply', 'is_liked_by_user', 'tag_list'
         ]
+        list_serializer_class = ViewerBatchListSerializer
     
     def get_latest_reply(self, obj):
         latest_reply = obj.replies.last()
@@ -127,23 +156,22 @@ class DiscussionListSerializer(serializers.ModelSerializer):
         return None
     
     def get_is_liked_by_user(self, obj):
-        user = self.context['request'].user
-        if user.is_authenticated:
-            return obj.likes.filter(user=user).exists()
-        return False
+        return self.liked_loader.load(self, obj)
 
 
 class DiscussionDetailSerializer(serializers.ModelSerializer):
     """Serializer for discussion detail view with replies"""
     author = UserForumSerializer(read_only=True)
     category = ForumCategorySerializer(read_only=True)
-    replies = ReplySerializer(many=True, read_only=True)
+    replies = serializers.SerializerMethodField()
     is_liked_by_user = serializers.SerializerMethodField()
     can_edit = serializers.SerializerMethodField()
     can_delete = serializers.SerializerMethodField()
     can_moderate = serializers.SerializerMethodField()
     tag_list = serializers.StringRelatedField(source='tags', many=True, read_only=True)
     
+    liked_loader = liked_by_user_loader('discussion')
+    
     class Meta:
         model = Discussion
         fields = [
@@ -156,11 +184,16 @@ class DiscussionDetailSerializer(serializers.ModelSerializer):
             'tag_list'
         ]
     
+    def get_replies(self, obj):
+        # Load the whole thread in one query and nest it in memory; the list
+        # itself stays in posting order
+        replies = list(thread_queryset(obj.id))
+        build_reply_tree(replies)
+        replies.sort(key=lambda reply: (reply.created_at, reply.id))
+        return ReplySerializer(replies, many=True, context=self.context).data
+    
     def get_is_liked_by_user(self, obj):
-        user = self.context['request'].user
-        if user.is_authenticated:
-            return obj.likes.filter(user=user).exists()
-        return False
+        return self.liked_loader.load(self, obj)
     
     def get_can_edit(self, obj):
         user = self.context['request'].user
@@ -217,3 +250,8 @@ class ReplyCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Reply
         fields = ['content', 'parent']
+    
+    def validate_parent(self, value):
+        if value is not None and value.depth + 1 >= MAX_REPLY_DEPTH:
+            raise serializers.ValidationError('This thread is nested too deeply to reply to.')
+        return value
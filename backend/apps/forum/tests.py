@@ -1,3 +1,171 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError
+from django.core.management import call_command
 from django.test import TestCase
 
-# Create your tests here.
+from .likes import remove_like, toggle_like
+from .models import Discussion, DiscussionLike, ForumCategory, Reply
+from .threads import attach_thread_children, build_reply_tree, path_segment
+
+
+class DiscussionSlugTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = get_user_model().objects.create_user(
+            username='author', email='author@example.com', password='password'
+        )
+        cls.category = ForumCategory.objects.create(name='Careers')
+
+    def create_discussion(self, title='Internship advice', **kwargs):
+        return Discussion.objects.create(
+            title=title, content='...', author=self.author, category=self.category, **kwargs
+        )
+
+    def test_numbers_repeated_titles(self):
+        slugs = [self.create_discussion().slug for _ in range(3)]
+        self.assertEqual(slugs, ['internship-advice', 'internship-advice-1', 'internship-advice-2'])
+
+    def test_query_count_stays_constant_after_many_same_title_posts(self):
+        Discussion.objects.bulk_create([
+            Discussion(
+                title='Internship advice',
+                slug='internship-advice' if number == 0 else f'internship-advice-{number}',
+                content='...',
+                author=self.author,
+                category=self.category,
+            )
+            for number in range(1000)
+        ])
+
+        # Slug lookup, savepoint, insert, release
+        with self.assertNumQueries(4):
+            discussion = self.create_discussion()
+        self.assertEqual(discussion.slug, 'internship-advice-1000')
+
+    def test_retries_with_random_suffix_when_slug_is_taken_concurrently(self):
+        self.create_discussion()
+
+        # Simulate another request winning the race for the computed slug
+        with mock.patch.object(Discussion, 'next_available_slug', return_value='internship-advice'):
+            discussion = self.create_discussion()
+
+        self.assertRegex(discussion.slug, r'^internship-advice-[a-z0-9]{6}$')
+
+    def test_other_slugs_sharing_the_prefix_are_ignored(self):
+        self.create_discussion()
+        self.create_discussion(title='Internship advice for students')
+        self.create_discussion(slug='internship-advice-2024-edition')
+        self.assertEqual(self.create_discussion().slug, 'internship-advice-1')
+
+    def test_other_integrity_errors_are_not_retried(self):
+        discussion = Discussion(title='Internship advice', content=None, author=self.author, category=self.category)
+        with mock.patch('apps.forum.models.get_random_string') as random_suffix:
+            with self.assertRaises(IntegrityError):
+                discussion.save()
+        random_suffix.assert_not_called()
+
+    def test_untitled_slug_falls_back(self):
+        self.assertEqual(self.create_discussion(title='???').slug, 'discussion')
+
+
+class ReplyThreadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = get_user_model().objects.create_user(
+            username='author', email='author@example.com', password='password'
+        )
+        category = ForumCategory.objects.create(name='Careers')
+        cls.discussion = Discussion.objects.create(
+            title='Internship advice', content='...', author=cls.author, category=category
+        )
+
+    def reply(self, parent=None):
+        return Reply.objects.create(discussion=self.discussion, author=self.author, content='...', parent=parent)
+
+    def test_moving_a_reply_moves_its_subtree(self):
+        first, second = self.reply(), self.reply()
+        child = self.reply(parent=first)
+        grandchild = self.reply(parent=child)
+
+        child = Reply.objects.get(pk=child.pk)
+        child.parent = second
+        child.save()
+
+        grandchild.refresh_from_db()
+        self.assertEqual(child.path, second.path + path_segment(child.pk))
+        self.assertEqual(grandchild.path, child.path + path_segment(grandchild.pk))
+        self.assertEqual((child.depth, grandchild.depth), (1, 2))
+
+        child.parent = None
+        child.save()
+        grandchild.refresh_from_db()
+        self.assertEqual((child.path, grandchild.path), (path_segment(child.pk), child.path + path_segment(grandchild.pk)))
+        self.assertEqual(grandchild.depth, 1)
+
+    def test_reply_cannot_move_under_its_own_subtree(self):
+        parent = self.reply()
+        child = self.reply(parent=parent)
+        parent = Reply.objects.get(pk=parent.pk)
+        parent.parent = child
+        with self.assertRaises(ValidationError):
+            parent.save()
+
+    def test_children_are_loaded_for_the_page_only(self):
+        first, second = self.reply(), self.reply()
+        first_child = self.reply(parent=first)
+        self.reply(parent=second)
+
+        with mock.patch('apps.forum.threads.build_reply_tree', wraps=build_reply_tree) as build:
+            with self.assertNumQueries(1):
+                attach_thread_children([first])
+        self.assertEqual(first.thread_children, [first_child])
+        self.assertEqual([reply.pk for reply in build.call_args.args[0]], [first.pk, first_child.pk])
+
+
+class LikeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.author = User.objects.create_user(username='author', email='author@example.com', password='password')
+        cls.fan = User.objects.create_user(username='fan', email='fan@example.com', password='password')
+        cls.discussion = Discussion.objects.create(
+            title='Internship advice', content='...', author=cls.author,
+            category=ForumCategory.objects.create(name='Careers'),
+        )
+        cls.reply = Reply.objects.create(discussion=cls.discussion, author=cls.author, content='...')
+
+    def likes_count(self, target):
+        return type(target).objects.values_list('likes_count', flat=True).get(pk=target.pk)
+
+    def test_toggling_moves_the_counter_by_one(self):
+        self.assertTrue(toggle_like(self.fan, self.discussion))
+        self.assertTrue(toggle_like(self.author, self.discussion))
+        self.assertEqual(self.likes_count(self.discussion), 2)
+
+        self.assertFalse(toggle_like(self.fan, self.discussion))
+        self.assertEqual(self.likes_count(self.discussion), 1)
+        self.assertTrue(remove_like(self.author, self.discussion))
+        self.assertFalse(remove_like(self.author, self.discussion))
+        self.assertEqual(self.likes_count(self.discussion), 0)
+
+    def test_like_that_already_exists_is_not_counted_again(self):
+        # Another request stored the like between our delete and insert
+        DiscussionLike.objects.create(user=self.fan, reply=self.reply)
+        with mock.patch('apps.forum.likes.DiscussionLike.objects.filter') as filter_likes:
+            filter_likes.return_value.delete.return_value = (0, {})
+            self.assertTrue(toggle_like(self.fan, self.reply))
+        self.assertEqual(DiscussionLike.objects.filter(reply=self.reply).count(), 1)
+        self.assertEqual(self.likes_count(self.reply), 0)
+
+    def test_sync_command_repairs_counters(self):
+        toggle_like(self.fan, self.discussion)
+        toggle_like(self.fan, self.reply)
+        Discussion.objects.update(likes_count=7)
+        Reply.objects.update(likes_count=0)
+
+        call_command('sync_forum_likes', stdout=StringIO())
+        self.assertEqual((self.likes_count(self.discussion), self.likes_count(self.reply)), (1, 1))
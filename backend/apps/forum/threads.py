@@ -0,0 +1,123 @@
+"""
+Materialized-path helpers for reply threads.
+
+Every reply stores ``path``: the zero-padded ids of its ancestors followed by
+its own id, so ordering a discussion's replies by path yields the thread
+depth-first, and any subtree is a contiguous path range. A whole thread, or
+a window of top-level replies with all their descendants, loads in one
+indexed query and is assembled into a tree in memory.
+"""
+from django.db import connection
+from django.db.models import Q
+
+PATH_SEGMENT_WIDTH = 10
+
+# Bounded by Reply.path max_length
+MAX_REPLY_DEPTH = 255 // PATH_SEGMENT_WIDTH
+
+
+def path_segment(pk):
+    return f'{pk:0{PATH_SEGMENT_WIDTH}d}'
+
+
+def allocate_id(model):
+    """
+    Take the next id from ``model``'s sequence on PostgreSQL, so a row whose
+    path includes its own id can be inserted in one statement. None elsewhere.
+    """
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT nextval(pg_get_serial_sequence(%s, %s))", [model._meta.db_table, model._meta.pk.column]
+        )
+        return cursor.fetchone()[0]
+
+
+def subtree_upper_bound(path):
+    """Smallest string greater than every path that starts with ``path``"""
+    return path[:-1] + chr(ord(path[-1]) + 1)
+
+
+def build_reply_tree(replies):
+    """
+    Attach ``thread_children`` to each reply and return the roots.
+
+    ``replies`` must be ordered by path, so parents come before children.
+    Replies whose parent is not in the list are treated as roots.
+    """
+    by_id = {}
+    roots = []
+    for reply in replies:
+        reply.thread_children = []
+        by_id[reply.id] = reply
+        parent = by_id.get(reply.parent_id)
+        if parent is None:
+            roots.append(reply)
+        else:
+            parent.thread_children.append(reply)
+    return roots
+
+
+def thread_queryset(discussion_id):
+    from .models import Reply
+
+    return (
+        Reply.objects
+        .filter(discussion_id=discussion_id)
+        .select_related('author', 'author__forum_profile')
+        .order_by('path')
+    )
+
+
+def attach_thread_children(replies):
+    """
+    Give already-loaded replies of one discussion their ``thread_children``,
+    loading just their subtrees in one query.
+    """
+    replies = list(replies)
+    subtrees = Q()
+    covered = None
+    for path in sorted(reply.path for reply in replies if reply.path):
+        # A reply under one already covered is loaded with it
+        if covered is not None and path.startswith(covered):
+            continue
+        covered = path
+        subtrees |= Q(path__gte=path, path__lt=subtree_upper_bound(path))
+    if covered is None:
+        for reply in replies:
+            reply.thread_children = []
+        return
+    thread = list(thread_queryset(replies[0].discussion_id).filter(subtrees))
+    build_reply_tree(thread)
+    children = {reply.id: reply.thread_children for reply in thread}
+    for reply in replies:
+        reply.thread_children = children.get(reply.id, [])
+
+
+def load_subtrees(roots):
+    """
+    Load ``roots`` (replies of one discussion, ordered by path) together with
+    all their descendants in a single range query, and return them as trees.
+    """
+    roots = list(roots)
+    if not roots:
+        return []
+    replies = thread_queryset(roots[0].discussion_id).filter(
+        path__gte=roots[0].path,
+        path__lt=subtree_upper_bound(roots[-1].path),
+    )
+    root_ids = {root.id for root in roots}
+    # The range can also cover deeper replies of siblings between the roots;
+    # keep only what hangs under one of the requested roots
+    trees = [reply for reply in build_reply_tree(replies) if reply.id in root_ids]
+    return trees
+
+
+def walk_thread(replies):
+    """Yield ``replies`` and every descendant already attached as ``thread_children``"""
+    stack = list(replies)
+    while stack:
+        reply = stack.pop()
+        yield reply
+        stack.extend(getattr(reply, 'thread_children', ()))
@@ -13,7 +13,7 @@ from django.utils import timezone
 from datetime import timedelta
 
 from .models import (
-    ForumCategory, Discussion, Reply, DiscussionLike, 
+    ForumCategory, Discussion, Reply, 
     DiscussionView, UserForumProfile
 )
 from .serializers import (
@@ -21,11 +21,20 @@ from .serializers import (
     DiscussionListSerializer, DiscussionDetailSerializer, 
     DiscussionCreateSerializer, ReplySerializer, ReplyCreateSerializer
 )
+from .likes import remove_like, toggle_like
+from .ranking import refresh_hot_scores
+from .threads import attach_thread_children, load_subtrees
 from apps.ai_services.gemini_service import gemini_service
+from apps.analytics.view_tracking import TrackedView, view_tracker
 import logging
 
 logger = logging.getLogger(__name__)
 
+DISCUSSION_VIEWS = TrackedView(
+    DiscussionView, 'discussion', 'views_count', unique=True,
+    on_flush=lambda views, day: refresh_hot_scores(views),
+)
+
 
 class ForumCategoryViewSet(viewsets.ModelViewSet):
     """ViewSet for forum categories"""
@@ -61,7 +70,7 @@ class DiscussionViewSet(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['title', 'content']
     filterset_fields = ['category', 'discussion_type', 'is_resolved', 'is_pinned']
-    ordering_fields = ['created_at', 'last_activity', 'likes_count', 'replies_count']
+    ordering_fields = ['created_at', 'last_activity', 'likes_count', 'replies_count', 'hot_score']
     ordering = ['-is_pinned', '-last_activity']
     
     def get_queryset(self):
@@ -99,32 +108,7 @@ class DiscussionViewSet(viewsets.ModelViewSet):
     
     def _track_view(self, discussion, request):
         """Track discussion view for analytics"""
-        ip_address = self._get_client_ip(request)
-        user = request.user if request.user.is_authenticated else None
-        
-        view, created = DiscussionView.objects.get_or_create(
-            discussion=discussion,
-            user=user,
-            ip_address=ip_address,
-            defaults={
-                'user_agent': request.META.get('HTTP_USER_AGENT', ''),
-            }
-        )
-        
-        if created:
-            # Update view count
-            Discussion.objects.filter(id=discussion.id).update(
-                views_count=F('views_count') + 1
-            )
-    
-    def _get_client_ip(self, request):
-        """Get client IP address"""
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
+        view_tracker.record(DISCUSSION_VIEWS, discussion.id, request)
     
     def _generate_ai_summary_if_needed(self, discussion):
         """Generate AI summary if discussion has many replies and no summary"""
@@ -162,40 +146,15 @@ class DiscussionViewSet(viewsets.ModelViewSet):
         discussion = self.get_object()
         
         if request.method == 'POST':
-            # Check if already liked
-            existing_like = DiscussionLike.objects.filter(
-                user=request.user,
-                discussion=discussion
-            ).first()
-            
-            if existing_like:
-                # Unlike - delete the like
-                existing_like.delete()
-                Discussion.objects.filter(id=discussion.id).update(
-                    likes_count=F('likes_count') - 1
-                )
-                return Response({'liked': False, 'message': 'Unliked'})
-            else:
-                # Like - create the like
-                DiscussionLike.objects.create(
-                    user=request.user,
-                    discussion=discussion
-                )
-                Discussion.objects.filter(id=discussion.id).update(
-                    likes_count=F('likes_count') + 1
-                )
+            liked = toggle_like(request.user, discussion)
+            refresh_hot_scores([discussion.id])
+            if liked:
                 return Response({'liked': True, 'message': 'Liked'})
+            return Response({'liked': False, 'message': 'Unliked'})
         
         elif request.method == 'DELETE':
-            deleted_count = DiscussionLike.objects.filter(
-                user=request.user,
-                discussion=discussion
-            ).delete()[0]
-            
-            if deleted_count > 0:
-                Discussion.objects.filter(id=discussion.id).update(
-                    likes_count=F('likes_count') - 1
-                )
+            if remove_like(request.user, discussion):
+                refresh_hot_scores([discussion.id])
                 return Response({'liked': False})
             else:
                 return Response({'liked': False, 'message': 'Not liked'})
@@ -274,6 +233,31 @@ class ReplyViewSet(viewsets.ModelViewSet):
             return ReplyCreateSerializer
         return ReplySerializer
     
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        replies = page if page is not None else list(queryset)
+        
+        # Nest children from a single query for this page's subtrees
+        attach_thread_children(replies)
+        
+        serializer = self.get_serializer(replies, many=True)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def thread(self, request, discussion_pk=None):
+        """Page through top-level replies, each with its full subtree nested"""
+        roots = self.get_queryset().filter(parent__isnull=True).order_by('path')
+        page = self.paginate_queryset(roots)
+        trees = load_subtrees(page if page is not None else roots)
+        
+        serializer = ReplySerializer(trees, many=True, context=self.get_serializer_context())
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+    
     def perform_create(self, serializer):
         discussion_id = self.kwargs.get('discussion_pk')
         discussion = get_object_or_404(Discussion, id=discussion_id)
@@ -295,6 +279,7 @@ class ReplyViewSet(viewsets.ModelViewSet):
             replies_count=F('replies_count') + 1,
             last_activity=timezone.now()
         )
+        refresh_hot_scores([discussion.id])
         
         # Update user forum profile
         profile, created = UserForumProfile.objects.get_or_create(
@@ -311,40 +296,12 @@ class ReplyViewSet(viewsets.ModelViewSet):
         reply = self.get_object()
         
         if request.method == 'POST':
-            # Check if already liked
-            existing_like = DiscussionLike.objects.filter(
-                user=request.user,
-                reply=reply
-            ).first()
-            
-            if existing_like:
-                # Unlike - delete the like
-                existing_like.delete()
-                Reply.objects.filter(id=reply.id).update(
-                    likes_count=F('likes_count') - 1
-                )
-                return Response({'liked': False, 'message': 'Unliked'})
-            else:
-                # Like - create the like
-                DiscussionLike.objects.create(
-                    user=request.user,
-                    reply=reply
-                )
-                Reply.objects.filter(id=reply.id).update(
-                    likes_count=F('likes_count') + 1
-                )
+            if toggle_like(request.user, reply):
                 return Response({'liked': True, 'message': 'Liked'})
+            return Response({'liked': False, 'message': 'Unliked'})
         
         elif request.method == 'DELETE':
-            deleted_count = DiscussionLike.objects.filter(
-                user=request.user,
-                reply=reply
-            ).delete()[0]
-            
-            if deleted_count > 0:
-                Reply.objects.filter(id=reply.id).update(
-                    likes_count=F('likes_count') - 1
-                )
+            if remove_like(request.user, reply):
                 return Response({'liked': False})
             else:
                 return Response({'liked': False, 'message': 'Not liked'})
@@ -419,4 +376,12 @@ class ForumStatsView(APIView):
             context={'request': request}
         ).data
         
+        # Trending now, straight off the hot_score index
+        hot_discussions = Discussion.objects.select_related('author', 'category').order_by('-hot_score')[:5]
+        stats['hot_discussions'] = DiscussionListSerializer(
+            hot_discussions,
+            many=True,
+            context={'request': request}
+        ).data
+        
         return Response(stats)
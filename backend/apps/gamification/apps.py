@@ -1,6 +1,21 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_save
 
 
 class GamificationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.gamification'
+
+    def ready(self):
+        from apps.accounts.signals import user_signed_in
+
+        from . import badges
+
+        # Domain events that move badge stats
+        post_save.connect(
+            badges.discussion_created, sender='forum.Discussion', dispatch_uid='gamification.discussion_created'
+        )
+        post_save.connect(
+            badges.application_saved, sender='applications.Application', dispatch_uid='gamification.application_saved'
+        )
+        user_signed_in.connect(badges.user_signed_in, dispatch_uid='gamification.user_signed_in')
@@ -0,0 +1,205 @@
+"""
+Badge rules, evaluated as stats change.
+
+Active badges are indexed by the profile stat their ``condition_type``
+depends on, sorted by threshold, so a stat change only looks at the badges
+that stat can unlock (a bisect, no query). Awards are written in bulk: one
+insert for the new ``UserBadge`` rows, one for their point transactions and
+a single profile update. Earning badges can itself unlock ``badges_earned``
+and ``total_points`` badges, so evaluation repeats until nothing new is earned.
+
+Domain events (a forum discussion started, an application submitted, a
+login) are wired up in ``GamificationConfig.ready`` and evaluated once the
+transaction that caused them commits.
+"""
+import bisect
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+from django.utils import timezone
+
+from .point_windows import record_points
+
+# Seconds before the rules are reloaded to pick up other processes' badge edits
+BADGE_RULES_REFRESH_INTERVAL = getattr(settings, 'BADGE_RULES_REFRESH_INTERVAL', 300)
+
+# Badge condition_type -> the UserProfile field it is checked against
+STAT_FIELDS = {
+    'total_points': 'total_points',
+    'applications_submitted': 'applications_submitted',
+    'resources_completed': 'resources_completed',
+    'forum_posts': 'forum_posts',
+    'login_streak': 'current_login_streak',
+    'badges_earned': 'badges_earned',
+}
+
+RARE_BADGES = ('rare', 'epic', 'legendary')
+
+
+class BadgeRules:
+    """Active badges by stat, sorted by threshold"""
+
+    def __init__(self, refresh_interval=BADGE_RULES_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self.rules = None
+        self.built_at = 0
+        self.lock = threading.Lock()
+
+    def rebuild(self):
+        from .models import Badge
+
+        rules = {}
+        badges = Badge.objects.filter(is_active=True, condition_type__in=STAT_FIELDS).order_by('condition_value', 'id')
+        for badge in badges:
+            thresholds, stat_badges = rules.setdefault(badge.condition_type, ([], []))
+            thresholds.append(badge.condition_value)
+            stat_badges.append(badge)
+        with self.lock:
+            self.rules = rules
+            self.built_at = time.monotonic()
+        return rules
+
+    def get_rules(self):
+        with self.lock:
+            if self.rules is not None and time.monotonic() - self.built_at < self.refresh_interval:
+                return self.rules
+        return self.rebuild()
+
+    def invalidate(self):
+        with self.lock:
+            self.rules = None
+
+    def reachable(self, stat, value):
+        """Badges depending on ``stat`` whose threshold ``value`` meets"""
+        thresholds, badges = self.get_rules().get(stat, ((), ()))
+        return badges[:bisect.bisect_right(thresholds, value)]
+
+
+badge_rules = BadgeRules()
+
+
+def locked_profile(user):
+    from .models import UserProfile
+
+    UserProfile.objects.get_or_create(user=user)
+    return UserProfile.objects.select_for_update().get(user=user)
+
+
+def award_badges(profile, stats):
+    """
+    Award what ``stats`` (condition types) now unlock for a locked
+    ``profile``; saves it and returns the newly earned badges.
+    """
+    from .models import Badge, PointTransaction, UserBadge
+
+    earned_ids = set(
+        UserBadge.objects.filter(user_id=profile.user_id, earned=True).values_list('badge_id', flat=True)
+    )
+    awarded = []
+    stats = set(stats)
+    while stats:
+        new = {
+            badge.id: badge
+            for stat in stats
+            for badge in badge_rules.reachable(stat, getattr(profile, STAT_FIELDS[stat]))
+            if badge.id not in earned_ids
+        }
+        if not new:
+            break
+        earned_ids.update(new)
+        awarded.extend(new.values())
+        profile.badges_earned += len(new)
+        profile.rare_badges_earned += sum(badge.rarity in RARE_BADGES for badge in new.values())
+        stats = {'badges_earned'}
+        points = sum(badge.points_required for badge in new.values())
+        if points:
+            profile.apply_points(points)
+            stats.add('total_points')
+
+    if not awarded:
+        return awarded
+
+    badge_ids = [badge.id for badge in awarded]
+    UserBadge.objects.bulk_create(
+        [
+            UserBadge(user_id=profile.user_id, badge=badge, earned=True, progress=badge.condition_value)
+            for badge in awarded
+        ],
+        ignore_conflicts=True,
+    )
+    # Rows left unearned by the old progress polling
+    UserBadge.objects.filter(user_id=profile.user_id, badge_id__in=badge_ids, earned=False).update(
+        earned=True,
+        earned_at=timezone.now(),
+        progress=Subquery(Badge.objects.filter(pk=OuterRef('badge_id')).values('condition_value')),
+    )
+    transactions = PointTransaction.objects.bulk_create([
+        PointTransaction(
+            user_id=profile.user_id, points=badge.points_required, transaction_type='earn',
+            reason=f"Earned badge: {badge.name}",
+        )
+        for badge in awarded if badge.points_required
+    ])
+    record_points([(tx.user_id, tx.points, timezone.localdate(tx.created_at)) for tx in transactions])
+    profile.save(update_fields=[
+        'total_points', 'current_level', 'level_progress', 'badges_earned', 'rare_badges_earned', 'updated_at',
+    ])
+    return awarded
+
+
+def evaluate(user, stats=None):
+    """Award the badges ``stats`` (all stats by default) unlock for ``user``; returns the newly earned badges"""
+    with transaction.atomic():
+        return award_badges(locked_profile(user), stats or STAT_FIELDS)
+
+
+def after_commit(func):
+    # A failed evaluation is logged rather than failing the request that caused it
+    transaction.on_commit(func, robust=True)
+
+
+def record_event(user, stat, amount=1):
+    """Count a domain event towards ``stat`` and evaluate the badges depending on it"""
+    from .models import UserProfile
+
+    field = STAT_FIELDS[stat]
+
+    def apply():
+        with transaction.atomic():
+            profile = locked_profile(user)
+            UserProfile.objects.filter(pk=profile.pk).update(**{field: F(field) + amount})
+            profile.refresh_from_db(fields=[field])
+            award_badges(profile, [stat])
+
+    after_commit(apply)
+
+
+def record_login(user):
+    def apply():
+        with transaction.atomic():
+            profile = locked_profile(user)
+            profile.update_streak('login')
+            award_badges(profile, ['login_streak'])
+
+    after_commit(apply)
+
+
+def discussion_created(sender, instance, created, **kwargs):
+    if created:
+        record_event(instance.author, 'forum_posts')
+
+
+def application_saved(sender, instance, created, **kwargs):
+    """Count an application when it is created as, or moves into, ``submitted``"""
+    if instance.status != 'submitted':
+        return
+    # Instances not loaded from the database have no saved status; only count those on create
+    if created or getattr(instance, '_saved_status', 'submitted') != 'submitted':
+        record_event(instance.user, 'applications_submitted')
+
+
+def user_signed_in(sender, user, **kwargs):
+    record_login(user)
@@ -0,0 +1,233 @@
+"""
+Points leaderboard with O(log n) rank lookups.
+
+A user's rank is one plus the number of users with strictly more points
+(ties share a rank). On the leaderboard pages themselves (top K, around a
+user) ranks stay sequential board positions, tied users ordered by user id,
+as the board has always shown them. ``PointsIndex`` keeps how many users hold each point
+total: a Fenwick tree over fixed-width point buckets answers "how many
+users are in buckets above this one" in O(log buckets), and each bucket
+keeps exact per-total counts for the remainder. ``rank_of`` lookups never
+touch the database.
+
+The process-wide ``leaderboard`` builds its index from one grouped COUNT
+the first time it is used and then follows point changes made in this
+process (``UserProfile.save()`` reports them on commit). Other processes'
+changes are picked up by rebuilding every ``LEADERBOARD_REFRESH_INTERVAL``
+seconds; changes committed while a rebuild reads the totals are replayed
+onto the new index, so ``rank_of`` may lag other processes by up to that
+interval. Pages of the leaderboard itself (``top``, ``around``) come from
+index scans on (total_points, user), and their positions are counted with
+the same live query rather than taken from the index, so a user's rank on
+every page agrees in a multi-worker deployment.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+
+# Seconds before the index is rebuilt to pick up other processes' changes
+LEADERBOARD_REFRESH_INTERVAL = getattr(settings, 'LEADERBOARD_REFRESH_INTERVAL', 300)
+
+BUCKET_WIDTH = 64
+
+
+class PointsIndex:
+    """Multiset of point totals answering ``count_above(points)`` in O(log n)"""
+
+    def __init__(self, bucket_width=BUCKET_WIDTH, max_points=0):
+        self.bucket_width = bucket_width
+        self.size = 1
+        while self.size * bucket_width <= max_points:
+            self.size *= 2
+        self.tree = [0] * (self.size + 1)
+        self.buckets = {}
+        self.total = 0
+
+    def __len__(self):
+        return self.total
+
+    def _bucket_add(self, bucket, count):
+        position = bucket + 1
+        while position <= self.size:
+            self.tree[position] += count
+            position += position & -position
+
+    def _prefix(self, bucket):
+        """Users in buckets 0..bucket"""
+        position = min(bucket + 1, self.size)
+        count = 0
+        while position > 0:
+            count += self.tree[position]
+            position -= position & -position
+        return count
+
+    def _grow(self, bucket):
+        while self.size <= bucket:
+            self.size *= 2
+        self.tree = [0] * (self.size + 1)
+        for existing, totals in self.buckets.items():
+            self._bucket_add(existing, sum(totals.values()))
+
+    def add(self, points, count=1):
+        bucket = points // self.bucket_width
+        if bucket >= self.size:
+            self._grow(bucket)
+        totals = self.buckets.setdefault(bucket, {})
+        totals[points] = totals.get(points, 0) + count
+        if not totals[points]:
+            del totals[points]
+        self._bucket_add(bucket, count)
+        self.total += count
+
+    def remove(self, points, count=1):
+        self.add(points, -count)
+
+    def move(self, old_points, new_points):
+        if old_points != new_points:
+            self.remove(old_points)
+            self.add(new_points)
+
+    def apply(self, changes):
+        """Follow ``(old_points, new_points)`` pairs; None marks an added or removed profile"""
+        for old_points, new_points in changes:
+            if old_points is not None:
+                self.remove(old_points)
+            if new_points is not None:
+                self.add(new_points)
+
+    def count_above(self, points):
+        bucket = points // self.bucket_width
+        above = self.total - self._prefix(bucket)
+        totals = self.buckets.get(bucket, {})
+        return above + sum(count for value, count in totals.items() if value > points)
+
+    def rank(self, points):
+        return self.count_above(points) + 1
+
+
+class Leaderboard:
+    """All-time points leaderboard for this process"""
+
+    def __init__(self, refresh_interval=LEADERBOARD_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self.index = None
+        self.built_at = 0
+        self.lock = threading.RLock()
+        self.rebuild_lock = threading.Lock()
+        # Changes seen while a rebuild is reading totals, None otherwise
+        self.replay = None
+
+    def profile_model(self):
+        from .models import UserProfile
+
+        return UserProfile
+
+    def rebuild(self):
+        with self.rebuild_lock:
+            return self._rebuild()
+
+    def _rebuild(self):
+        with self.lock:
+            replay = self.replay = []
+        try:
+            totals = list(
+                self.profile_model().objects
+                .values('total_points').annotate(count=Count('id'))
+                .values_list('total_points', 'count')
+            )
+            index = PointsIndex(max_points=max((points for points, _ in totals), default=0))
+            for points, count in totals:
+                index.add(points, count)
+            with self.lock:
+                index.apply(replay)
+                self.index = index
+                self.built_at = time.monotonic()
+        finally:
+            with self.lock:
+                self.replay = None
+        return index
+
+    def fresh_index(self):
+        with self.lock:
+            if self.index is not None and time.monotonic() - self.built_at < self.refresh_interval:
+                return self.index
+        return None
+
+    def get_index(self):
+        index = self.fresh_index()
+        if index is not None:
+            return index
+        with self.rebuild_lock:
+            # Another thread may have rebuilt it while this one waited
+            index = self.fresh_index()
+            return index if index is not None else self._rebuild()
+
+    def invalidate(self):
+        with self.lock:
+            self.index = None
+
+    def record_change(self, old_points, new_points):
+        """
+        Follow a profile's points once the surrounding transaction commits;
+        ``old_points`` is None for a new profile, ``new_points`` None for a deleted one.
+        """
+        self.record_changes([(old_points, new_points)])
+
+    def record_changes(self, changes):
+        """``record_change`` for many ``(old_points, new_points)`` pairs at once"""
+        def apply():
+            with self.lock:
+                if self.replay is not None:
+                    self.replay.extend(changes)
+                if self.index is not None:
+                    self.index.apply(changes)
+
+        transaction.on_commit(apply)
+
+    def rank_of(self, points):
+        return self.get_index().rank(points)
+
+    def entries(self, profiles, first_rank):
+        """Sequential ``(rank, profile)`` for a contiguous, best-first run of profiles"""
+        return [(first_rank + position, profile) for position, profile in enumerate(profiles)]
+
+    def position_of(self, profile):
+        """
+        Board position of ``profile``: users with more points, then tied users with lower ids, come first.
+
+        Counted in SQL, not from the index, so it agrees with the rows ``top()``
+        and ``around()`` read even when other processes changed points since
+        the last rebuild.
+        """
+        points, user_id = profile.total_points, profile.user_id
+        ahead = self.profile_model().objects.filter(
+            Q(total_points__gt=points) | Q(total_points=points, user_id__lt=user_id)
+        ).count()
+        return ahead + 1
+
+    def ordered(self, queryset=None):
+        queryset = queryset if queryset is not None else self.profile_model().objects.all()
+        return queryset.select_related('user')
+
+    def top(self, limit, offset=0):
+        """``(rank, profile)`` for the best ``limit`` profiles"""
+        profiles = self.ordered().order_by('-total_points', 'user_id')[offset:offset + limit]
+        return self.entries(profiles, offset + 1)
+
+    def around(self, profile, radius):
+        """``(rank, profile)`` for ``profile`` and up to ``radius`` neighbours either side"""
+        points, user_id = profile.total_points, profile.user_id
+        above = self.ordered().filter(
+            Q(total_points__gt=points) | Q(total_points=points, user_id__lt=user_id)
+        ).order_by('total_points', '-user_id')[:radius]
+        below = self.ordered().filter(
+            Q(total_points__lt=points) | Q(total_points=points, user_id__gt=user_id)
+        ).order_by('-total_points', 'user_id')[:radius]
+        above = list(above)
+        return self.entries([*reversed(above), profile, *below], self.position_of(profile) - len(above))
+
+
+leaderboard = Leaderboard()
@@ -0,0 +1,79 @@
+"""
+In-process copy of the ``Level`` table.
+
+Levels are few and rarely edited, so they are loaded once and resolved
+with bisect on ``min_points``: a profile is at the highest level whose
+minimum it has reached. ``Level.save()``/``delete()`` drop the copy;
+other processes reload it every ``LEVEL_TABLE_REFRESH_INTERVAL`` seconds.
+"""
+import bisect
+import threading
+import time
+
+from django.conf import settings
+
+# Seconds before the table is reloaded to pick up other processes' level edits
+LEVEL_TABLE_REFRESH_INTERVAL = getattr(settings, 'LEVEL_TABLE_REFRESH_INTERVAL', 300)
+
+
+class LevelTable:
+    """Levels sorted by ``min_points``"""
+
+    def __init__(self, levels):
+        self.levels = sorted(levels, key=lambda level: (level.min_points, level.level_number))
+        self.thresholds = [level.min_points for level in self.levels]
+        self.by_id = {level.id: level for level in self.levels}
+        self.by_number = sorted(self.levels, key=lambda level: level.level_number)
+        self.numbers = [level.level_number for level in self.by_number]
+
+    def get(self, level_id):
+        return self.by_id.get(level_id)
+
+    def level_for(self, points):
+        """Highest level ``points`` reaches, or None below the first"""
+        position = bisect.bisect_right(self.thresholds, points)
+        return self.levels[position - 1] if position else None
+
+    def next_level(self, level):
+        """The level numbered after ``level``; the first level when ``level`` is None"""
+        if level is None:
+            return self.by_number[0] if self.by_number else None
+        position = bisect.bisect_right(self.numbers, level.level_number)
+        return self.by_number[position] if position < len(self.by_number) else None
+
+    def progress(self, level, points):
+        """Percent of the way through ``level``"""
+        level_range = level.max_points - level.min_points
+        if level_range <= 0:
+            return 100
+        return max(0, min(100, int((points - level.min_points) / level_range * 100)))
+
+
+class Levels:
+    def __init__(self, refresh_interval=LEVEL_TABLE_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self.table = None
+        self.built_at = 0
+        self.lock = threading.Lock()
+
+    def rebuild(self):
+        from .models import Level
+
+        table = LevelTable(Level.objects.all())
+        with self.lock:
+            self.table = table
+            self.built_at = time.monotonic()
+        return table
+
+    def get_table(self):
+        with self.lock:
+            if self.table is not None and time.monotonic() - self.built_at < self.refresh_interval:
+                return self.table
+        return self.rebuild()
+
+    def invalidate(self):
+        with self.lock:
+            self.table = None
+
+
+levels = Levels()
@@ -0,0 +1,68 @@
+import bisect
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.gamification.leaderboard import PointsIndex
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark leaderboard rank lookups and point updates on synthetic users, '
+        'against a sorted-list baseline (no database involved)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1_000_000)
+        parser.add_argument('--operations', type=int, default=100_000, help='Rank lookups and updates timed')
+        parser.add_argument('--max-points', type=int, default=50_000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        users = options['users']
+        operations = options['operations']
+        # Long-tailed like real point totals: most users have few points
+        points = [min(int(rng.paretovariate(1.2) * 20) - 20, options['max_points']) for _ in range(users)]
+
+        started = time.perf_counter()
+        index = PointsIndex(max_points=max(points))
+        totals = {}
+        for value in points:
+            totals[value] = totals.get(value, 0) + 1
+        for value, count in totals.items():
+            index.add(value, count)
+        self.report('build (grouped totals)', time.perf_counter() - started, 1)
+
+        probes = [rng.choice(points) for _ in range(operations)]
+        started = time.perf_counter()
+        ranks = [index.rank(value) for value in probes]
+        self.report('rank lookup', time.perf_counter() - started, operations)
+
+        ascending = sorted(points)
+        started = time.perf_counter()
+        expected = [users - bisect.bisect_right(ascending, value) + 1 for value in probes]
+        self.report('rank lookup, sorted list (baseline)', time.perf_counter() - started, operations)
+        if ranks != expected:
+            raise AssertionError('PointsIndex ranks disagree with the sorted-list baseline')
+
+        moves = [(rng.randrange(users), rng.randint(1, 500)) for _ in range(operations)]
+        started = time.perf_counter()
+        for user, award in moves:
+            index.move(points[user], points[user] + award)
+            points[user] += award
+        self.report('point update', time.perf_counter() - started, operations)
+
+        started = time.perf_counter()
+        for user, award in moves[:min(operations, 2_000)]:
+            # What keeping a sorted list current costs: O(n) delete and insert
+            ascending.pop(bisect.bisect_left(ascending, points[user] - award))
+            bisect.insort(ascending, points[user])
+        self.report('point update, sorted list (baseline)', time.perf_counter() - started, min(operations, 2_000))
+
+        self.stdout.write(self.style.SUCCESS(f'{users:,} users, {len(totals):,} distinct totals, ranks verified'))
+
+    def report(self, label, seconds, count):
+        per_op = seconds / count * 1e6
+        self.stdout.write(f'{label:<40} {seconds * 1000:10.1f} ms total {per_op:10.2f} µs/op')
@@ -0,0 +1,111 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from apps.gamification.models import PointsRollup, StreakRun, UserProfile
+from apps.gamification.point_windows import DAY
+from apps.gamification.streaks import STREAK_BATCH_SIZE, settle_day
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the nightly streak job on synthetic profiles; everything it writes '
+        'is rolled back, but use a scratch database: creating a million users takes a while'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', type=int, default=1_000_000)
+        parser.add_argument('--batch-size', type=int, default=STREAK_BATCH_SIZE)
+        parser.add_argument('--active-share', type=float, default=0.3, help='Share of users active on the settled day')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        rng = random.Random(options['seed'])
+        count = options['profiles']
+        day = timezone.localdate() - timedelta(days=1)
+        User = get_user_model()
+
+        started = time.perf_counter()
+        first_id = (User.objects.order_by('-id').values_list('id', flat=True).first() or 0) + 1
+        for start in range(0, count, 10_000):
+            User.objects.bulk_create([
+                User(id=first_id + i, username=f'streak-bench-{i}', email=f'streak-bench-{i}@example.com', password='!')
+                for i in range(start, min(start + 10_000, count))
+            ])
+
+        profiles = []
+        active = []
+        for i in range(count):
+            user_id = first_id + i
+            streak = rng.randint(0, 30)
+            # Yesterday's streak carries on, an older one is broken, or there's none yet
+            last_activity = rng.choice([day - timedelta(days=1), day - timedelta(days=rng.randint(2, 60)), None])
+            last_login = rng.choice([day, day - timedelta(days=1), day - timedelta(days=rng.randint(2, 60)), None])
+            profiles.append(UserProfile(
+                user_id=user_id,
+                current_activity_streak=streak if last_activity else 0,
+                longest_activity_streak=streak,
+                last_activity_date=last_activity,
+                current_login_streak=streak if last_login else 0,
+                longest_login_streak=streak,
+                last_login_date=last_login,
+            ))
+            if rng.random() < options['active_share']:
+                active.append(user_id)
+        UserProfile.objects.bulk_create(profiles, batch_size=10_000)
+        PointsRollup.objects.bulk_create(
+            [PointsRollup(user_id=user_id, period=DAY, period_start=day, points=10) for user_id in active],
+            batch_size=10_000,
+        )
+        self.stdout.write(f'setup {time.perf_counter() - started:10.1f} s ({count:,} profiles, {len(active):,} active)')
+
+        StreakRun.objects.filter(day=day).delete()
+        started = time.perf_counter()
+        covered = settle_day(day, batch_size=options['batch_size'])
+        seconds = time.perf_counter() - started
+        self.stdout.write(
+            f'settle {seconds:10.1f} s total {seconds / max(covered, 1) * 1e6:10.2f} µs/profile '
+            f'({-(-covered // options["batch_size"]):,} chunks)'
+        )
+
+        self.verify(profiles, set(active), day)
+        self.stdout.write(self.style.SUCCESS(f'{covered:,} profiles settled, streaks verified'))
+
+    def verify(self, profiles, active, day):
+        """Compare every settled profile with the same rules applied in Python"""
+        settled = {
+            row[0]: row[1:]
+            for row in UserProfile.objects.filter(
+                user_id__gte=profiles[0].user_id, user_id__lte=profiles[-1].user_id
+            ).values_list(
+                'user_id', 'current_activity_streak', 'longest_activity_streak', 'last_activity_date',
+                'current_login_streak',
+            ).iterator(chunk_size=10_000)
+        }
+        for profile in profiles:
+            streak, last = profile.current_activity_streak, profile.last_activity_date
+            if profile.user_id in active:
+                streak, last = (streak + 1 if last == day - timedelta(days=1) else 1), day
+            elif last is None or last < day:
+                streak = 0
+            login = profile.current_login_streak if profile.last_login_date and profile.last_login_date >= day else 0
+            expected = (streak, max(streak, profile.longest_activity_streak), last, login)
+            if settled[profile.user_id] != expected:
+                raise AssertionError(f'user {profile.user_id}: expected {expected}, got {settled[profile.user_id]}')
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from apps.gamification.streaks import STREAK_BATCH_SIZE, process_streaks
+
+
+class Command(BaseCommand):
+    help = (
+        'Settle login and activity streaks for every completed day not processed yet '
+        '(run nightly, e.g. from cron; an interrupted run resumes where it stopped)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=STREAK_BATCH_SIZE, help='Profiles settled per transaction')
+
+    def handle(self, *args, **options):
+        settled = process_streaks(batch_size=options['batch_size'])
+        for day, covered in settled:
+            self.stdout.write(f'{day}: settled {covered} profiles')
+        self.stdout.write(self.style.SUCCESS(f'Settled {len(settled)} day(s)'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from apps.gamification.point_windows import rebuild, rotate
+
+
+class Command(BaseCommand):
+    help = (
+        'Drop daily/weekly/monthly points windows past their retention '
+        '(run daily, e.g. from cron)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='First recompute every retained window from the point transactions')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            rows = rebuild()
+            self.stdout.write(f'Rebuilt {rows} points rollup rows')
+        deleted = rotate()
+        self.stdout.write(self.style.SUCCESS(f'Dropped {deleted} expired points rollup rows'))
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gamification', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['-total_points', 'user'], name='gamificatio_total_p_76032f_idx'),
+        ),
+    ]
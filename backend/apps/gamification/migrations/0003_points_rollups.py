@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:32
+
+from collections import defaultdict
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def window_start(period, day):
+    if period == 'day':
+        return day
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def populate_points_rollups(apps, schema_editor):
+    """Roll existing point transactions up into the windows still within retention"""
+    PointsRollup = apps.get_model('gamification', 'PointsRollup')
+    PointTransaction = apps.get_model('gamification', 'PointTransaction')
+
+    retention = getattr(settings, 'POINTS_ROLLUP_RETENTION_DAYS', {'day': 35, 'week': 26 * 7, 'month': 2 * 365})
+    today = timezone.localdate()
+    cutoffs = {period: window_start(period, today - timedelta(days=days)) for period, days in retention.items()}
+    daily = (
+        PointTransaction.objects
+        .annotate(day=TruncDate('created_at'))
+        .filter(day__gte=min(cutoffs.values()))
+        .values('user_id', 'day')
+        .annotate(points=Sum('points'))
+        .values_list('user_id', 'points', 'day')
+    )
+    totals = defaultdict(int)
+    for user_id, points, day in daily.iterator():
+        for period, cutoff in cutoffs.items():
+            start = window_start(period, day)
+            if start >= cutoff:
+                totals[(period, start, user_id)] += points
+    PointsRollup.objects.bulk_create(
+        [
+            PointsRollup(period=period, period_start=start, user_id=user_id, points=points)
+            for (period, start, user_id), points in totals.items() if points
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gamification', '0002_leaderboard_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PointsRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'Day'), ('week', 'Week'), ('month', 'Month')], max_length=5)),
+                ('period_start', models.DateField()),
+                ('points', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='points_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['period', 'period_start', '-points', 'user'], name='gamificatio_period_f407f4_idx')],
+                'unique_together': {('period', 'period_start', 'user')},
+            },
+        ),
+        migrations.RunPython(populate_points_rollups, migrations.RunPython.noop),
+    ]
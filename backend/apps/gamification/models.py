@@ -3,6 +3,12 @@ from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+
+from .badges import badge_rules
+from .leaderboard import leaderboard
+from .levels import levels
+from .point_windows import PERIODS, record_points
 
 User = get_user_model()
 
@@ -56,6 +62,15 @@ class Badge(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        transaction.on_commit(badge_rules.invalidate)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        transaction.on_commit(badge_rules.invalidate)
+        return result
+
     @property
     def earned_count(self):
         return self.user_badges.filter(earned=True).count()
@@ -101,6 +116,15 @@ class Level(models.Model):
     def __str__(self):
         return f"Level {self.level_number}: {self.name}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        transaction.on_commit(levels.invalidate)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        transaction.on_commit(levels.invalidate)
+        return result
+
 
 class UserProfile(models.Model):
     """Extended user profile for gamification"""
@@ -143,35 +167,57 @@ class UserProfile(models.Model):
     class Meta:
         indexes = [
             models.Index(fields=['total_points']),
+            models.Index(fields=['-total_points', 'user']),
             models.Index(fields=['current_level']),
         ]
 
     def __str__(self):
         return f"{self.user.username} - Level {self.current_level.level_number if self.current_level else 0}"
 
-    def add_points(self, points, reason="", save=True):
-        """Add points to user profile"""
+    @property
+    def level(self):
+        """``current_level`` from the cached level table, without a query"""
+        return levels.get_table().get(self.current_level_id)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered so the leaderboard can follow changes on save
+        instance._saved_points = instance.__dict__.get('total_points')
+        return instance
+
+    def save(self, *args, **kwargs):
+        is_new = self._state.adding
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'total_points' not in update_fields:
+            return
+        saved_points = getattr(self, '_saved_points', None)
+        if is_new:
+            leaderboard.record_change(None, self.total_points)
+        elif saved_points is not None and saved_points != self.total_points:
+            leaderboard.record_change(saved_points, self.total_points)
+        self._saved_points = self.total_points
+
+    def delete(self, *args, **kwargs):
+        points = self.total_points
+        result = super().delete(*args, **kwargs)
+        leaderboard.record_change(points, None)
+        return result
+
+    def apply_points(self, points):
+        """Add points to the total and move the level along (any number of levels), without saving"""
         self.total_points += points
         
-        # Check for level up
-        if self.current_level:
-            if self.total_points >= self.current_level.max_points:
-                next_level = Level.objects.filter(
-                    level_number=self.current_level.level_number + 1
-                ).first()
-                if next_level:
-                    self.current_level = next_level
-        else:
-            # First level
-            first_level = Level.objects.filter(min_points__lte=self.total_points).order_by('-level_number').first()
-            if first_level:
-                self.current_level = first_level
-        
-        # Update level progress
-        if self.current_level:
-            progress_in_level = self.total_points - self.current_level.min_points
-            level_range = self.current_level.max_points - self.current_level.min_points
-            self.level_progress = min(100, int((progress_in_level / level_range) * 100)) if level_range > 0 else 100
+        table = levels.get_table()
+        level = table.level_for(self.total_points)
+        if level:
+            self.current_level = level
+            self.level_progress = table.progress(level, self.total_points)
+
+    def add_points(self, points, reason="", save=True):
+        """Add points to user profile"""
+        self.apply_points(points)
         
         if save:
             self.save()
@@ -212,7 +258,10 @@ class UserProfile(models.Model):
             self.longest_activity_streak = max(self.longest_activity_streak, self.current_activity_streak)
             self.last_activity_date = today
         
-        self.save()
+        self.save(update_fields=[
+            'current_login_streak', 'longest_login_streak', 'last_login_date',
+            'current_activity_streak', 'longest_activity_streak', 'last_activity_date', 'updated_at',
+        ])
 
 
 class PointTransaction(models.Model):
@@ -246,3 +295,42 @@ class PointTransaction(models.Model):
 
     def __str__(self):
         return f"{self.user.username}: {self.points} points - {self.reason}"
+
+    def save(self, *args, **kwargs):
+        is_new = self._state.adding
+        super().save(*args, **kwargs)
+        if is_new:
+            record_points([(self.user_id, self.points, timezone.localdate(self.created_at))])
+
+
+class PointsRollup(models.Model):
+    """Points a user gained in one day/week/month window, kept up to date from PointTransaction"""
+    PERIOD_CHOICES = [(period, period.title()) for period in PERIODS]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='points_rollups')
+    period = models.CharField(max_length=5, choices=PERIOD_CHOICES)
+    period_start = models.DateField()
+    points = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ['period', 'period_start', 'user']
+        indexes = [
+            models.Index(fields=['period', 'period_start', '-points', 'user']),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username}: {self.points} points ({self.period} of {self.period_start})"
+
+
+class StreakRun(models.Model):
+    """Checkpoint of the nightly streak job for one day"""
+    day = models.DateField(unique=True)
+    last_user_id = models.BigIntegerField(default=0, help_text="Profiles of users up to this id are settled")
+    started_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-day']
+
+    def __str__(self):
+        return f"Streaks for {self.day} ({'done' if self.completed_at else f'up to user {self.last_user_id}'})"
@@ -0,0 +1,164 @@
+"""
+Daily, weekly and monthly points leaderboards.
+
+Every point transaction is added to its user's ``PointsRollup`` rows for
+the day, week (starting Monday) and month it falls in, as it is written.
+Windowed leaderboards are then index scans over one window's rows instead
+of an aggregation over ``PointTransaction``. Windows older than their
+retention are dropped by ``manage.py rotate_points_rollups``.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+DAY = 'day'
+WEEK = 'week'
+MONTH = 'month'
+PERIODS = (DAY, WEEK, MONTH)
+
+# Leaderboard ``period`` parameter values
+PERIOD_ALIASES = {
+    'daily': DAY, 'day': DAY,
+    'weekly': WEEK, 'week': WEEK,
+    'monthly': MONTH, 'month': MONTH,
+}
+
+# Days a window is kept after it starts
+POINTS_ROLLUP_RETENTION_DAYS = getattr(settings, 'POINTS_ROLLUP_RETENTION_DAYS', {
+    DAY: 35,
+    WEEK: 26 * 7,
+    MONTH: 2 * 365,
+})
+
+
+def period_start(period, day):
+    if period == DAY:
+        return day
+    if period == WEEK:
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def record_points(entries):
+    """
+    Add ``entries`` (``(user_id, points, day)`` tuples) to the rollups.
+
+    Missing rows are created empty first (conflicts ignored), then points
+    are added with one F() update per (window, amount), so concurrent
+    writers never lose points.
+    """
+    from .models import PointsRollup as rollup_model
+
+    totals = defaultdict(int)
+    for user_id, points, day in entries:
+        for period in PERIODS:
+            totals[(period, period_start(period, day), user_id)] += points
+    totals = {key: points for key, points in totals.items() if points}
+    if not totals:
+        return
+
+    by_amount = defaultdict(list)
+    for (period, start, user_id), points in totals.items():
+        by_amount[(period, start, points)].append(user_id)
+
+    with transaction.atomic():
+        rollup_model.objects.bulk_create(
+            [
+                rollup_model(period=period, period_start=start, user_id=user_id)
+                for period, start, user_id in totals
+            ],
+            ignore_conflicts=True,
+        )
+        for (period, start, points), user_ids in by_amount.items():
+            rollup_model.objects.filter(period=period, period_start=start, user_id__in=user_ids).update(
+                points=F('points') + points
+            )
+
+
+def rotate(today=None):
+    """Drop windows past their retention; returns the number of rows deleted"""
+    from .models import PointsRollup as rollup_model
+
+    today = today or timezone.localdate()
+    expired = Q()
+    for period, days in POINTS_ROLLUP_RETENTION_DAYS.items():
+        expired |= Q(period=period, period_start__lt=period_start(period, today - timedelta(days=days)))
+    deleted, _ = rollup_model.objects.filter(expired).delete()
+    return deleted
+
+
+def rebuild(today=None):
+    """Recompute the retained windows from PointTransaction; returns the number of rows written"""
+    from .models import PointsRollup as rollup_model, PointTransaction as transaction_model
+
+    today = today or timezone.localdate()
+    since = min(
+        period_start(period, today - timedelta(days=days))
+        for period, days in POINTS_ROLLUP_RETENTION_DAYS.items()
+    )
+    daily = (
+        transaction_model.objects
+        .annotate(day=TruncDate('created_at'))
+        .filter(day__gte=since)
+        .values('user_id', 'day')
+        .annotate(points=Sum('points'))
+        .values_list('user_id', 'points', 'day')
+    )
+    with transaction.atomic():
+        rollup_model.objects.all().delete()
+        record_points(daily)
+        rotate(today)
+    return rollup_model.objects.count()
+
+
+class WindowLeaderboard:
+    """One window (e.g. this week) of a periodic leaderboard"""
+
+    def __init__(self, period, day=None):
+        from .models import PointsRollup
+
+        self.period = period
+        self.start = period_start(period, day or timezone.localdate())
+        self.rows = PointsRollup.objects.filter(period=period, period_start=self.start)
+
+    def ranked(self, rollups):
+        """
+        Sequential ``(rank, rollup)`` for a contiguous, best-first run of rollups.
+
+        Ranks are board positions (points descending, then user id), numbered
+        the same way as the all-time board in leaderboard.py.
+        """
+        rollups = list(rollups)
+        if not rollups:
+            return []
+        first = rollups[0]
+        ahead = self.rows.filter(
+            Q(points__gt=first.points) | Q(points=first.points, user_id__lt=first.user_id)
+        ).count()
+        return [(ahead + 1 + offset, rollup) for offset, rollup in enumerate(rollups)]
+
+    def ordered(self):
+        return self.rows.select_related('user__gamification_profile')
+
+    def top(self, limit):
+        return self.ranked(self.ordered().order_by('-points', 'user_id')[:limit])
+
+    def around(self, user, radius):
+        """``user`` and up to ``radius`` neighbours either side; just the neighbours above if ``user`` has no points"""
+        mine = self.ordered().filter(user=user).first()
+        if mine is None:
+            above = self.ordered().order_by('points', '-user_id')
+            return self.ranked(list(reversed(above[:radius])))
+        points, user_id = mine.points, mine.user_id
+        above = self.ordered().filter(
+            Q(points__gt=points) | Q(points=points, user_id__lt=user_id)
+        ).order_by('points', '-user_id')[:radius]
+        below = self.ordered().filter(
+            Q(points__lt=points) | Q(points=points, user_id__gt=user_id)
+        ).order_by('-points', 'user_id')[:radius]
+        return self.ranked([*reversed(list(above)), mine, *below])
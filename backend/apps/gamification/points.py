@@ -0,0 +1,90 @@
+"""
+Awarding points to many users at once.
+
+``award_points`` takes ``(user, points, reason)`` tuples and, per chunk of
+``batch_size`` users, runs a fixed handful of statements whatever the chunk
+holds: the profiles are locked (and missing ones inserted), totals are
+raised with one ``F()`` update per distinct amount, the transactions go in
+with ``bulk_create``, and levels are resolved against the cached level table
+and written back with one ``bulk_update``.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .leaderboard import leaderboard
+from .levels import levels
+from .point_windows import record_points
+
+AWARD_BATCH_SIZE = 1000
+
+
+def award_points(awards, transaction_type='earn', batch_size=AWARD_BATCH_SIZE):
+    """
+    Award ``(user, points, reason)`` tuples (``user`` may be a User or its
+    id); a user may appear more than once. Returns ``{user_id: new total}``.
+    """
+    from .models import PointTransaction, UserProfile
+
+    awards = [(getattr(user, 'pk', user), points, reason) for user, points, reason in awards]
+    deltas = defaultdict(int)
+    for user_id, points, _ in awards:
+        deltas[user_id] += points
+    user_ids = sorted(deltas)
+    totals = {}
+
+    with transaction.atomic():
+        for start in range(0, len(user_ids), batch_size):
+            chunk = user_ids[start:start + batch_size]
+            chunk_deltas = {user_id: deltas[user_id] for user_id in chunk}
+            totals.update(apply_deltas(UserProfile, chunk_deltas))
+
+        created = PointTransaction.objects.bulk_create(
+            [
+                PointTransaction(user_id=user_id, points=points, transaction_type=transaction_type, reason=reason)
+                for user_id, points, reason in awards
+            ],
+            batch_size=batch_size,
+        )
+        today = timezone.localdate()
+        record_points([(tx.user_id, tx.points, today) for tx in created])
+    return totals
+
+
+def apply_deltas(profile_model, deltas):
+    """Add ``{user_id: points}`` to the profiles and move their levels; returns the new totals"""
+    user_ids = list(deltas)
+    saved = dict(
+        profile_model.objects.select_for_update().filter(user_id__in=user_ids).values_list('user_id', 'total_points')
+    )
+    profile_model.objects.bulk_create(
+        [profile_model(user_id=user_id) for user_id in user_ids if user_id not in saved],
+        ignore_conflicts=True,
+    )
+
+    by_amount = defaultdict(list)
+    for user_id, points in deltas.items():
+        if points:
+            by_amount[points].append(user_id)
+    for points, amount_user_ids in by_amount.items():
+        profile_model.objects.filter(user_id__in=amount_user_ids).update(total_points=F('total_points') + points)
+
+    table = levels.get_table()
+    totals = {}
+    changed = []
+    rows = profile_model.objects.filter(user_id__in=user_ids).values_list(
+        'id', 'user_id', 'total_points', 'current_level_id', 'level_progress'
+    )
+    for pk, user_id, total, level_id, progress in rows:
+        totals[user_id] = total
+        level = table.level_for(total)
+        new_level_id = level.id if level else level_id
+        new_progress = table.progress(level, total) if level else progress
+        if (new_level_id, new_progress) != (level_id, progress):
+            changed.append(profile_model(pk=pk, current_level_id=new_level_id, level_progress=new_progress))
+    profile_model.objects.bulk_update(changed, ['current_level', 'level_progress'])
+
+    leaderboard.record_changes([(saved.get(user_id), total) for user_id, total in totals.items()])
+    return totals
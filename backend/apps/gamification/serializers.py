@@ -1,16 +1,28 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from core.loaders import ViewerBatchListSerializer, ViewerLoader
+from .leaderboard import leaderboard
+from .levels import levels
 from .models import Badge, UserBadge, Level, UserProfile, PointTransaction
 
 User = get_user_model()
 
 
+def fetch_user_badges(user, badge_ids):
+    return {
+        user_badge.badge_id: user_badge
+        for user_badge in UserBadge.objects.filter(user=user, badge_id__in=badge_ids)
+    }
+
+
 class BadgeSerializer(serializers.ModelSerializer):
     """Serializer for badges"""
     earned_count = serializers.ReadOnlyField()
     user_earned = serializers.SerializerMethodField()
     user_progress = serializers.SerializerMethodField()
 
+    user_badge_loader = ViewerLoader(fetch_user_badges)
+
     class Meta:
         model = Badge
         fields = [
@@ -19,19 +31,15 @@ class BadgeSerializer(serializers.ModelSerializer):
             'condition_value', 'condition_data', 'is_active', 'is_hidden',
             'earned_count', 'user_earned', 'user_progress', 'created_at'
         ]
+        list_serializer_class = ViewerBatchListSerializer
 
     def get_user_earned(self, obj):
-        user = self.context.get('request').user if self.context.get('request') else None
-        if user and user.is_authenticated:
-            return obj.user_badges.filter(user=user, earned=True).exists()
-        return False
+        user_badge = self.user_badge_loader.load(self, obj)
+        return bool(user_badge and user_badge.earned)
 
     def get_user_progress(self, obj):
-        user = self.context.get('request').user if self.context.get('request') else None
-        if user and user.is_authenticated:
-            user_badge = obj.user_badges.filter(user=user).first()
-            return user_badge.progress if user_badge else 0
-        return 0
+        user_badge = self.user_badge_loader.load(self, obj)
+        return user_badge.progress if user_badge else 0
 
 
 class UserBadgeSerializer(serializers.ModelSerializer):
@@ -57,7 +65,7 @@ class LevelSerializer(serializers.ModelSerializer):
 
 class UserProfileSerializer(serializers.ModelSerializer):
     """Serializer for user gamification profile"""
-    current_level = LevelSerializer(read_only=True)
+    current_level = LevelSerializer(source='level', read_only=True)
     next_level = serializers.SerializerMethodField()
     total_badges = serializers.SerializerMethodField()
     recent_badges = serializers.SerializerMethodField()
@@ -84,14 +92,8 @@ class UserProfileSerializer(serializers.ModelSerializer):
         ]
 
     def get_next_level(self, obj):
-        if obj.current_level:
-            next_level = Level.objects.filter(
-                level_number=obj.current_level.level_number + 1
-            ).first()
-            return LevelSerializer(next_level).data if next_level else None
-        else:
-            first_level = Level.objects.order_by('level_number').first()
-            return LevelSerializer(first_level).data if first_level else None
+        next_level = levels.get_table().next_level(obj.level)
+        return LevelSerializer(next_level).data if next_level else None
 
     def get_total_badges(self, obj):
         return obj.user.badges.filter(earned=True).count()
@@ -101,9 +103,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
         return UserBadgeSerializer(recent_badges, many=True).data
 
     def get_rank(self, obj):
-        # Get user's rank based on total points
-        higher_users = UserProfile.objects.filter(total_points__gt=obj.total_points).count()
-        return higher_users + 1
+        return leaderboard.rank_of(obj.total_points)
 
 
 class PointTransactionSerializer(serializers.ModelSerializer):
@@ -118,6 +118,13 @@ class PointTransactionSerializer(serializers.ModelSerializer):
         ]
 
 
+class PointAwardSerializer(serializers.Serializer):
+    """One award in a bulk points request"""
+    user_id = serializers.IntegerField()
+    points = serializers.IntegerField(min_value=1)
+    reason = serializers.CharField(max_length=255, default='Manual award')
+
+
 class LeaderboardEntrySerializer(serializers.Serializer):
     """Serializer for leaderboard entries"""
     rank = serializers.IntegerField()
@@ -0,0 +1,117 @@
+"""
+Nightly streak processing.
+
+Logins move a profile's login streak as they happen (``record_login``), but
+nothing ends a streak for someone who simply stops coming back. The nightly
+job settles each completed day for every profile with a few set-based
+UPDATEs per chunk of users:
+
+- activity streaks continue, start or end depending on whether the user was
+  active that day (earned points, or logged a tracker activity)
+- login and activity streaks of anyone who missed the day drop to 0
+- longest streaks catch up with current ones
+
+Each day is a ``StreakRun``; the last user id processed is saved with every
+chunk, so an interrupted run resumes where it stopped and a missed night is
+caught up on the next run.
+"""
+from datetime import datetime, time, timedelta
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .point_windows import DAY, POINTS_ROLLUP_RETENTION_DAYS
+
+STREAK_BATCH_SIZE = 5000
+
+
+def active_users(day, lo, hi):
+    """Q matching profiles whose user was active on ``day``, for users in (lo, hi]"""
+    from .models import PointsRollup
+
+    activity_model = apps.get_model('tracker', 'Activity')
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    earned = PointsRollup.objects.filter(
+        period=DAY, period_start=day, user_id__gt=lo, user_id__lte=hi
+    ).values('user_id')
+    logged = activity_model.objects.filter(
+        user_id__gt=lo, user_id__lte=hi, activity_date__gte=start, activity_date__lt=start + timedelta(days=1)
+    ).values('user_id')
+    return Q(user_id__in=earned) | Q(user_id__in=logged)
+
+
+def settle_chunk(day, lo, hi):
+    """Settle ``day`` for profiles of users in (lo, hi]"""
+    from .models import UserProfile
+
+    profiles = UserProfile.objects.filter(user_id__gt=lo, user_id__lte=hi)
+    active = active_users(day, lo, hi)
+    previous = day - timedelta(days=1)
+
+    # Profiles already at or past ``day`` (live updates, a resumed chunk) are left alone
+    profiles.filter(active, last_activity_date=previous).update(
+        current_activity_streak=F('current_activity_streak') + 1, last_activity_date=day
+    )
+    profiles.filter(active).filter(Q(last_activity_date__isnull=True) | Q(last_activity_date__lt=previous)).update(
+        current_activity_streak=1, last_activity_date=day
+    )
+    profiles.filter(
+        Q(last_activity_date__isnull=True) | Q(last_activity_date__lt=day), current_activity_streak__gt=0
+    ).update(current_activity_streak=0)
+    profiles.filter(
+        Q(last_login_date__isnull=True) | Q(last_login_date__lt=day), current_login_streak__gt=0
+    ).update(current_login_streak=0)
+
+    profiles.filter(current_activity_streak__gt=F('longest_activity_streak')).update(
+        longest_activity_streak=F('current_activity_streak')
+    )
+    profiles.filter(current_login_streak__gt=F('longest_login_streak')).update(
+        longest_login_streak=F('current_login_streak')
+    )
+
+
+def settle_day(day, batch_size=STREAK_BATCH_SIZE):
+    """Settle ``day`` for every profile, resuming from its checkpoint; returns the profiles covered"""
+    from .models import StreakRun, UserProfile
+
+    run, _ = StreakRun.objects.get_or_create(day=day)
+    if run.completed_at:
+        return 0
+    user_ids = UserProfile.objects.order_by('user_id').values_list('user_id', flat=True)
+    covered = 0
+    while True:
+        batch = list(user_ids.filter(user_id__gt=run.last_user_id)[:batch_size])
+        if not batch:
+            break
+        with transaction.atomic():
+            settle_chunk(day, run.last_user_id, batch[-1])
+            # Saved with the chunk, so the checkpoint never gets ahead of the work
+            run.last_user_id = batch[-1]
+            run.save(update_fields=['last_user_id'])
+        covered += len(batch)
+    run.completed_at = timezone.now()
+    run.save(update_fields=['completed_at'])
+    return covered
+
+
+def pending_days(today=None):
+    """Completed days not settled yet, oldest first (no further back than daily rollups are kept)"""
+    from .models import StreakRun
+
+    today = today or timezone.localdate()
+    yesterday = today - timedelta(days=1)
+    oldest = today - timedelta(days=POINTS_ROLLUP_RETENTION_DAYS[DAY])
+    last_run = StreakRun.objects.filter(completed_at__isnull=False).order_by('-day').values_list('day', flat=True).first()
+    day = max(last_run + timedelta(days=1), oldest) if last_run else yesterday
+    days = []
+    while day <= yesterday:
+        days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def process_streaks(today=None, batch_size=STREAK_BATCH_SIZE):
+    """Settle every pending day; returns ``[(day, profiles covered)]``"""
+    return [(day, settle_day(day, batch_size)) for day in pending_days(today)]
@@ -1,3 +1,141 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.utils import timezone
+
+from apps.applications.models import Application
+from apps.opportunities.models import Opportunity, OpportunityCategory
+
+from .badges import badge_rules
+from .leaderboard import Leaderboard, PointsIndex
+from .point_windows import WEEK, WindowLeaderboard, period_start
+from .models import Badge, PointsRollup, UserBadge, UserProfile
+
+User = get_user_model()
+
+
+class ApplicationSubmittedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('applicant', 'applicant@example.com', 'password')
+        category = OpportunityCategory.objects.create(name='Internships')
+        cls.opportunities = [
+            Opportunity.objects.create(
+                title=f'Internship {i}', description='Description', short_description='Short',
+                category=category, organization='Org', application_deadline=timezone.now(),
+                created_by=cls.user,
+            )
+            for i in range(2)
+        ]
+        cls.badge = Badge.objects.create(
+            name='First Application', slug='first-application', description='Submit an application',
+            category='milestone', icon='send', condition_type='applications_submitted', condition_value=1,
+        )
+
+    def setUp(self):
+        badge_rules.invalidate()
+
+    def profile(self):
+        return UserProfile.objects.get(user=self.user)
+
+    def test_created_as_submitted_is_counted(self):
+        # What both apply endpoints do
+        with self.captureOnCommitCallbacks(execute=True):
+            Application.objects.create(
+                user=self.user, opportunity=self.opportunities[0], status='submitted', submitted_at=timezone.now()
+            )
+
+        profile = self.profile()
+        self.assertEqual(profile.applications_submitted, 1)
+        self.assertEqual(profile.badges_earned, 1)
+        self.assertTrue(UserBadge.objects.filter(user=self.user, badge=self.badge).exists())
+
+    def test_moving_into_submitted_is_counted_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            application = Application.objects.create(user=self.user, opportunity=self.opportunities[0])
+        self.assertFalse(UserProfile.objects.filter(user=self.user, applications_submitted__gt=0).exists())
+
+        application = Application.objects.get(pk=application.pk)
+        application.status = 'submitted'
+        with self.captureOnCommitCallbacks(execute=True):
+            application.save()
+        self.assertEqual(self.profile().applications_submitted, 1)
+        # Badge bookkeeping leaves the application's own fields alone
+        self.assertIsNone(application.submitted_at)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            application.save()
+            Application.objects.get(pk=application.pk).save()
+        self.assertEqual(self.profile().applications_submitted, 1)
+
+    def test_each_application_is_counted(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for opportunity in self.opportunities:
+                Application.objects.create(user=self.user, opportunity=opportunity, status='submitted')
+        self.assertEqual(self.profile().applications_submitted, 2)
+
+
+class LeaderboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.profiles = []
+        for i, points in enumerate([50, 30, 30, 10]):
+            user = User.objects.create_user(f'player{i}', f'player{i}@example.com', 'password')
+            cls.profiles.append(UserProfile.objects.create(user=user, total_points=points))
+
+    def setUp(self):
+        self.leaderboard = Leaderboard()
+
+    def test_board_ranks_are_sequential(self):
+        ranks = [(rank, profile.pk) for rank, profile in self.leaderboard.top(4)]
+        self.assertEqual(ranks, [(i + 1, profile.pk) for i, profile in enumerate(self.profiles)])
+        self.assertEqual([rank for rank, _ in self.leaderboard.top(2, offset=2)], [3, 4])
+
+        around = [(rank, profile.pk) for rank, profile in self.leaderboard.around(self.profiles[2], 1)]
+        self.assertEqual(around, [(2, self.profiles[1].pk), (3, self.profiles[2].pk), (4, self.profiles[3].pk)])
+
+        # Profile ranks still count only users with more points
+        self.assertEqual(self.leaderboard.rank_of(30), 2)
+
+    def test_around_agrees_with_top_when_another_process_changed_points(self):
+        self.leaderboard.get_index()
+        # Written by another worker; this process's index doesn't see it yet
+        UserProfile.objects.filter(pk=self.profiles[3].pk).update(total_points=100)
+
+        top = {profile.pk: rank for rank, profile in self.leaderboard.top(4)}
+        profile = UserProfile.objects.get(pk=self.profiles[2].pk)
+        around = {profile.pk: rank for rank, profile in self.leaderboard.around(profile, 1)}
+        self.assertEqual(around, {pk: top[pk] for pk in around})
+        self.assertEqual(top[self.profiles[3].pk], 1)
+
+    def test_changes_during_rebuild_are_replayed(self):
+        def index_after_a_commit(**kwargs):
+            # Another request commits a change after the totals were read
+            with self.captureOnCommitCallbacks(execute=True):
+                self.leaderboard.record_change(10, 60)
+            return PointsIndex(**kwargs)
+
+        with mock.patch('apps.gamification.leaderboard.PointsIndex', side_effect=index_after_a_commit):
+            self.leaderboard.rebuild()
+        self.assertEqual(self.leaderboard.rank_of(60), 1)
+        self.assertEqual(len(self.leaderboard.get_index()), 4)
+
+
+class WindowLeaderboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        start = period_start(WEEK, timezone.localdate())
+        cls.users = []
+        for i, points in enumerate([50, 30, 30, 10]):
+            user = User.objects.create_user(f'player{i}', f'player{i}@example.com', 'password')
+            PointsRollup.objects.create(user=user, period=WEEK, period_start=start, points=points)
+            cls.users.append(user)
+
+    def test_window_ranks_are_sequential_like_the_all_time_board(self):
+        window = WindowLeaderboard(WEEK)
+        ranks = [(rank, rollup.user_id) for rank, rollup in window.top(4)]
+        self.assertEqual(ranks, [(i + 1, user.pk) for i, user in enumerate(self.users)])
 
-# Create your tests here.
+        around = [(rank, rollup.user_id) for rank, rollup in window.around(self.users[2], 1)]
+        self.assertEqual(around, [(2, self.users[1].pk), (3, self.users[2].pk), (4, self.users[3].pk)])
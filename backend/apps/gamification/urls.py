@@ -18,6 +18,7 @@ urlpatterns = [
     # Points
     path('points/history/', views.PointTransactionListView.as_view(), name='point-history'),
     path('points/award/', views.AwardPointsView.as_view(), name='award-points'),
+    path('points/award/bulk/', views.BulkAwardPointsView.as_view(), name='bulk-award-points'),
     
     # Leaderboard
     path('leaderboard/', views.LeaderboardView.as_view(), name='leaderboard'),
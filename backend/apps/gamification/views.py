@@ -7,10 +7,14 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.contrib.auth import get_user_model
 
+from .badges import evaluate
+from .leaderboard import leaderboard
+from .point_windows import PERIOD_ALIASES, WindowLeaderboard
+from .points import award_points
 from .models import Badge, UserBadge, Level, UserProfile, PointTransaction
 from .serializers import (
     BadgeSerializer, UserBadgeSerializer, LevelSerializer, UserProfileSerializer,
-    PointTransactionSerializer, LeaderboardEntrySerializer, UserStatsSerializer,
+    PointTransactionSerializer, PointAwardSerializer, LeaderboardEntrySerializer, UserStatsSerializer,
     GamificationSummarySerializer
 )
 
@@ -83,13 +87,11 @@ class UserStatsView(APIView):
         user = request.user
         profile, created = UserProfile.objects.get_or_create(user=user)
         
-        # Calculate rank
-        higher_users = UserProfile.objects.filter(total_points__gt=profile.total_points).count()
-        rank = higher_users + 1
+        rank = leaderboard.rank_of(profile.total_points)
         
         stats = {
             'total_points': profile.total_points,
-            'current_level': profile.current_level.level_number if profile.current_level else 0,
+            'current_level': profile.level.level_number if profile.level else 0,
             'badges_earned': profile.badges_earned,
             'rank': rank,
             'login_streak': profile.current_login_streak,
@@ -112,30 +114,55 @@ class PointTransactionListView(generics.ListAPIView):
         ).order_by('-created_at')
 
 
+def leaderboard_entry(rank, profile, score, user=None):
+    user = user or profile.user
+    return {
+        'rank': rank,
+        'user_id': user.id,
+        'username': user.username,
+        'score': score,
+        'level': profile.level.level_number if profile and profile.level else 0,
+        'badges_count': profile.badges_earned if profile else 0
+    }
+
+
 class LeaderboardView(APIView):
-    """Get leaderboard data"""
+    """
+    Get leaderboard data. For points, ``around_me=true`` returns the caller
+    and ``limit`` neighbours either side instead of the top of the board,
+    and ``period`` (daily/weekly/monthly) ranks points gained in the
+    current window instead of all-time totals.
+    """
     permission_classes = [permissions.AllowAny]
 
     def get(self, request):
         leaderboard_type = request.query_params.get('type', 'points')
         time_period = request.query_params.get('period', 'all_time')
         limit = int(request.query_params.get('limit', 10))
+        around_me = request.query_params.get('around_me') == 'true' and request.user.is_authenticated
         
         # Base queryset
         profiles = UserProfile.objects.select_related('user', 'current_level')
         
-        if leaderboard_type == 'points':
-            top_profiles = profiles.order_by('-total_points')[:limit]
-            leaderboard_data = []
-            for i, profile in enumerate(top_profiles):
-                leaderboard_data.append({
-                    'rank': i + 1,
-                    'user_id': profile.user.id,
-                    'username': profile.user.username,
-                    'score': profile.total_points,
-                    'level': profile.current_level.level_number if profile.current_level else 0,
-                    'badges_count': profile.badges_earned
-                })
+        if leaderboard_type == 'points' and time_period in PERIOD_ALIASES:
+            window = WindowLeaderboard(PERIOD_ALIASES[time_period])
+            entries = window.around(request.user, limit) if around_me else window.top(limit)
+            leaderboard_data = [
+                leaderboard_entry(
+                    rank, getattr(rollup.user, 'gamification_profile', None), rollup.points, user=rollup.user
+                )
+                for rank, rollup in entries
+            ]
+        
+        elif leaderboard_type == 'points':
+            if around_me:
+                profile, created = UserProfile.objects.get_or_create(user=request.user)
+                entries = leaderboard.around(profile, limit)
+            else:
+                entries = leaderboard.top(limit)
+            leaderboard_data = [
+                leaderboard_entry(rank, profile, profile.total_points) for rank, profile in entries
+            ]
         
         elif leaderboard_type == 'level':
             top_profiles = profiles.exclude(current_level=None).order_by(
@@ -190,7 +217,7 @@ class AwardPointsView(APIView):
             return Response({
                 'message': f'Awarded {awarded_points} points to {user.username}',
                 'new_total': profile.total_points,
-                'level': profile.current_level.name if profile.current_level else 'No level'
+                'level': profile.level.name if profile.level else 'No level'
             })
             
         except User.DoesNotExist:
@@ -205,56 +232,44 @@ class AwardPointsView(APIView):
             )
 
 
+class BulkAwardPointsView(APIView):
+    """
+    Award points to many users in one request (admin only), e.g. for a
+    campaign: ``{"awards": [{"user_id": 1, "points": 50, "reason": "..."}]}``
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request):
+        serializer = PointAwardSerializer(data=request.data.get('awards'), many=True, allow_empty=False)
+        serializer.is_valid(raise_exception=True)
+        awards = serializer.validated_data
+
+        user_ids = {award['user_id'] for award in awards}
+        missing = user_ids - set(User.objects.filter(id__in=user_ids).values_list('id', flat=True))
+        if missing:
+            return Response(
+                {'error': 'Users not found', 'user_ids': sorted(missing)},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        totals = award_points((award['user_id'], award['points'], award['reason']) for award in awards)
+        return Response({
+            'awarded': len(awards),
+            'users': len(totals),
+            'points': sum(award['points'] for award in awards),
+        })
+
+
 class CheckBadgeProgressView(APIView):
-    """Check and update badge progress for a user"""
+    """
+    Re-check every badge for the caller. Badges are normally awarded as
+    events happen (see ``badges``); this catches up after rule changes.
+    """
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request):
-        user = request.user
-        profile, created = UserProfile.objects.get_or_create(user=user)
-        
-        # Check all active badges for potential awards
-        badges_earned = []
-        badges = Badge.objects.filter(is_active=True)
-        
-        for badge in badges:
-            user_badge, created = UserBadge.objects.get_or_create(
-                user=user, badge=badge, defaults={'earned': False}
-            )
-            
-            if not user_badge.earned:
-                # Check badge conditions based on condition_type
-                should_award = False
-                
-                if badge.condition_type == 'total_points':
-                    should_award = profile.total_points >= badge.condition_value
-                elif badge.condition_type == 'applications_submitted':
-                    should_award = profile.applications_submitted >= badge.condition_value
-                elif badge.condition_type == 'resources_completed':
-                    should_award = profile.resources_completed >= badge.condition_value
-                elif badge.condition_type == 'forum_posts':
-                    should_award = profile.forum_posts >= badge.condition_value
-                elif badge.condition_type == 'login_streak':
-                    should_award = profile.current_login_streak >= badge.condition_value
-                elif badge.condition_type == 'badges_earned':
-                    should_award = profile.badges_earned >= badge.condition_value
-                
-                if should_award:
-                    user_badge.earned = True
-                    user_badge.progress = badge.condition_value
-                    user_badge.save()
-                    
-                    profile.badges_earned += 1
-                    if badge.rarity in ['rare', 'epic', 'legendary']:
-                        profile.rare_badges_earned += 1
-                    
-                    # Award points if specified
-                    if badge.points_required > 0:
-                        profile.add_points(badge.points_required, f"Earned badge: {badge.name}")
-                    
-                    badges_earned.append(badge)
-        
-        profile.save()
+        badges_earned = evaluate(request.user)
+        profile = UserProfile.objects.get(user=request.user)
         
         return Response({
             'badges_earned': [{'name': b.name, 'icon': b.icon, 'rarity': b.rarity} for b in badges_earned],
@@ -274,20 +289,9 @@ class GamificationSummaryView(APIView):
         )['total'] or 0
         
         # Top 5 performers
-        top_performers = UserProfile.objects.select_related('user', 'current_level').order_by(
-            '-total_points'
-        )[:5]
-        
-        top_performers_data = []
-        for i, profile in enumerate(top_performers):
-            top_performers_data.append({
-                'rank': i + 1,
-                'user_id': profile.user.id,
-                'username': profile.user.username,
-                'score': profile.total_points,
-                'level': profile.current_level.level_number if profile.current_level else 0,
-                'badges_count': profile.badges_earned
-            })
+        top_performers_data = [
+            leaderboard_entry(rank, profile, profile.total_points) for rank, profile in leaderboard.top(5)
+        ]
         
         summary_data = {
             'total_users': total_users,
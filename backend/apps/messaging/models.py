@@ -37,11 +37,16 @@ class Conversation(models.Model):
 
     @property
     def last_message(self):
-        return self.messages.order_by('-created_at').first()
+        # Lists prefetch it as ``latest_messages`` (see ConversationViewSet.get_queryset)
+        if hasattr(self, 'latest_messages'):
+            return self.latest_messages[0] if self.latest_messages else None
+        return self.messages.select_related('sender').order_by('-created_at').first()
 
     def get_other_participant(self, user):
         """Get the other participant in a 2-person conversation"""
-        return self.participants.exclude(id=user.id).first()
+        # Goes through all() so a prefetched participants list is reused
+        others = [participant for participant in self.participants.all() if participant.id != user.id]
+        return min(others, key=lambda participant: participant.id, default=None)
 
 
 class Message(models.Model):
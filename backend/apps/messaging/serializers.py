@@ -1,11 +1,31 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.db.models import Count
+from django.db.models.manager import BaseManager
 from .models import Conversation, Message, MessageRead
 from apps.mentors.models import MentorProfile
+from core.loaders import ViewerBatchListSerializer, ViewerLoader, viewer_loaders
 
 User = get_user_model()
 
 
+def fetch_read_messages(user, message_ids):
+    reads = MessageRead.objects.filter(user=user, message_id__in=message_ids)
+    return dict.fromkeys(reads.values_list('message_id', flat=True), True)
+
+
+def fetch_unread_counts(user, conversation_ids):
+    unread = (
+        Message.objects
+        .filter(conversation_id__in=conversation_ids)
+        .exclude(read_by=user)
+        .exclude(sender=user)
+        .values('conversation_id')
+        .annotate(count=Count('id'))
+    )
+    return {row['conversation_id']: row['count'] for row in unread}
+
+
 class UserBasicSerializer(serializers.ModelSerializer):
     """Basic user info for messaging"""
     class Meta:
@@ -18,6 +38,8 @@ class MessageSerializer(serializers.ModelSerializer):
     sender = UserBasicSerializer(read_only=True)
     is_read = serializers.SerializerMethodField()
 
+    read_loader = ViewerLoader(fetch_read_messages, default=False)
+
     class Meta:
         model = Message
         fields = [
@@ -25,13 +47,11 @@ class MessageSerializer(serializers.ModelSerializer):
             'message_type', 'created_at', 'is_read'
         ]
         read_only_fields = ['id', 'sender', 'created_at']
+        list_serializer_class = ViewerBatchListSerializer
 
     def get_is_read(self, obj):
         """Check if current user has read this message"""
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return obj.is_read_by(request.user)
-        return False
+        return self.read_loader.load(self, obj)
 
     def create(self, validated_data):
         """Create a new message"""
@@ -40,6 +60,17 @@ class MessageSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class ConversationListSerializer(ViewerBatchListSerializer):
+    """Also primes the nested last message's loaders, so the inbox reads them in one query"""
+
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, BaseManager) else data)
+        last_messages = [item.last_message for item in items]
+        for loader in viewer_loaders(MessageSerializer):
+            loader.prime(self.context, [message.pk for message in last_messages if message is not None])
+        return super().to_representation(items)
+
+
 class ConversationSerializer(serializers.ModelSerializer):
     """Serializer for conversations"""
     participants = UserBasicSerializer(many=True, read_only=True)
@@ -47,6 +78,8 @@ class ConversationSerializer(serializers.ModelSerializer):
     unread_count = serializers.SerializerMethodField()
     other_participant = serializers.SerializerMethodField()
 
+    unread_count_loader = ViewerLoader(fetch_unread_counts, default=0)
+
     class Meta:
         model = Conversation
         fields = [
@@ -54,17 +87,11 @@ class ConversationSerializer(serializers.ModelSerializer):
             'unread_count', 'other_participant', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+        list_serializer_class = ConversationListSerializer
 
     def get_unread_count(self, obj):
         """Get unread message count for current user"""
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return obj.messages.exclude(
-                read_by=request.user
-            ).exclude(
-                sender=request.user
-            ).count()
-        return 0
+        return self.unread_count_loader.load(self, obj)
 
     def get_other_participant(self, obj):
         """Get the other participant in conversation"""
@@ -27,7 +27,11 @@ class ConversationViewSet(viewsets.ModelViewSet):
         ).prefetch_related(
             'participants',
             'mentor',
-            Prefetch('messages', queryset=Message.objects.order_by('-created_at')[:1])
+            Prefetch(
+                'messages',
+                queryset=Message.objects.select_related('sender').order_by('-created_at')[:1],
+                to_attr='latest_messages',
+            )
         ).order_by('-updated_at')
 
     def create(self, request, *args, **kwargs):
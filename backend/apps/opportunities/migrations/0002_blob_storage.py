@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:16
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('opportunities', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='opportunity',
+            name='organization_logo',
+            field=models.ImageField(blank=True, null=True, storage=core.storage.get_blob_storage, upload_to='organizations/'),
+        ),
+    ]
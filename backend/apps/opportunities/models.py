@@ -3,6 +3,8 @@ from django.conf import settings
 from django.utils import timezone
 from taggit.managers import TaggableManager
 
+from core.storage import get_blob_storage
+
 
 class OpportunityCategory(models.Model):
     """
@@ -50,7 +52,7 @@ class Opportunity(models.Model):
     
     # Organization/Company
     organization = models.CharField(max_length=200)
-    organization_logo = models.ImageField(upload_to='organizations/', blank=True, null=True)
+    organization_logo = models.ImageField(upload_to='organizations/', storage=get_blob_storage, blank=True, null=True)
     organization_website = models.URLField(blank=True)
     
     # Details
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.utils import timezone
+from core.images import ResponsiveImageField
 from .models import Opportunity, OpportunityCategory
 from apps.applications.models import Application
 
@@ -17,6 +18,7 @@ class OpportunitySerializer(serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
     match_score = serializers.IntegerField(read_only=True, default=75)
     days_remaining = serializers.SerializerMethodField()
+    organization_logo_srcset = ResponsiveImageField(source='organization_logo')
     
     def get_days_remaining(self, obj):
         if obj.application_deadline:
@@ -27,7 +29,8 @@ class OpportunitySerializer(serializers.ModelSerializer):
     class Meta:
         model = Opportunity
         fields = [
-            'id', 'title', 'organization', 'organization_logo', 'location', 'remote_allowed',
+            'id', 'title', 'organization', 'organization_logo', 'organization_logo_srcset',
+            'location', 'remote_allowed',
             'category', 'category_name', 'difficulty_level', 'description', 'requirements',
             'salary_min', 'salary_max', 'currency', 'benefits',
             'application_deadline', 'start_date', 'end_date', 'external_url',
@@ -7,7 +7,7 @@ from django.db.models import Q, Case, When, IntegerField
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
 from django.utils import timezone
-from .models import Opportunity, SavedOpportunity, OpportunityRecommendation
+from .models import Opportunity, SavedOpportunity, OpportunityRecommendation, OpportunityView
 from .serializers import (
     OpportunitySerializer, 
     OpportunitySearchSerializer,
@@ -16,10 +16,13 @@ from .serializers import (
 from apps.applications.models import Application
 from apps.applications.serializers import ApplicationSerializer
 from apps.ai_services.gemini_service import gemini_service
+from apps.analytics.view_tracking import TrackedView, view_tracker
 import logging
 
 logger = logging.getLogger(__name__)
 
+OPPORTUNITY_VIEWS = TrackedView(OpportunityView, 'opportunity', 'views_count', unique=True)
+
 
 class OpportunityViewSet(viewsets.ReadOnlyModelViewSet):
     """
@@ -47,6 +50,13 @@ class OpportunityViewSet(viewsets.ReadOnlyModelViewSet):
         
         return queryset.distinct()
 
+    def retrieve(self, request, *args, **kwargs):
+        """Get opportunity details and track the view"""
+        instance = self.get_object()
+        view_tracker.record(OPPORTUNITY_VIEWS, instance.id, request)
+        serializer = self.get_serializer(instance)
+        return Response(serializer.data)
+
     @action(detail=True, methods=['post'])
     def apply(self, request, pk=None):
         """Apply to an opportunity"""
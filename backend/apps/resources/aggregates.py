@@ -0,0 +1,56 @@
+"""
+Maintenance for the denormalized rating columns on Resource.
+
+Ratings keep ``rating_sum``/``rating_count``/``rating_avg`` up to date as
+they change (see ``Resource.apply_rating_change``); this recomputes them
+from the ratings table for when rows were changed some other way, e.g. in
+the admin or a data fix.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Sum
+
+
+def rating_average(rating_sum, rating_count):
+    if not rating_count:
+        return Decimal('0.00')
+    return (Decimal(rating_sum) / rating_count).quantize(Decimal('0.01'))
+
+
+def rebuild_rating_aggregates(batch_size=1000):
+    """Recompute rating aggregates for every resource; returns the number of resources fixed"""
+    from .models import Resource as resource_model, ResourceRating as rating_model
+
+    fixed = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            resources = list(
+                resource_model.objects
+                .select_for_update()
+                .filter(id__gt=last_id)
+                .order_by('id')
+                .only('id', 'rating_sum', 'rating_count', 'rating_avg')[:batch_size]
+            )
+            if not resources:
+                return fixed
+            totals = {
+                row['resource_id']: row
+                for row in rating_model.objects
+                .filter(resource_id__in=[resource.id for resource in resources])
+                .values('resource_id')
+                .annotate(total=Sum('rating'), count=Count('id'))
+            }
+
+            stale = []
+            for resource in resources:
+                row = totals.get(resource.id, {'total': 0, 'count': 0})
+                expected = (row['total'], row['count'], rating_average(row['total'], row['count']))
+                if (resource.rating_sum, resource.rating_count, resource.rating_avg) != expected:
+                    resource.rating_sum, resource.rating_count, resource.rating_avg = expected
+                    stale.append(resource)
+            resource_model.objects.bulk_update(stale, ['rating_sum', 'rating_count', 'rating_avg'])
+
+        fixed += len(stale)
+        last_id = resources[-1].id
@@ -1,6 +1,47 @@
 from django.apps import AppConfig
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save, pre_delete
+
+
+def reindex_tagged_resource(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep the search index in step with resource tags (taggit sends m2m_changed)"""
+    from .models import Resource
+    from .search import index_resources
+
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse and isinstance(instance, Resource):
+        index_resources([instance.pk])
+
+
+def reindex_renamed_tag(sender, instance, created, **kwargs):
+    """A renamed tag changes the indexed text of every resource carrying it"""
+    from .search import reindex_resources, tagged_resource_ids
+
+    if not created:
+        reindex_resources(tagged_resource_ids(instance))
+
+
+def reindex_deleted_tag(sender, instance, **kwargs):
+    """Deleting a tag removes it from its resources once the delete commits"""
+    from .search import reindex_resources, tagged_resource_ids
+
+    ids = tagged_resource_ids(instance)
+    if ids:
+        transaction.on_commit(lambda: reindex_resources(ids))
 
 
 class ResourcesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.resources'
+
+    def ready(self):
+        from taggit.models import Tag
+
+        from .models import Resource
+
+        m2m_changed.connect(
+            reindex_tagged_resource, sender=Resource.tags.through, dispatch_uid='resources.reindex_tagged_resource'
+        )
+        post_save.connect(reindex_renamed_tag, sender=Tag, dispatch_uid='resources.reindex_renamed_tag')
+        pre_delete.connect(reindex_deleted_tag, sender=Tag, dispatch_uid='resources.reindex_deleted_tag')
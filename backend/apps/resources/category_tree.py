@@ -0,0 +1,173 @@
+"""
+Closure table for the ResourceCategory hierarchy.
+
+``ResourceCategoryClosure`` holds one row per (ancestor, descendant) pair,
+including each category paired with itself at depth 0. A whole subtree is
+then one indexed lookup on ``ancestor`` and a category's ancestors one
+lookup on ``descendant``, whatever the depth:
+
+    Resource.objects.filter(category__ancestor_links__ancestor=category)
+
+Each category also caches how many published resources it holds directly
+(``resource_count``) and in its whole subtree (``subtree_resource_count``).
+``Resource.save()``/``delete()`` keep both in step; ``rebuild_category_tree``
+(``manage.py rebuild_category_tree``) recomputes the closure and counts from
+``parent`` for when rows were changed some other way (queryset updates,
+cascading deletes of authors, data fixes).
+"""
+from collections import Counter
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, F
+
+
+def category_models():
+    from .models import Resource, ResourceCategory, ResourceCategoryClosure
+
+    return ResourceCategory, ResourceCategoryClosure, Resource
+
+
+def insert_category(category):
+    """Add closure rows for a new category: itself plus every ancestor of its parent"""
+    _, closure_model, _ = category_models()
+    rows = [closure_model(ancestor_id=category.pk, descendant_id=category.pk, depth=0)]
+    if category.parent_id:
+        rows += [
+            closure_model(ancestor_id=ancestor_id, descendant_id=category.pk, depth=depth + 1)
+            for ancestor_id, depth in closure_model.objects
+            .filter(descendant_id=category.parent_id)
+            .values_list('ancestor_id', 'depth')
+        ]
+    closure_model.objects.bulk_create(rows)
+
+
+def is_descendant(category_id, ancestor_id):
+    _, closure_model, _ = category_models()
+    return closure_model.objects.filter(ancestor_id=ancestor_id, descendant_id=category_id).exists()
+
+
+@transaction.atomic
+def move_category(category, old_parent_id):
+    """
+    Re-link the subtree under ``category`` after its parent changed from
+    ``old_parent_id``, carrying its published-resource count along.
+    """
+    category_model, closure_model, _ = category_models()
+    if category.parent_id and is_descendant(category.parent_id, category.pk):
+        raise ValidationError({'parent': 'A category cannot be placed under itself or its subcategories.'})
+
+    subtree = list(closure_model.objects.filter(ancestor_id=category.pk).values_list('descendant_id', 'depth'))
+    subtree_ids = [descendant_id for descendant_id, _ in subtree]
+    moved_count = (
+        category_model.objects.filter(pk=category.pk).values_list('subtree_resource_count', flat=True).first() or 0
+    )
+
+    if old_parent_id:
+        old_ancestor_ids = list(
+            closure_model.objects.filter(descendant_id=old_parent_id).values_list('ancestor_id', flat=True)
+        )
+        closure_model.objects.filter(ancestor_id__in=old_ancestor_ids, descendant_id__in=subtree_ids).delete()
+        category_model.objects.filter(pk__in=old_ancestor_ids).update(
+            subtree_resource_count=F('subtree_resource_count') - moved_count
+        )
+
+    if category.parent_id:
+        new_ancestors = list(
+            closure_model.objects.filter(descendant_id=category.parent_id).values_list('ancestor_id', 'depth')
+        )
+        closure_model.objects.bulk_create([
+            closure_model(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=ancestor_depth + depth + 1)
+            for ancestor_id, ancestor_depth in new_ancestors
+            for descendant_id, depth in subtree
+        ])
+        category_model.objects.filter(pk__in=[ancestor_id for ancestor_id, _ in new_ancestors]).update(
+            subtree_resource_count=F('subtree_resource_count') + moved_count
+        )
+
+
+def remove_category(category):
+    """Take a category's subtree count off its ancestors before the subtree is deleted"""
+    category_model, _, _ = category_models()
+    if not category.parent_id:
+        return
+    removed = (
+        category_model.objects.filter(pk=category.pk).values_list('subtree_resource_count', flat=True).first() or 0
+    )
+    if removed:
+        category_model.objects.filter(descendant_links__descendant_id=category.parent_id).update(
+            subtree_resource_count=F('subtree_resource_count') - removed
+        )
+
+
+def adjust_resource_counts(category_id, delta):
+    """Add ``delta`` published resources to a category and every category above it"""
+    if not category_id or not delta:
+        return
+    category_model, _, _ = category_models()
+    category_model.objects.filter(pk=category_id).update(resource_count=F('resource_count') + delta)
+    category_model.objects.filter(descendant_links__descendant_id=category_id).update(
+        subtree_resource_count=F('subtree_resource_count') + delta
+    )
+
+
+def rebuild_category_tree():
+    """Recompute the closure table and cached counts from ``parent``; returns the number of categories"""
+    category_model, closure_model, resource_model = category_models()
+
+    with transaction.atomic():
+        categories = list(category_model.objects.select_for_update().only('id', 'parent_id'))
+        parents = {category.id: category.parent_id for category in categories}
+
+        direct = Counter(dict(
+            resource_model.objects.filter(is_published=True)
+            .values('category_id').annotate(count=Count('id'))
+            .values_list('category_id', 'count')
+        ))
+        subtree = Counter()
+        rows = []
+        for category_id in parents:
+            ancestor_id, depth, seen = category_id, 0, set()
+            # ``seen`` stops at a cycle left behind by a bad data fix
+            while ancestor_id is not None and ancestor_id not in seen:
+                seen.add(ancestor_id)
+                rows.append(closure_model(ancestor_id=ancestor_id, descendant_id=category_id, depth=depth))
+                subtree[ancestor_id] += direct[category_id]
+                ancestor_id, depth = parents.get(ancestor_id), depth + 1
+
+        closure_model.objects.all().delete()
+        closure_model.objects.bulk_create(rows, batch_size=1000)
+
+        for category in categories:
+            category.resource_count = direct[category.id]
+            category.subtree_resource_count = subtree[category.id]
+        category_model.objects.bulk_update(categories, ['resource_count', 'subtree_resource_count'], batch_size=1000)
+    return len(categories)
+
+
+def build_category_tree(categories):
+    """
+    Attach ``tree_children`` to each category and return those whose parent
+    is not among ``categories``. Children keep the order they were given in.
+    """
+    by_id = {category.id: category for category in categories}
+    roots = []
+    for category in categories:
+        category.tree_children = []
+    for category in categories:
+        parent = by_id.get(category.parent_id)
+        if parent is None:
+            roots.append(category)
+        else:
+            parent.tree_children.append(category)
+    return roots
+
+
+def load_subtree(category, **filters):
+    """Fetch every descendant of ``category`` matching ``filters`` in one query and attach the tree to it"""
+    category_model, _, _ = category_models()
+    descendants = list(
+        category_model.objects.filter(ancestor_links__ancestor=category, **filters).exclude(pk=category.pk)
+    )
+    build_category_tree([category] + descendants)
+    return category
@@ -0,0 +1,42 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from core.storage import blob_storage, digest_from_name
+
+
+class Command(BaseCommand):
+    help = (
+        'Move uploads stored before content-addressed storage into blobs, '
+        'so existing duplicates are kept once'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be moved')
+
+    def handle(self, *args, **options):
+        moved = missing = 0
+        for model, field in blob_storage.referencing_fields():
+            rows = (
+                model._default_manager
+                .exclude(**{field.name: ''})
+                .exclude(**{f'{field.name}__isnull': True})
+                .values_list('pk', field.name)
+            )
+            for pk, name in rows.iterator():
+                if digest_from_name(name):
+                    continue
+                if not default_storage.exists(name):
+                    missing += 1
+                    self.stdout.write(self.style.WARNING(f'{model._meta.label}#{pk}: {name} is missing'))
+                    continue
+                moved += 1
+                if options['dry_run']:
+                    continue
+                with default_storage.open(name, 'rb') as content:
+                    blob = blob_storage.save(name, content)
+                model._default_manager.filter(pk=pk).update(**{field.name: blob})
+                # Removed only once no other row still points at the old name
+                blob_storage.delete(name)
+
+        action = 'Would move' if options['dry_run'] else 'Moved'
+        self.stdout.write(self.style.SUCCESS(f'{action} {moved} files into content-addressed storage ({missing} missing)'))
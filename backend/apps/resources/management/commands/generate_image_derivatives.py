@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from core.images import generate_derivatives, is_image_name
+from core.storage import BLOB_DIRECTORY, blob_storage, digest_from_name
+
+
+class Command(BaseCommand):
+    help = 'Render missing responsive derivatives for image blobs already in storage'
+
+    def handle(self, *args, **options):
+        blobs = set()
+        for model, field in blob_storage.referencing_fields():
+            names = (
+                model._default_manager
+                .filter(**{f'{field.name}__contains': f'{BLOB_DIRECTORY}/'})
+                .values_list(field.name, flat=True)
+                .distinct()
+            )
+            blobs.update(name for name in names.iterator() if digest_from_name(name) and is_image_name(name))
+
+        rendered = failed = 0
+        for blob in sorted(blobs):
+            try:
+                rendered += generate_derivatives(blob)
+            except Exception as e:
+                failed += 1
+                self.stdout.write(self.style.WARNING(f'{blob}: {e}'))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rendered {rendered} derivatives for {len(blobs)} images ({failed} failed)'
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.resources.category_tree import rebuild_category_tree
+
+
+class Command(BaseCommand):
+    help = 'Recompute the ResourceCategory closure table and cached resource counts from parent links'
+
+    def handle(self, *args, **options):
+        count = rebuild_category_tree()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt the category tree for {count} categories'))
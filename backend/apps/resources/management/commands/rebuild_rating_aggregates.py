@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.resources.aggregates import rebuild_rating_aggregates
+
+
+class Command(BaseCommand):
+    help = 'Recompute Resource rating_sum/rating_count/rating_avg from the ratings table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Resources recomputed per transaction')
+
+    def handle(self, *args, **options):
+        fixed = rebuild_rating_aggregates(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Updated rating aggregates for {fixed} resources'))
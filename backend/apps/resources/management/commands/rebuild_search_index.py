@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.resources.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Reindex every resource for full-text search'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Resources indexed per batch')
+
+    def handle(self, *args, **options):
+        indexed = rebuild_search_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} resources'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from apps.resources.rollups import prune_rollups, rebuild_rollups, refresh_scores
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute resource popularity and trending scores from the daily rollups and drop '
+        'rollups older than every score window (run periodically, e.g. hourly from cron)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild-days', type=int, default=0,
+                            help='First rebuild this many days of rollups from the raw view, download and rating rows')
+
+    def handle(self, *args, **options):
+        if options['rebuild_days']:
+            rows = rebuild_rollups(options['rebuild_days'])
+            self.stdout.write(f"Rebuilt {rows} daily rollup rows for the last {options['rebuild_days']} days")
+        active = refresh_scores()
+        pruned = prune_rollups()
+        self.stdout.write(self.style.SUCCESS(
+            f'Refreshed scores; {active} resources had recent activity, {pruned} old rollup rows dropped'
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.resources.workshops import sync_active_registrations
+
+
+class Command(BaseCommand):
+    help = 'Recompute every workshop\'s seat counter from its active registrations'
+
+    def handle(self, *args, **options):
+        count = sync_active_registrations()
+        self.stdout.write(self.style.SUCCESS(f'Synced seat counters for {count} workshops'))
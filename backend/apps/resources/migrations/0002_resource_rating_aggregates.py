@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:11
+
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def populate_rating_aggregates(apps, schema_editor):
+    """Fill in rating sums, counts and averages for existing resources"""
+    Resource = apps.get_model('resources', 'Resource')
+    ResourceRating = apps.get_model('resources', 'ResourceRating')
+
+    totals = ResourceRating.objects.values('resource_id').annotate(total=Sum('rating'), count=Count('id'))
+    resources = []
+    for row in totals.order_by('resource_id').iterator():
+        average = (Decimal(row['total']) / row['count']).quantize(Decimal('0.01'))
+        resources.append(Resource(
+            id=row['resource_id'], rating_sum=row['total'], rating_count=row['count'], rating_avg=average
+        ))
+        if len(resources) >= 1000:
+            Resource.objects.bulk_update(resources, ['rating_sum', 'rating_count', 'rating_avg'])
+            resources = []
+    if resources:
+        Resource.objects.bulk_update(resources, ['rating_sum', 'rating_count', 'rating_avg'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0001_initial'),
+        ('taggit', '0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resource',
+            name='rating_avg',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=3),
+        ),
+        migrations.AddField(
+            model_name='resource',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='resource',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='resource',
+            index=models.Index(fields=['rating_avg'], name='resources_r_rating__8eb365_idx'),
+        ),
+        migrations.RunPython(populate_rating_aggregates, migrations.RunPython.noop),
+    ]
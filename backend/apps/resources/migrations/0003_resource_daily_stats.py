@@ -0,0 +1,117 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:13
+
+from collections import defaultdict
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+POPULAR_WINDOW_DAYS = getattr(settings, 'RESOURCE_POPULAR_WINDOW_DAYS', 30)
+TRENDING_WINDOW_DAYS = getattr(settings, 'RESOURCE_TRENDING_WINDOW_DAYS', 7)
+
+
+def backfill_rollups(apps, schema_editor):
+    """Roll up the popular window from the raw rows and score it, so the lists aren't empty until the first refresh"""
+    Resource = apps.get_model('resources', 'Resource')
+    ResourceDailyStats = apps.get_model('resources', 'ResourceDailyStats')
+
+    today = timezone.localdate()
+    since = today - timedelta(days=POPULAR_WINDOW_DAYS - 1)
+    sources = [
+        ('views', 'ResourceView', 'viewed_at'),
+        ('downloads', 'ResourceDownload', 'downloaded_at'),
+        ('ratings', 'ResourceRating', 'created_at'),
+    ]
+    counts = defaultdict(lambda: {'views': 0, 'downloads': 0, 'ratings': 0})
+    for field, model_name, timestamp in sources:
+        rows = (
+            apps.get_model('resources', model_name).objects
+            .annotate(day=TruncDate(timestamp))
+            .filter(day__gte=since)
+            .values('resource_id', 'day')
+            .annotate(count=Count('id'))
+        )
+        for row in rows:
+            counts[(row['resource_id'], row['day'])][field] = row['count']
+
+    ResourceDailyStats.objects.bulk_create(
+        [
+            ResourceDailyStats(resource_id=resource_id, day=day, **activity)
+            for (resource_id, day), activity in counts.items()
+        ],
+        batch_size=1000,
+    )
+
+    popular = defaultdict(int)
+    trending = defaultdict(int)
+    for (resource_id, day), activity in counts.items():
+        score = activity['views'] + activity['downloads'] + 2 * activity['ratings']
+        popular[resource_id] += score
+        if day > today - timedelta(days=TRENDING_WINDOW_DAYS):
+            trending[resource_id] += score
+    Resource.objects.bulk_update(
+        [
+            Resource(id=resource_id, popularity_score=score, trending_score=trending[resource_id])
+            for resource_id, score in popular.items()
+        ],
+        ['popularity_score', 'trending_score'],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0002_resource_rating_aggregates'),
+        ('taggit', '0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResourceDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('downloads', models.PositiveIntegerField(default=0)),
+                ('ratings', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='resource',
+            name='popularity_score',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='resource',
+            name='trending_score',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='resource',
+            index=models.Index(fields=['popularity_score'], name='resources_r_popular_5fc97d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resource',
+            index=models.Index(fields=['trending_score'], name='resources_r_trendin_99c572_idx'),
+        ),
+        migrations.AddField(
+            model_name='resourcedailystats',
+            name='resource',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='resources.resource'),
+        ),
+        migrations.AddIndex(
+            model_name='resourcedailystats',
+            index=models.Index(fields=['day'], name='resources_r_day_0eae85_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='resourcedailystats',
+            unique_together={('resource', 'day')},
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:16
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0003_resource_daily_stats'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='resource',
+            name='file',
+            field=models.FileField(blank=True, storage=core.storage.get_blob_storage, upload_to='resources/files/'),
+        ),
+        migrations.AlterField(
+            model_name='resource',
+            name='thumbnail',
+            field=models.ImageField(blank=True, storage=core.storage.get_blob_storage, upload_to='resources/thumbnails/'),
+        ),
+        migrations.AlterField(
+            model_name='workshop',
+            name='instructor_photo',
+            field=models.ImageField(blank=True, storage=core.storage.get_blob_storage, upload_to='resources/instructors/'),
+        ),
+    ]
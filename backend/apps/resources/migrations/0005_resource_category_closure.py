@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:21
+
+from collections import Counter
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_category_tree(apps, schema_editor):
+    """Build the closure table and resource counts for existing categories"""
+    ResourceCategory = apps.get_model('resources', 'ResourceCategory')
+    ResourceCategoryClosure = apps.get_model('resources', 'ResourceCategoryClosure')
+    Resource = apps.get_model('resources', 'Resource')
+
+    categories = list(ResourceCategory.objects.only('id', 'parent_id'))
+    parents = {category.id: category.parent_id for category in categories}
+    direct = Counter(dict(
+        Resource.objects.filter(is_published=True)
+        .values('category_id').annotate(count=Count('id'))
+        .values_list('category_id', 'count')
+    ))
+    subtree = Counter()
+    rows = []
+    for category_id in parents:
+        ancestor_id, depth, seen = category_id, 0, set()
+        while ancestor_id is not None and ancestor_id not in seen:
+            seen.add(ancestor_id)
+            rows.append(ResourceCategoryClosure(ancestor_id=ancestor_id, descendant_id=category_id, depth=depth))
+            subtree[ancestor_id] += direct[category_id]
+            ancestor_id, depth = parents.get(ancestor_id), depth + 1
+    ResourceCategoryClosure.objects.bulk_create(rows, batch_size=1000)
+
+    for category in categories:
+        category.resource_count = direct[category.id]
+        category.subtree_resource_count = subtree[category.id]
+    ResourceCategory.objects.bulk_update(categories, ['resource_count', 'subtree_resource_count'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0004_blob_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resourcecategory',
+            name='resource_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='resourcecategory',
+            name='subtree_resource_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='ResourceCategoryClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField()),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='resources.resourcecategory')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='resources.resourcecategory')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['descendant', 'depth'], name='resources_r_descend_8ef860_idx')],
+                'unique_together': {('ancestor', 'descendant')},
+            },
+        ),
+        migrations.RunPython(populate_category_tree, migrations.RunPython.noop),
+    ]
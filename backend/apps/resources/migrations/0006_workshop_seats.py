@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:23
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_active_registrations(apps, schema_editor):
+    """Count the seats already taken in every workshop"""
+    Workshop = apps.get_model('resources', 'Workshop')
+    WorkshopRegistration = apps.get_model('resources', 'WorkshopRegistration')
+
+    seats = (
+        WorkshopRegistration.objects
+        .filter(workshop=OuterRef('pk'), is_active=True)
+        .values('workshop')
+        .annotate(count=Count('id'))
+        .values('count')
+    )
+    Workshop.objects.update(active_registrations=Coalesce(Subquery(seats), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0005_resource_category_closure'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workshop',
+            name='active_registrations',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='workshopregistration',
+            name='waitlisted_at',
+            field=models.DateTimeField(blank=True, help_text='Set while waiting for a seat', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='workshopregistration',
+            index=models.Index(fields=['workshop', 'waitlisted_at'], name='resources_w_worksho_643b46_idx'),
+        ),
+        migrations.RunPython(populate_active_registrations, migrations.RunPython.noop),
+    ]
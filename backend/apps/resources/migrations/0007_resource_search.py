@@ -0,0 +1,88 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:27
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import TextField, Value
+
+
+FTS_TABLE = 'resources_resource_fts'
+FTS_COLUMNS = ('title', 'tags', 'description', 'content')
+
+
+def resource_tags(apps):
+    """{resource_id: 'space separated tag names'}"""
+    TaggedItem = apps.get_model('taggit', 'TaggedItem')
+    tags = {}
+    rows = TaggedItem.objects.filter(
+        content_type__app_label='resources', content_type__model='resource'
+    ).values_list('object_id', 'tag__name')
+    for resource_id, name in rows.iterator():
+        tags.setdefault(resource_id, []).append(name)
+    return {resource_id: ' '.join(names) for resource_id, names in tags.items()}
+
+
+def create_search_index(apps, schema_editor):
+    """Create the index and fill it for existing resources"""
+    Resource = apps.get_model('resources', 'Resource')
+    connection = schema_editor.connection
+    vendor = connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX resources_resource_search_idx ON resources_resource USING gin (search_vector)'
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5({', '.join(FTS_COLUMNS)}, tokenize='porter unicode61')"
+        )
+    else:
+        return
+
+    tags = resource_tags(apps)
+    if vendor == 'postgresql':
+        config = getattr(settings, 'RESOURCE_SEARCH_CONFIG', 'english')
+        for resource_id in Resource.objects.values_list('id', flat=True).iterator():
+            tag_names = Value(tags.get(resource_id, ''), output_field=TextField())
+            Resource.objects.filter(pk=resource_id).update(
+                search_vector=(
+                    SearchVector('title', weight='A', config=config)
+                    + SearchVector(tag_names, weight='B', config=config)
+                    + SearchVector('description', weight='C', config=config)
+                    + SearchVector('content', weight='D', config=config)
+                )
+            )
+    else:
+        rows = [
+            (resource_id, title, tags.get(resource_id, ''), description, content)
+            for resource_id, title, description, content
+            in Resource.objects.values_list('id', 'title', 'description', 'content').iterator()
+        ]
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, {", ".join(FTS_COLUMNS)}) VALUES (%s, %s, %s, %s, %s)', rows
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS resources_resource_search_idx')
+    elif vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0006_workshop_seats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resource',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
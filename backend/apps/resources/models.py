@@ -1,10 +1,22 @@
-from django.db import models
+from decimal import Decimal
+
+from django.contrib.postgres.search import SearchVectorField
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 from taggit.managers import TaggableManager
 
+from core.storage import get_blob_storage
+from .aggregates import rating_average
+from .category_tree import (
+    adjust_resource_counts, insert_category, is_descendant, move_category, remove_category
+)
+from .search import index_resources, remove_from_index
+from .workshops import promote_waitlist
+
 User = get_user_model()
 
 
@@ -17,6 +29,12 @@ class ResourceCategory(models.Model):
     icon = models.CharField(max_length=50, blank=True)  # Icon class name
     is_active = models.BooleanField(default=True)
     display_order = models.PositiveIntegerField(default=0)
+    
+    # Published resources, kept in step by Resource.save()/delete() (see category_tree.py)
+    resource_count = models.PositiveIntegerField(default=0)
+    subtree_resource_count = models.PositiveIntegerField(default=0)
+    COUNT_FIELDS = ('resource_count', 'subtree_resource_count')
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -27,6 +45,33 @@ class ResourceCategory(models.Model):
     def __str__(self):
         return self.name
 
+    def clean(self):
+        if self.pk and self.parent_id and (self.parent_id == self.pk or is_descendant(self.parent_id, self.pk)):
+            raise ValidationError({'parent': 'A category cannot be placed under itself or its subcategories.'})
+
+    def save(self, *args, **kwargs):
+        is_new = self._state.adding
+        old_parent_id = None
+        if not is_new:
+            old_parent_id = ResourceCategory.objects.filter(pk=self.pk).values_list('parent_id', flat=True).first()
+            if kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+                # The counts are maintained with F() updates; don't write back a stale copy
+                kwargs['update_fields'] = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key and field.name not in self.COUNT_FIELDS
+                ]
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if is_new:
+                insert_category(self)
+            elif old_parent_id != self.parent_id:
+                move_category(self, old_parent_id)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            remove_category(self)
+            return super().delete(*args, **kwargs)
+
     @property
     def full_name(self):
         if self.parent:
@@ -34,6 +79,22 @@ class ResourceCategory(models.Model):
         return self.name
 
 
+class ResourceCategoryClosure(models.Model):
+    """Ancestor/descendant pairs of the category tree, maintained by ResourceCategory.save()"""
+    ancestor = models.ForeignKey(ResourceCategory, on_delete=models.CASCADE, related_name='descendant_links')
+    descendant = models.ForeignKey(ResourceCategory, on_delete=models.CASCADE, related_name='ancestor_links')
+    depth = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ['ancestor', 'descendant']
+        indexes = [
+            models.Index(fields=['descendant', 'depth']),
+        ]
+
+    def __str__(self):
+        return f"{self.ancestor_id} > {self.descendant_id} ({self.depth})"
+
+
 class Resource(models.Model):
     """Base model for all resources"""
     RESOURCE_TYPES = [
@@ -63,8 +124,8 @@ class Resource(models.Model):
     
     # External links and files
     external_url = models.URLField(blank=True, help_text="Link to external resource")
-    file = models.FileField(upload_to='resources/files/', blank=True)
-    thumbnail = models.ImageField(upload_to='resources/thumbnails/', blank=True)
+    file = models.FileField(upload_to='resources/files/', storage=get_blob_storage, blank=True)
+    thumbnail = models.ImageField(upload_to='resources/thumbnails/', storage=get_blob_storage, blank=True)
     
     # Metadata
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='authored_resources')
@@ -77,6 +138,19 @@ class Resource(models.Model):
     download_count = models.PositiveIntegerField(default=0)
     like_count = models.PositiveIntegerField(default=0)
     
+    # Rating aggregates, kept in step with ResourceRating by apply_rating_change
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_avg = models.DecimalField(max_digits=3, decimal_places=2, default=Decimal('0.00'))
+    
+    # Windowed activity scores, refreshed from ResourceDailyStats (see rollups.py)
+    popularity_score = models.PositiveIntegerField(default=0)
+    trending_score = models.PositiveIntegerField(default=0)
+    COUNT_FIELDS = (
+        'view_count', 'download_count', 'like_count', 'rating_sum', 'rating_count', 'rating_avg',
+        'popularity_score', 'trending_score',
+    )
+    
     # Time tracking
     estimated_duration_minutes = models.PositiveIntegerField(null=True, blank=True, help_text="Estimated time to complete in minutes")
     created_at = models.DateTimeField(auto_now_add=True)
@@ -85,6 +159,9 @@ class Resource(models.Model):
     
     # Tags for search and categorization
     tags = TaggableManager(blank=True)
+    
+    # Weighted full-text document on PostgreSQL (GIN indexed by migration); see search.py
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         ordering = ['-created_at']
@@ -93,6 +170,9 @@ class Resource(models.Model):
             models.Index(fields=['is_featured', 'is_published']),
             models.Index(fields=['created_at']),
             models.Index(fields=['view_count']),
+            models.Index(fields=['rating_avg']),
+            models.Index(fields=['popularity_score']),
+            models.Index(fields=['trending_score']),
         ]
 
     def __str__(self):
@@ -101,20 +181,64 @@ class Resource(models.Model):
     def get_absolute_url(self):
         return reverse('resource-detail', kwargs={'slug': self.slug})
 
+    def save(self, *args, **kwargs):
+        before = (None, False)
+        if not self._state.adding:
+            before = Resource.objects.filter(pk=self.pk).values_list('category_id', 'is_published').first() or before
+            if kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+                # Counters and aggregates are maintained with targeted updates; don't write back a stale copy
+                kwargs['update_fields'] = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key and field.name not in self.COUNT_FIELDS
+                ]
+        after = (self.category_id, self.is_published)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if before != after:
+                if before[1]:
+                    adjust_resource_counts(before[0], -1)
+                if after[1]:
+                    adjust_resource_counts(after[0], 1)
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None or {'title', 'description', 'content'} & set(update_fields):
+                index_resources([self.pk])
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            resource_id = self.pk
+            result = super().delete(*args, **kwargs)
+            if self.is_published:
+                adjust_resource_counts(self.category_id, -1)
+            remove_from_index([resource_id])
+        return result
+
     @property
     def average_rating(self):
-        ratings = self.ratings.all()
-        if ratings:
-            return sum(r.rating for r in ratings) / len(ratings)
-        return 0
+        return self.rating_avg
+
+    def apply_rating_change(self, sum_delta, count_delta):
+        """
+        Fold a rating create/update/delete into the aggregates.
+
+        Call inside the transaction that changed the rating, on an instance
+        fetched with select_for_update() so concurrent raters are serialized.
+        """
+        self.rating_sum += sum_delta
+        self.rating_count += count_delta
+        self.rating_avg = rating_average(self.rating_sum, self.rating_count)
+        Resource.objects.filter(pk=self.pk).update(
+            rating_sum=self.rating_sum,
+            rating_count=self.rating_count,
+            rating_avg=self.rating_avg,
+        )
 
     def increment_view_count(self):
+        Resource.objects.filter(pk=self.pk).update(view_count=models.F('view_count') + 1)
         self.view_count += 1
-        self.save(update_fields=['view_count'])
 
     def increment_download_count(self):
+        Resource.objects.filter(pk=self.pk).update(download_count=models.F('download_count') + 1)
         self.download_count += 1
-        self.save(update_fields=['download_count'])
 
 
 class Workshop(models.Model):
@@ -124,7 +248,7 @@ class Workshop(models.Model):
     # Workshop specific fields
     instructor_name = models.CharField(max_length=100)
     instructor_bio = models.TextField(blank=True)
-    instructor_photo = models.ImageField(upload_to='resources/instructors/', blank=True)
+    instructor_photo = models.ImageField(upload_to='resources/instructors/', storage=get_blob_storage, blank=True)
     
     # Scheduling
     start_date = models.DateTimeField(null=True, blank=True)
@@ -132,6 +256,9 @@ class Workshop(models.Model):
     is_recurring = models.BooleanField(default=False)
     max_participants = models.PositiveIntegerField(null=True, blank=True)
     
+    # Seats taken, claimed and released atomically (see workshops.py)
+    active_registrations = models.PositiveIntegerField(default=0)
+    
     # Links
     meeting_link = models.URLField(blank=True)
     materials_link = models.URLField(blank=True)
@@ -145,14 +272,42 @@ class Workshop(models.Model):
     def __str__(self):
         return f"Workshop: {self.resource.title}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered so save() only looks at the waitlist when capacity grows
+        if 'max_participants' in instance.__dict__:
+            instance._saved_max_participants = instance.max_participants
+        return instance
+
+    def capacity_grew(self):
+        if not hasattr(self, '_saved_max_participants'):
+            return True
+        saved = self._saved_max_participants
+        return saved is not None and (self.max_participants is None or self.max_participants > saved)
+
+    def save(self, *args, **kwargs):
+        is_new = self._state.adding
+        if not is_new and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            # The seat counter is only changed atomically; don't write back a stale copy
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'active_registrations'
+            ]
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if not is_new and self.capacity_grew():
+                promote_waitlist(self.pk)
+        self._saved_max_participants = self.max_participants
+
     @property
     def current_participants(self):
-        return self.registrations.filter(is_active=True).count()
+        return self.active_registrations
 
     @property
     def is_full(self):
         if self.max_participants:
-            return self.current_participants >= self.max_participants
+            return self.active_registrations >= self.max_participants
         return False
 
 
@@ -162,11 +317,15 @@ class WorkshopRegistration(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='workshop_registrations')
     registered_at = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=True)
+    waitlisted_at = models.DateTimeField(null=True, blank=True, help_text="Set while waiting for a seat")
     attended = models.BooleanField(default=False)
     completion_certificate_issued = models.BooleanField(default=False)
     
     class Meta:
         unique_together = ['workshop', 'user']
+        indexes = [
+            models.Index(fields=['workshop', 'waitlisted_at']),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.workshop.resource.title}"
@@ -274,6 +433,24 @@ class ResourceDownload(models.Model):
         return f"{user_str} downloaded {self.resource.title}"
 
 
+class ResourceDailyStats(models.Model):
+    """Per-day activity counts for a resource, rolled up from views, downloads and ratings"""
+    resource = models.ForeignKey(Resource, on_delete=models.CASCADE, related_name='daily_stats')
+    day = models.DateField()
+    views = models.PositiveIntegerField(default=0)
+    downloads = models.PositiveIntegerField(default=0)
+    ratings = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['resource', 'day']
+        indexes = [
+            models.Index(fields=['day']),
+        ]
+
+    def __str__(self):
+        return f"{self.resource.title} on {self.day}"
+
+
 class ResourceComment(models.Model):
     """Comments on resources"""
     resource = models.ForeignKey(Resource, on_delete=models.CASCADE, related_name='comments')
@@ -0,0 +1,148 @@
+"""
+Daily activity rollups and the popularity/trending scores built on them.
+
+Views (from the buffered view tracker), downloads and ratings are counted
+into one ``ResourceDailyStats`` row per resource and day. A periodic job
+(``manage.py refresh_resource_scores``) sums the last few days of rollups
+into ``Resource.popularity_score`` and ``Resource.trending_score``, so the
+popular and trending lists are an index scan instead of a count over the
+raw event tables. The same job drops rollups older than the widest window
+(``prune_rollups``), since nothing reads them.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+POPULAR_WINDOW_DAYS = getattr(settings, 'RESOURCE_POPULAR_WINDOW_DAYS', 30)
+TRENDING_WINDOW_DAYS = getattr(settings, 'RESOURCE_TRENDING_WINDOW_DAYS', 7)
+
+# Days of rollups kept; anything older is outside every score window
+ROLLUP_RETENTION_DAYS = getattr(
+    settings, 'RESOURCE_ROLLUP_RETENTION_DAYS', max(POPULAR_WINDOW_DAYS, TRENDING_WINDOW_DAYS)
+)
+
+VIEW_WEIGHT = 1
+DOWNLOAD_WEIGHT = 1
+RATING_WEIGHT = 2
+
+ACTIVITY_FIELDS = ('views', 'downloads', 'ratings')
+
+
+def record_activity(field, increments, day=None):
+    """
+    Add ``increments`` ({resource_id: amount}) to ``field`` counts for
+    ``day`` (today by default).
+
+    Missing rows are created empty first (conflicts ignored), then counts
+    are bumped with F() updates, so concurrent writers never lose counts.
+    """
+    from .models import ResourceDailyStats
+
+    assert field in ACTIVITY_FIELDS
+    day = day or timezone.localdate()
+    increments = {resource_id: amount for resource_id, amount in increments.items() if amount}
+    if not increments:
+        return
+
+    by_amount = defaultdict(list)
+    for resource_id, amount in increments.items():
+        by_amount[amount].append(resource_id)
+
+    with transaction.atomic():
+        ResourceDailyStats.objects.bulk_create(
+            [ResourceDailyStats(resource_id=resource_id, day=day) for resource_id in increments],
+            ignore_conflicts=True,
+        )
+        for amount, resource_ids in by_amount.items():
+            ResourceDailyStats.objects.filter(day=day, resource_id__in=resource_ids).update(
+                **{field: F(field) + amount}
+            )
+
+
+def windowed_scores(days, today=None):
+    """{resource_id: score} over the last ``days`` days of rollups"""
+    from .models import ResourceDailyStats
+
+    today = today or timezone.localdate()
+    rows = (
+        ResourceDailyStats.objects
+        .filter(day__gt=today - timedelta(days=days))
+        .values('resource_id')
+        .annotate(views=Sum('views'), downloads=Sum('downloads'), ratings=Sum('ratings'))
+    )
+    return {
+        row['resource_id']: (
+            VIEW_WEIGHT * row['views'] + DOWNLOAD_WEIGHT * row['downloads'] + RATING_WEIGHT * row['ratings']
+        )
+        for row in rows
+    }
+
+
+def refresh_scores(today=None, batch_size=1000):
+    """Recompute popularity and trending scores; returns the number of resources with activity"""
+    from .models import Resource
+
+    popular = windowed_scores(POPULAR_WINDOW_DAYS, today)
+    trending = windowed_scores(TRENDING_WINDOW_DAYS, today)
+
+    with transaction.atomic():
+        Resource.objects.exclude(id__in=list(popular)).filter(
+            Q(popularity_score__gt=0) | Q(trending_score__gt=0)
+        ).update(popularity_score=0, trending_score=0)
+
+        resources = [
+            Resource(id=resource_id, popularity_score=score, trending_score=trending.get(resource_id, 0))
+            for resource_id, score in popular.items()
+        ]
+        Resource.objects.bulk_update(resources, ['popularity_score', 'trending_score'], batch_size=batch_size)
+    return len(resources)
+
+
+def prune_rollups(today=None):
+    """Delete rollups older than ``ROLLUP_RETENTION_DAYS``; returns the number of rows deleted"""
+    from .models import ResourceDailyStats
+
+    today = today or timezone.localdate()
+    deleted, _ = ResourceDailyStats.objects.filter(day__lte=today - timedelta(days=ROLLUP_RETENTION_DAYS)).delete()
+    return deleted
+
+
+def rebuild_rollups(days, today=None):
+    """Recreate the last ``days`` days of rollups from the raw view, download and rating rows"""
+    from .models import ResourceDailyStats, ResourceDownload, ResourceRating, ResourceView
+
+    today = today or timezone.localdate()
+    since = today - timedelta(days=days - 1)
+    sources = [
+        ('views', ResourceView.objects, 'viewed_at'),
+        ('downloads', ResourceDownload.objects, 'downloaded_at'),
+        ('ratings', ResourceRating.objects, 'created_at'),
+    ]
+
+    counts = defaultdict(lambda: dict.fromkeys(ACTIVITY_FIELDS, 0))
+    for field, queryset, timestamp in sources:
+        rows = (
+            queryset
+            .annotate(day=TruncDate(timestamp))
+            .filter(day__gte=since)
+            .values('resource_id', 'day')
+            .annotate(count=Count('id'))
+        )
+        for row in rows:
+            counts[(row['resource_id'], row['day'])][field] = row['count']
+
+    with transaction.atomic():
+        ResourceDailyStats.objects.filter(day__gte=since).delete()
+        ResourceDailyStats.objects.bulk_create(
+            [
+                ResourceDailyStats(resource_id=resource_id, day=day, **activity)
+                for (resource_id, day), activity in counts.items()
+            ],
+            batch_size=1000,
+        )
+    return len(counts)
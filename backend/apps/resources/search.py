@@ -0,0 +1,250 @@
+"""
+Full-text search over resources.
+
+Title, tags, description and content are indexed with decreasing weight,
+and results come back ranked with a highlighted ``search_snippet``:
+
+- PostgreSQL: ``Resource.search_vector`` (a weighted tsvector with a GIN
+  index), matched with ``websearch_to_tsquery`` and ranked by ``ts_rank``;
+  snippets come from ``ts_headline``.
+- SQLite: an FTS5 table (``resources_resource_fts``, rowid = resource id),
+  ranked with per-column weighted bm25; snippets come from ``snippet()``.
+- Anything else falls back to unranked ``icontains`` matching.
+
+``Resource.save()``, tag changes and tag renames (see ``ResourcesConfig.ready``)
+reindex the affected resources; ``manage.py rebuild_search_index`` reindexes
+everything.
+"""
+import html
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import Exists, F, OuterRef, Q, Subquery, TextField, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Concat
+
+# PostgreSQL text search configuration (stemming, stop words)
+SEARCH_CONFIG = getattr(settings, 'RESOURCE_SEARCH_CONFIG', 'english')
+
+FTS_TABLE = 'resources_resource_fts'
+
+# bm25 weights for the FTS5 columns, in table order. FTS5 scales term frequency
+# by the weight before saturating it, so the title needs a wide margin to win
+FTS_COLUMNS = ('title', 'tags', 'description', 'content')
+FTS_WEIGHTS = (20.0, 5.0, 2.0, 1.0)
+
+SNIPPET_WORDS = 24
+
+# Match markers in raw snippets; the text around them is escaped before they become <mark>
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_STOP = '\x03'
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def get_resource_model():
+    from .models import Resource
+
+    return Resource
+
+
+def get_tag_model():
+    from taggit.models import TaggedItem
+
+    return TaggedItem
+
+
+def tag_text(ids):
+    """{resource_id: 'space separated tag names'} for the given resources"""
+    tags = {}
+    rows = get_tag_model().objects.filter(
+        content_type__app_label='resources', content_type__model='resource', object_id__in=ids
+    ).values_list('object_id', 'tag__name')
+    for resource_id, name in rows:
+        tags.setdefault(resource_id, []).append(name)
+    return {resource_id: ' '.join(names) for resource_id, names in tags.items()}
+
+
+def highlight(snippet):
+    """Escape a raw snippet and turn its match markers into <mark> tags"""
+    if not snippet:
+        return None
+    return (
+        html.escape(snippet)
+        .replace(HIGHLIGHT_START, '<mark>')
+        .replace(HIGHLIGHT_STOP, '</mark>')
+    )
+
+
+class PostgresSearch:
+    def index(self, ids, resource_model):
+        # Needs psycopg, so only imported on PostgreSQL
+        from django.contrib.postgres.aggregates import StringAgg
+
+        # One UPDATE for the batch; tag names come from a correlated subquery
+        tag_names = Subquery(
+            get_tag_model().objects.filter(
+                content_type__app_label='resources', content_type__model='resource', object_id=OuterRef('pk')
+            )
+            .order_by()
+            .values('object_id')
+            .annotate(names=StringAgg('tag__name', delimiter=' '))
+            .values('names'),
+            output_field=TextField(),
+        )
+        resource_model.objects.filter(pk__in=ids).update(
+            search_vector=(
+                SearchVector('title', weight='A', config=SEARCH_CONFIG)
+                + SearchVector(tag_names, weight='B', config=SEARCH_CONFIG)
+                + SearchVector('description', weight='C', config=SEARCH_CONFIG)
+                + SearchVector('content', weight='D', config=SEARCH_CONFIG)
+            )
+        )
+
+    def remove(self, ids):
+        pass  # the vector lives on the row
+
+    def clear(self):
+        pass
+
+    def search(self, queryset, text):
+        query = SearchQuery(text, search_type='websearch', config=SEARCH_CONFIG)
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query),
+            search_snippet=SearchHeadline(
+                Concat('description', Value(' '), 'content', output_field=TextField()),
+                query,
+                config=SEARCH_CONFIG,
+                start_sel=HIGHLIGHT_START,
+                stop_sel=HIGHLIGHT_STOP,
+                max_words=SNIPPET_WORDS,
+                min_words=SNIPPET_WORDS // 2,
+            ),
+        ).order_by('-search_rank', '-created_at')
+
+
+class SQLiteSearch:
+    def index(self, ids, resource_model):
+        tags = tag_text(ids)
+        rows = [
+            (resource_id, title, tags.get(resource_id, ''), description, content)
+            for resource_id, title, description, content in resource_model.objects
+            .filter(pk__in=ids).values_list('id', 'title', 'description', 'content')
+        ]
+        self.remove(ids)
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, {", ".join(FTS_COLUMNS)}) VALUES (%s, %s, %s, %s, %s)', rows
+            )
+
+    def remove(self, ids):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({", ".join(["%s"] * len(ids))})', list(ids)
+            )
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+
+    def match_expression(self, text):
+        """Every word must match; quoting keeps user input from being read as FTS5 syntax"""
+        return ' '.join(f'"{token}"' for token in TOKEN_RE.findall(text))
+
+    def search(self, queryset, text):
+        match = self.match_expression(text)
+        if not match:
+            return queryset.none()
+        table = queryset.model._meta.db_table
+        weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+        # rowid + MATCH lets FTS5 seek straight to the row instead of scanning all matches
+        matched_row = f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.rowid = "{table}"."id"'
+        return queryset.filter(
+            pk__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match])
+        ).annotate(
+            # bm25 is lower for better matches
+            search_rank=RawSQL(f'SELECT -bm25({FTS_TABLE}, {weights}) {matched_row}', [match]),
+            search_snippet=RawSQL(
+                f"SELECT snippet({FTS_TABLE}, -1, %s, %s, '…', {SNIPPET_WORDS}) {matched_row}",
+                [HIGHLIGHT_START, HIGHLIGHT_STOP, match],
+            ),
+        ).order_by('-search_rank', '-created_at')
+
+
+class FallbackSearch:
+    def index(self, ids, resource_model):
+        pass
+
+    def remove(self, ids):
+        pass
+
+    def clear(self):
+        pass
+
+    def search(self, queryset, text):
+        tagged = get_tag_model().objects.filter(
+            content_type__app_label='resources', content_type__model='resource',
+            object_id=OuterRef('pk'), tag__name__icontains=text,
+        )
+        return queryset.filter(
+            Q(title__icontains=text) | Q(description__icontains=text) | Q(content__icontains=text)
+            | Exists(tagged)
+        )
+
+
+def search_backend():
+    if connection.vendor == 'postgresql':
+        return PostgresSearch()
+    if connection.vendor == 'sqlite':
+        return SQLiteSearch()
+    return FallbackSearch()
+
+
+def search_resources(queryset, text):
+    """Resources in ``queryset`` matching ``text``, best first, annotated with search_rank/search_snippet"""
+    return search_backend().search(queryset, text)
+
+
+def index_resources(ids):
+    ids = list(ids)
+    if ids:
+        search_backend().index(ids, get_resource_model())
+
+
+def remove_from_index(ids):
+    ids = list(ids)
+    if ids:
+        search_backend().remove(ids)
+
+
+def tagged_resource_ids(tag):
+    return list(get_tag_model().objects.filter(
+        tag=tag, content_type__app_label='resources', content_type__model='resource'
+    ).values_list('object_id', flat=True))
+
+
+def reindex_resources(ids, batch_size=500):
+    """``index_resources`` in batches, for id lists of unbounded size"""
+    ids = list(ids)
+    for start in range(0, len(ids), batch_size):
+        index_resources(ids[start:start + batch_size])
+
+
+def rebuild_search_index(batch_size=500):
+    """Reindex every resource; returns the number indexed"""
+    resource_model = get_resource_model()
+    backend = search_backend()
+    backend.clear()
+    indexed = 0
+    last_id = 0
+    while True:
+        ids = list(
+            resource_model.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return indexed
+        backend.index(ids, resource_model)
+        indexed += len(ids)
+        last_id = ids[-1]
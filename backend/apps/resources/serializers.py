@@ -1,6 +1,12 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.db.models import Q
 from taggit.serializers import TagListSerializerField, TaggitSerializer
+
+from core.images import ResponsiveImageField
+from core.loaders import ViewerBatchListSerializer, ViewerLoader
+from .category_tree import load_subtree
+from .search import highlight
 from .models import (
     ResourceCategory, Resource, Workshop, WorkshopRegistration,
     ResourceRating, ResourceBookmark, ResourceCollection, ResourceCollectionItem,
@@ -10,27 +16,53 @@ from .models import (
 User = get_user_model()
 
 
+def fetch_bookmarked(user, resource_ids):
+    bookmarks = ResourceBookmark.objects.filter(user=user, resource_id__in=resource_ids)
+    return dict.fromkeys(bookmarks.values_list('resource_id', flat=True), True)
+
+
+def fetch_ratings(user, resource_ids):
+    ratings = ResourceRating.objects.filter(user=user, resource_id__in=resource_ids)
+    return dict(ratings.values_list('resource_id', 'rating'))
+
+
+def fetch_registration_status(user, workshop_ids):
+    registrations = WorkshopRegistration.objects.filter(user=user, workshop_id__in=workshop_ids).filter(
+        Q(is_active=True) | Q(waitlisted_at__isnull=False)
+    )
+    return {
+        workshop_id: 'registered' if is_active else 'waitlisted'
+        for workshop_id, is_active in registrations.values_list('workshop_id', 'is_active')
+    }
+
+
+def fetch_progress(user, resource_ids):
+    progress = ResourceProgress.objects.filter(user=user, resource_id__in=resource_ids)
+    return {item.resource_id: item for item in progress}
+
+
 class ResourceCategorySerializer(serializers.ModelSerializer):
-    """Serializer for resource categories"""
+    """
+    Serializer for resource categories, nested with their active subcategories.
+
+    Categories loaded with ``build_category_tree``/``load_subtree`` carry
+    their children already; anything else loads its subtree in one query.
+    """
     subcategories = serializers.SerializerMethodField()
-    resource_count = serializers.SerializerMethodField()
 
     class Meta:
         model = ResourceCategory
         fields = [
             'id', 'name', 'description', 'slug', 'parent', 'icon',
             'is_active', 'display_order', 'subcategories', 'resource_count',
-            'created_at', 'updated_at'
+            'subtree_resource_count', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['created_at', 'updated_at']
+        read_only_fields = ['resource_count', 'subtree_resource_count', 'created_at', 'updated_at']
 
     def get_subcategories(self, obj):
-        if obj.subcategories.exists():
-            return ResourceCategorySerializer(obj.subcategories.filter(is_active=True), many=True).data
-        return []
-
-    def get_resource_count(self, obj):
-        return obj.resources.filter(is_published=True).count()
+        if not hasattr(obj, 'tree_children'):
+            load_subtree(obj, is_active=True)
+        return ResourceCategorySerializer(obj.tree_children, many=True, context=self.context).data
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -95,7 +127,8 @@ class ResourceSerializer(TaggitSerializer, serializers.ModelSerializer):
     
     # Computed fields
     average_rating = serializers.ReadOnlyField()
-    rating_count = serializers.SerializerMethodField()
+    rating_count = serializers.IntegerField(read_only=True)
+    thumbnail_srcset = ResponsiveImageField(source='thumbnail')
     is_bookmarked = serializers.SerializerMethodField()
     user_rating = serializers.SerializerMethodField()
     user_progress = serializers.SerializerMethodField()
@@ -104,12 +137,16 @@ class ResourceSerializer(TaggitSerializer, serializers.ModelSerializer):
     # Workshop data if applicable
     workshop = serializers.SerializerMethodField()
 
+    bookmarked_loader = ViewerLoader(fetch_bookmarked, default=False)
+    rating_loader = ViewerLoader(fetch_ratings)
+    progress_loader = ViewerLoader(fetch_progress)
+
     class Meta:
         model = Resource
         fields = [
             'id', 'title', 'slug', 'description', 'content', 'resource_type',
             'category', 'category_id', 'difficulty_level', 'external_url', 
-            'file', 'thumbnail', 'author', 'is_featured', 'is_premium', 
+            'file', 'thumbnail', 'thumbnail_srcset', 'author', 'is_featured', 'is_premium', 
             'is_published', 'view_count', 'download_count', 'like_count',
             'estimated_duration_minutes', 'created_at', 'updated_at', 
             'published_at', 'tags', 'average_rating', 'rating_count',
@@ -120,29 +157,17 @@ class ResourceSerializer(TaggitSerializer, serializers.ModelSerializer):
             'author', 'view_count', 'download_count', 'like_count',
             'created_at', 'updated_at'
         ]
-
-    def get_rating_count(self, obj):
-        return obj.ratings.count()
+        list_serializer_class = ViewerBatchListSerializer
 
     def get_is_bookmarked(self, obj):
-        user = self.context.get('request').user if self.context.get('request') else None
-        if user and user.is_authenticated:
-            return obj.bookmarks.filter(user=user).exists()
-        return False
+        return self.bookmarked_loader.load(self, obj)
 
     def get_user_rating(self, obj):
-        user = self.context.get('request').user if self.context.get('request') else None
-        if user and user.is_authenticated:
-            rating = obj.ratings.filter(user=user).first()
-            return rating.rating if rating else None
-        return None
+        return self.rating_loader.load(self, obj)
 
     def get_user_progress(self, obj):
-        user = self.context.get('request').user if self.context.get('request') else None
-        if user and user.is_authenticated:
-            progress = obj.user_progress.filter(user=user).first()
-            return ResourceProgressSerializer(progress).data if progress else None
-        return None
+        progress = self.progress_loader.load(self, obj)
+        return ResourceProgressSerializer(progress).data if progress else None
 
     def get_comments_preview(self, obj):
         comments = obj.comments.filter(is_approved=True, parent=None)[:3]
@@ -160,20 +185,23 @@ class ResourceListSerializer(serializers.ModelSerializer):
     author = serializers.StringRelatedField()
     tags = TagListSerializerField()
     average_rating = serializers.ReadOnlyField()
-    rating_count = serializers.SerializerMethodField()
+    rating_count = serializers.IntegerField(read_only=True)
+    thumbnail_srcset = ResponsiveImageField(source='thumbnail')
+    search_snippet = serializers.SerializerMethodField()
 
     class Meta:
         model = Resource
         fields = [
             'id', 'title', 'slug', 'description', 'resource_type',
-            'category', 'difficulty_level', 'thumbnail', 'author',
+            'category', 'difficulty_level', 'thumbnail', 'thumbnail_srcset', 'author',
             'is_featured', 'is_premium', 'view_count', 'download_count',
             'estimated_duration_minutes', 'created_at', 'tags',
-            'average_rating', 'rating_count'
+            'average_rating', 'rating_count', 'search_snippet'
         ]
 
-    def get_rating_count(self, obj):
-        return obj.ratings.count()
+    def get_search_snippet(self, obj):
+        # Only set on search results; HTML-escaped with matches wrapped in <mark>
+        return highlight(getattr(obj, 'search_snippet', None))
 
 
 class WorkshopRegistrationSerializer(serializers.ModelSerializer):
@@ -196,22 +224,27 @@ class WorkshopSerializer(serializers.ModelSerializer):
     current_participants = serializers.ReadOnlyField()
     is_full = serializers.ReadOnlyField()
     user_registered = serializers.SerializerMethodField()
+    registration_status = serializers.SerializerMethodField()
+    instructor_photo_srcset = ResponsiveImageField(source='instructor_photo')
+
+    registration_loader = ViewerLoader(fetch_registration_status)
 
     class Meta:
         model = Workshop
         fields = [
-            'resource', 'instructor_name', 'instructor_bio', 'instructor_photo',
+            'resource', 'instructor_name', 'instructor_bio', 'instructor_photo', 'instructor_photo_srcset',
             'start_date', 'end_date', 'is_recurring', 'max_participants',
             'current_participants', 'is_full', 'meeting_link', 'materials_link',
-            'prerequisites', 'user_registered', 'created_at', 'updated_at'
+            'prerequisites', 'user_registered', 'registration_status', 'created_at', 'updated_at'
         ]
         read_only_fields = ['created_at', 'updated_at']
+        list_serializer_class = ViewerBatchListSerializer
 
     def get_user_registered(self, obj):
-        user = self.context.get('request').user if self.context.get('request') else None
-        if user and user.is_authenticated:
-            return obj.registrations.filter(user=user, is_active=True).exists()
-        return False
+        return self.registration_loader.load(self, obj) == 'registered'
+
+    def get_registration_status(self, obj):
+        return self.registration_loader.load(self, obj)
 
 
 class ResourceBookmarkSerializer(serializers.ModelSerializer):
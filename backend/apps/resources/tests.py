@@ -1,3 +1,198 @@
-from django.test import TestCase
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase
+
+from .models import Resource, ResourceCategory, ResourceDailyStats, ResourceRating, Workshop, WorkshopRegistration
+from .rollups import ROLLUP_RETENTION_DAYS, prune_rollups, record_activity, windowed_scores
+from .search import search_resources
+from .workshops import (
+    ALREADY_REGISTERED, REGISTERED, WAITLISTED, cancel, register, sync_active_registrations, waitlist_position
+)
+
+User = get_user_model()
+
+
+def create_workshop(max_participants):
+    author = User.objects.create_user(username='instructor', email='instructor@example.com', password='password')
+    category = ResourceCategory.objects.create(name='Careers', slug='careers')
+    resource = Resource.objects.create(
+        title='CV clinic', slug='cv-clinic', description='...', resource_type='workshop',
+        category=category, author=author,
+    )
+    return Workshop.objects.create(resource=resource, instructor_name='Ada', max_participants=max_participants)
+
+
+def create_users(count):
+    return User.objects.bulk_create([
+        User(username=f'user{number}', email=f'user{number}@example.com') for number in range(count)
+    ])
+
+
+class WorkshopWaitlistTests(TestCase):
+    def setUp(self):
+        self.workshop = create_workshop(max_participants=2)
+        self.users = create_users(4)
+
+    def test_full_workshop_waitlists_and_promotes_in_order(self):
+        outcomes = [register(self.workshop, user)[1] for user in self.users]
+        self.assertEqual(outcomes, [REGISTERED, REGISTERED, WAITLISTED, WAITLISTED])
+        self.assertEqual(register(self.workshop, self.users[0])[1], ALREADY_REGISTERED)
+
+        third = WorkshopRegistration.objects.get(workshop=self.workshop, user=self.users[2])
+        fourth = WorkshopRegistration.objects.get(workshop=self.workshop, user=self.users[3])
+        self.assertEqual((waitlist_position(third), waitlist_position(fourth)), (1, 2))
+
+        cancel(WorkshopRegistration.objects.get(workshop=self.workshop, user=self.users[0]))
+        third.refresh_from_db()
+        fourth.refresh_from_db()
+        self.assertTrue(third.is_active)
+        self.assertIsNone(third.waitlisted_at)
+        self.assertEqual(waitlist_position(fourth), 1)
+        self.workshop.refresh_from_db()
+        self.assertEqual(self.workshop.active_registrations, 2)
+
+    def test_raising_capacity_promotes_the_waitlist(self):
+        for user in self.users:
+            register(self.workshop, user)
+        self.workshop.max_participants = 3
+        self.workshop.save()
+
+        self.workshop.refresh_from_db()
+        self.assertEqual(self.workshop.active_registrations, 3)
+        self.assertEqual(
+            list(WorkshopRegistration.objects.filter(waitlisted_at__isnull=False).values_list('user', flat=True)),
+            [self.users[3].pk],
+        )
+
+    def test_other_edits_leave_the_waitlist_alone(self):
+        workshop = Workshop.objects.get(pk=self.workshop.pk)
+        workshop.instructor_name = 'Grace'
+        with mock.patch('apps.resources.models.promote_waitlist') as promote:
+            workshop.save()
+            workshop.max_participants = 1
+            workshop.save()
+        promote.assert_not_called()
+
+    def test_cancelling_a_waitlist_place_frees_no_seat(self):
+        for user in self.users:
+            register(self.workshop, user)
+        cancel(WorkshopRegistration.objects.get(workshop=self.workshop, user=self.users[2]))
+
+        self.workshop.refresh_from_db()
+        self.assertEqual(self.workshop.active_registrations, 2)
+        self.assertEqual(WorkshopRegistration.objects.filter(waitlisted_at__isnull=False).count(), 1)
+
+    def test_sync_recounts_seats(self):
+        for user in self.users[:2]:
+            register(self.workshop, user)
+        Workshop.objects.update(active_registrations=0)
+        sync_active_registrations()
+        self.workshop.refresh_from_db()
+        self.assertEqual(self.workshop.active_registrations, 2)
+
+
+class ResourceCountFieldTests(TestCase):
+    def setUp(self):
+        self.resource = create_workshop(max_participants=None).resource
+        self.rater = User.objects.create_user(username='rater', email='rater@example.com', password='password')
+
+    def test_full_save_of_stale_instance_keeps_aggregates(self):
+        stale = Resource.objects.get(pk=self.resource.pk)
+        fresh = Resource.objects.get(pk=self.resource.pk)
+        ResourceRating.objects.create(resource=fresh, user=self.rater, rating=4)
+        fresh.apply_rating_change(4, 1)
+        Resource.objects.filter(pk=fresh.pk).update(like_count=3)
+        fresh.increment_view_count()
+
+        stale.title = 'CV clinic (updated)'
+        stale.save()
+
+        stale.refresh_from_db()
+        self.assertEqual(stale.title, 'CV clinic (updated)')
+        self.assertEqual((stale.rating_sum, stale.rating_count, stale.like_count, stale.view_count), (4, 1, 3, 1))
+        self.assertEqual(stale.rating_avg, 4)
+
+
+class RollupRetentionTests(TestCase):
+    def test_rollups_outside_every_window_are_pruned(self):
+        resource = create_workshop(max_participants=None).resource
+        today = date(2026, 3, 31)
+        oldest_kept = today - timedelta(days=ROLLUP_RETENTION_DAYS - 1)
+        for day in (oldest_kept - timedelta(days=1), oldest_kept, today):
+            record_activity('views', {resource.pk: 1}, day=day)
+        scores_before = windowed_scores(ROLLUP_RETENTION_DAYS, today)
+
+        self.assertEqual(prune_rollups(today), 1)
+        self.assertEqual(
+            list(ResourceDailyStats.objects.order_by('day').values_list('day', flat=True)), [oldest_kept, today]
+        )
+        self.assertEqual(windowed_scores(ROLLUP_RETENTION_DAYS, today), scores_before)
+
+
+class SearchIndexTests(TestCase):
+    def setUp(self):
+        self.resource = create_workshop(max_participants=None).resource
+
+    def search(self, text):
+        return list(search_resources(Resource.objects.all(), text))
+
+    def test_tag_renames_and_deletes_are_reindexed(self):
+        self.resource.tags.add('interviews')
+        self.assertEqual(self.search('interviews'), [self.resource])
+
+        tag = self.resource.tags.get()
+        tag.name = 'networking'
+        tag.save()
+        self.assertEqual(self.search('interviews'), [])
+        self.assertEqual(self.search('networking'), [self.resource])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.delete()
+        self.assertEqual(self.search('networking'), [])
+
+
+class WorkshopConcurrencyTests(TransactionTestCase):
+    """Hundreds of simultaneous sign-ups must never oversell a workshop"""
+    CAPACITY = 50
+    SIGNUPS = 300
+    WORKERS = 16
+
+    def register_concurrently(self, workshop, users, start):
+        def attempt(user):
+            start.wait()
+            try:
+                while True:
+                    try:
+                        return register(workshop, user)[1]
+                    except OperationalError:
+                        # SQLite reports lock contention instead of waiting; back off and retry like a client would
+                        time.sleep(random.uniform(0.005, 0.02))
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.WORKERS) as pool:
+            futures = [pool.submit(attempt, user) for user in users]
+            start.set()
+            return [future.result() for future in futures]
+
+    def test_no_overselling_under_concurrent_signups(self):
+        workshop = create_workshop(max_participants=self.CAPACITY)
+        users = create_users(self.SIGNUPS)
+
+        outcomes = self.register_concurrently(workshop, users, threading.Event())
+
+        workshop.refresh_from_db()
+        self.assertEqual(outcomes.count(REGISTERED), self.CAPACITY)
+        self.assertEqual(outcomes.count(WAITLISTED), self.SIGNUPS - self.CAPACITY)
+        self.assertEqual(workshop.active_registrations, self.CAPACITY)
+        self.assertEqual(WorkshopRegistration.objects.filter(is_active=True).count(), self.CAPACITY)
+        self.assertEqual(
+            WorkshopRegistration.objects.filter(waitlisted_at__isnull=False).count(), self.SIGNUPS - self.CAPACITY
+        )
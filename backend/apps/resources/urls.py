@@ -25,6 +25,7 @@ urlpatterns = [
     path('<int:resource_id>/bookmark/', views.ResourceBookmarkView.as_view(), name='resource-bookmark'),
     path('<int:resource_id>/progress/', views.ResourceProgressView.as_view(), name='resource-progress'),
     path('<int:resource_id>/download/', views.ResourceDownloadView.as_view(), name='resource-download'),
+    path('<int:resource_id>/file/', views.ResourceFileView.as_view(), name='resource-file'),
     
     # User resources
     path('user/bookmarks/', views.UserBookmarksView.as_view(), name='user-bookmarks'),
@@ -1,5 +1,12 @@
+import os
+from functools import partial
+
+from django.http import Http404
 from django.shortcuts import get_object_or_404
-from django.db.models import Q, Count, Avg, Sum
+from django.urls import reverse
+from django.utils.text import slugify
+from django.db import transaction
+from django.db.models import Q, Count, Sum
 from django.utils import timezone
 from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes
@@ -9,12 +16,22 @@ from rest_framework.pagination import PageNumberPagination
 from django_filters.rest_framework import DjangoFilterBackend
 from django.contrib.auth import get_user_model
 
+from apps.analytics.view_tracking import TrackedView, view_tracker
+from core.file_serving import serve_file
+
 User = get_user_model()
 
 from .models import (
     ResourceCategory, Resource, Workshop, WorkshopRegistration,
     ResourceRating, ResourceBookmark, ResourceCollection, ResourceCollectionItem,
-    ResourceComment, ResourceProgress, ResourceView, ResourceDownload
+    ResourceComment, ResourceProgress, ResourceView, ResourceDownload, ResourceDailyStats
+)
+from .category_tree import build_category_tree, load_subtree
+from .rollups import TRENDING_WINDOW_DAYS, record_activity
+from .search import search_resources
+from .workshops import (
+    ALREADY_WAITLISTED, REGISTERED, WAITLISTED, cancel as cancel_workshop_registration,
+    register as register_for_workshop, waitlist_position
 )
 from .serializers import (
     ResourceCategorySerializer, ResourceSerializer, ResourceListSerializer,
@@ -24,6 +41,10 @@ from .serializers import (
     ResourceStatsSerializer
 )
 
+RESOURCE_VIEWS = TrackedView(
+    ResourceView, 'resource', 'view_count', forwarded=False, on_flush=partial(record_activity, 'views')
+)
+
 
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 20
@@ -37,7 +58,18 @@ class ResourceCategoryListView(generics.ListAPIView):
     permission_classes = [permissions.AllowAny]
 
     def get_queryset(self):
-        return ResourceCategory.objects.filter(is_active=True, parent=None)
+        return ResourceCategory.objects.filter(is_active=True)
+
+    def list(self, request, *args, **kwargs):
+        # The whole tree in one query; subcategories of inactive categories stay hidden
+        roots = [
+            category for category in build_category_tree(list(self.get_queryset()))
+            if category.parent_id is None
+        ]
+        page = self.paginate_queryset(roots)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(roots, many=True).data)
 
 
 class ResourceCategoryDetailView(generics.RetrieveAPIView):
@@ -49,6 +81,9 @@ class ResourceCategoryDetailView(generics.RetrieveAPIView):
     def get_queryset(self):
         return ResourceCategory.objects.filter(is_active=True)
 
+    def get_object(self):
+        return load_subtree(super().get_object(), is_active=True)
+
 
 class ResourceListView(generics.ListAPIView):
     """List resources with filtering and search"""
@@ -61,15 +96,15 @@ class ResourceListView(generics.ListAPIView):
     def get_queryset(self):
         queryset = Resource.objects.filter(is_published=True).select_related('category', 'author')
         
-        # Search functionality
-        search_query = self.request.query_params.get('q', '')
+        # Full-text search, ranked best first (see search.py)
+        search_query = self.request.query_params.get('q', '').strip()
         if search_query:
-            queryset = queryset.filter(
-                Q(title__icontains=search_query) |
-                Q(description__icontains=search_query) |
-                Q(content__icontains=search_query) |
-                Q(tags__name__icontains=search_query)
-            ).distinct()
+            queryset = search_resources(queryset, search_query)
+
+        # Category filtering including subcategories, via the closure table
+        in_category = self.request.query_params.get('in_category')
+        if in_category:
+            queryset = queryset.filter(category__ancestor_links__ancestor__slug=in_category)
 
         # Tag filtering
         tags = self.request.query_params.get('tags', '')
@@ -80,17 +115,15 @@ class ResourceListView(generics.ListAPIView):
         # Rating filtering
         min_rating = self.request.query_params.get('min_rating')
         if min_rating:
-            queryset = queryset.annotate(
-                avg_rating=Avg('ratings__rating')
-            ).filter(avg_rating__gte=min_rating)
+            queryset = queryset.filter(rating_avg__gte=min_rating)
 
-        # Ordering
-        ordering = self.request.query_params.get('ordering', '-created_at')
+        # Ordering; searches keep their relevance order unless asked otherwise
+        ordering = self.request.query_params.get('ordering') or ('' if search_query else '-created_at')
         if ordering == 'rating':
-            queryset = queryset.annotate(avg_rating=Avg('ratings__rating')).order_by('avg_rating')
+            queryset = queryset.order_by('rating_avg')
         elif ordering == '-rating':
-            queryset = queryset.annotate(avg_rating=Avg('ratings__rating')).order_by('-avg_rating')
-        else:
+            queryset = queryset.order_by('-rating_avg')
+        elif ordering:
             queryset = queryset.order_by(ordering)
 
         return queryset
@@ -110,13 +143,7 @@ class ResourceDetailView(generics.RetrieveAPIView):
         
         # Track view
         if request.user.is_authenticated or request.META.get('REMOTE_ADDR'):
-            ResourceView.objects.create(
-                resource=instance,
-                user=request.user if request.user.is_authenticated else None,
-                ip_address=request.META.get('REMOTE_ADDR'),
-                user_agent=request.META.get('HTTP_USER_AGENT', '')
-            )
-            instance.increment_view_count()
+            view_tracker.record(RESOURCE_VIEWS, instance.id, request)
 
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
@@ -174,9 +201,7 @@ class PopularResourcesView(generics.ListAPIView):
     def get_queryset(self):
         return Resource.objects.filter(
             is_published=True
-        ).annotate(
-            popularity_score=Count('resource_views') + Count('ratings') * 2
-        ).order_by('-popularity_score')[:20]
+        ).select_related('category', 'author').order_by('-popularity_score', '-created_at')[:20]
 
 
 class RecentResourcesView(generics.ListAPIView):
@@ -195,46 +220,63 @@ class ResourceRatingView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, resource_id):
-        try:
-            resource = Resource.objects.get(id=resource_id, is_published=True)
-        except Resource.DoesNotExist:
-            return Response(
-                {'error': 'Resource not found'}, 
-                status=status.HTTP_404_NOT_FOUND
-            )
-
         rating_value = request.data.get('rating')
         review_text = request.data.get('review', '')
 
-        if not rating_value or not (1 <= int(rating_value) <= 5):
+        try:
+            rating_value = int(rating_value)
+        except (TypeError, ValueError):
+            rating_value = None
+        if rating_value is None or not (1 <= rating_value <= 5):
             return Response(
                 {'error': 'Rating must be between 1 and 5'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        rating, created = ResourceRating.objects.update_or_create(
-            resource=resource,
-            user=request.user,
-            defaults={
-                'rating': rating_value,
-                'review': review_text
-            }
-        )
+        with transaction.atomic():
+            try:
+                # Locking the resource serializes concurrent ratings of it
+                resource = Resource.objects.select_for_update().get(id=resource_id, is_published=True)
+            except Resource.DoesNotExist:
+                return Response(
+                    {'error': 'Resource not found'}, 
+                    status=status.HTTP_404_NOT_FOUND
+                )
+
+            rating = ResourceRating.objects.filter(resource=resource, user=request.user).first()
+            created = rating is None
+            if created:
+                rating = ResourceRating.objects.create(
+                    resource=resource,
+                    user=request.user,
+                    rating=rating_value,
+                    review=review_text
+                )
+                resource.apply_rating_change(rating_value, 1)
+                record_activity('ratings', {resource.id: 1})
+            else:
+                previous_value = rating.rating
+                rating.rating = rating_value
+                rating.review = review_text
+                rating.save(update_fields=['rating', 'review', 'updated_at'])
+                resource.apply_rating_change(rating_value - previous_value, 0)
 
         serializer = ResourceRatingSerializer(rating)
         return Response(serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
 
     def delete(self, request, resource_id):
-        try:
-            resource = Resource.objects.get(id=resource_id, is_published=True)
-            rating = ResourceRating.objects.get(resource=resource, user=request.user)
+        with transaction.atomic():
+            try:
+                resource = Resource.objects.select_for_update().get(id=resource_id, is_published=True)
+                rating = ResourceRating.objects.get(resource=resource, user=request.user)
+            except (Resource.DoesNotExist, ResourceRating.DoesNotExist):
+                return Response(
+                    {'error': 'Rating not found'}, 
+                    status=status.HTTP_404_NOT_FOUND
+                )
             rating.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        except (Resource.DoesNotExist, ResourceRating.DoesNotExist):
-            return Response(
-                {'error': 'Rating not found'}, 
-                status=status.HTTP_404_NOT_FOUND
-            )
+            resource.apply_rating_change(-rating.rating, -1)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class ResourceBookmarkView(APIView):
@@ -336,23 +378,50 @@ class ResourceDownloadView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        try:
+            file_size = resource.file.size
+        except FileNotFoundError:
+            return Response({'error': 'File not found'}, status=status.HTTP_404_NOT_FOUND)
+
         # Track download
         ResourceDownload.objects.create(
             resource=resource,
             user=request.user if request.user.is_authenticated else None,
             ip_address=request.META.get('REMOTE_ADDR'),
             file_name=resource.file.name,
-            file_size_bytes=resource.file.size if resource.file else 0
+            file_size_bytes=file_size
         )
         resource.increment_download_count()
+        record_activity('downloads', {resource.id: 1})
 
         return Response({
-            'download_url': resource.file.url,
-            'file_name': resource.file.name,
-            'file_size': resource.file.size if resource.file else 0
+            'download_url': request.build_absolute_uri(
+                reverse('resources:resource-file', kwargs={'resource_id': resource.id})
+            ),
+            'file_name': os.path.basename(resource.file.name),
+            'file_size': file_size
         })
 
 
+class ResourceFileView(APIView):
+    """Stream a resource's file, with HTTP range and conditional request support"""
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, resource_id):
+        resource = get_object_or_404(Resource, id=resource_id, is_published=True)
+        if not resource.file:
+            raise Http404('No downloadable file available')
+        # Stored names are content digests; download under the resource's title
+        filename = f'{slugify(resource.title) or "resource"}{os.path.splitext(resource.file.name)[1]}'
+        try:
+            return serve_file(
+                request, resource.file.storage, resource.file.name,
+                filename=filename, cache_control={'public': True, 'max_age': 300}
+            )
+        except FileNotFoundError:
+            raise Http404('File not found')
+
+
 class WorkshopListView(generics.ListAPIView):
     """List all workshops"""
     serializer_class = WorkshopSerializer
@@ -377,55 +446,59 @@ class WorkshopDetailView(generics.RetrieveAPIView):
 
 
 class WorkshopRegistrationView(APIView):
-    """Handle workshop registrations"""
+    """Handle workshop registrations; full workshops put the user on the waitlist"""
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, workshop_id):
         try:
-            workshop = Workshop.objects.get(id=workshop_id, resource__is_published=True)
+            workshop = Workshop.objects.get(pk=workshop_id, resource__is_published=True)
         except Workshop.DoesNotExist:
             return Response(
                 {'error': 'Workshop not found'}, 
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        if workshop.is_full:
+        registration, outcome = register_for_workshop(workshop, request.user)
+
+        if outcome == REGISTERED:
             return Response(
-                {'error': 'Workshop is full'}, 
-                status=status.HTTP_400_BAD_REQUEST
+                {'message': 'Successfully registered for workshop', 'status': 'registered'},
+                status=status.HTTP_201_CREATED
+            )
+        elif outcome == WAITLISTED:
+            return Response(
+                {
+                    'message': 'Workshop is full; you have been added to the waitlist',
+                    'status': 'waitlisted',
+                    'waitlist_position': waitlist_position(registration),
+                },
+                status=status.HTTP_202_ACCEPTED
+            )
+        elif outcome == ALREADY_WAITLISTED:
+            return Response(
+                {
+                    'message': 'Already on the waitlist',
+                    'status': 'waitlisted',
+                    'waitlist_position': waitlist_position(registration),
+                },
+                status=status.HTTP_200_OK
             )
-
-        registration, created = WorkshopRegistration.objects.get_or_create(
-            workshop=workshop,
-            user=request.user,
-            defaults={'is_active': True}
-        )
-
-        if created:
-            return Response({'message': 'Successfully registered for workshop'}, status=status.HTTP_201_CREATED)
-        elif not registration.is_active:
-            registration.is_active = True
-            registration.save()
-            return Response({'message': 'Registration reactivated'}, status=status.HTTP_200_OK)
         else:
-            return Response({'message': 'Already registered'}, status=status.HTTP_200_OK)
+            return Response({'message': 'Already registered', 'status': 'registered'}, status=status.HTTP_200_OK)
 
     def delete(self, request, workshop_id):
-        try:
-            workshop = Workshop.objects.get(id=workshop_id)
-            registration = WorkshopRegistration.objects.get(
-                workshop=workshop, 
-                user=request.user,
-                is_active=True
-            )
-            registration.is_active = False
-            registration.save()
-            return Response({'message': 'Registration cancelled'}, status=status.HTTP_204_NO_CONTENT)
-        except (Workshop.DoesNotExist, WorkshopRegistration.DoesNotExist):
+        registration = WorkshopRegistration.objects.filter(
+            Q(is_active=True) | Q(waitlisted_at__isnull=False),
+            workshop_id=workshop_id,
+            user=request.user,
+        ).first()
+        if registration is None:
             return Response(
                 {'error': 'Registration not found'}, 
                 status=status.HTTP_404_NOT_FOUND
             )
+        cancel_workshop_registration(registration)
+        return Response({'message': 'Registration cancelled'}, status=status.HTTP_204_NO_CONTENT)
 
 
 class ResourceStatsView(APIView):
@@ -433,23 +506,34 @@ class ResourceStatsView(APIView):
     permission_classes = [permissions.AllowAny]
 
     def get(self, request):
+        totals = Resource.objects.filter(is_published=True).aggregate(total_views=Sum('view_count'), total_downloads=Sum('download_count'))
+        trending = list(
+            Resource.objects.filter(is_published=True, trending_score__gt=0)
+            .order_by('-trending_score')[:5]
+            .values('id', 'title', 'slug')
+        )
+        recent_views = dict(
+            ResourceDailyStats.objects.filter(
+                resource_id__in=[resource['id'] for resource in trending],
+                day__gt=timezone.localdate() - timezone.timedelta(days=TRENDING_WINDOW_DAYS),
+            ).values('resource_id').annotate(views=Sum('views')).values_list('resource_id', 'views')
+        )
         stats = {
             'total_resources': Resource.objects.filter(is_published=True).count(),
-            'total_views': ResourceView.objects.count(),
-            'total_downloads': ResourceDownload.objects.count(),
+            'total_views': totals['total_views'] or 0,
+            'total_downloads': totals['total_downloads'] or 0,
             'popular_categories': list(
-                ResourceCategory.objects.annotate(
-                    resource_count=Count('resources', filter=Q(resources__is_published=True))
-                ).filter(resource_count__gt=0).order_by('-resource_count')[:5].values('name', 'resource_count')
-            ),
-            'trending_resources': list(
-                Resource.objects.filter(is_published=True).annotate(
-                    recent_views=Count(
-                        'resource_views',
-                        filter=Q(resource_views__viewed_at__gte=timezone.now() - timezone.timedelta(days=7))
-                    )
-                ).order_by('-recent_views')[:5].values('title', 'slug', 'recent_views')
+                ResourceCategory.objects.filter(resource_count__gt=0)
+                .order_by('-resource_count')[:5].values('name', 'resource_count')
             ),
+            'trending_resources': [
+                {
+                    'title': resource['title'],
+                    'slug': resource['slug'],
+                    'recent_views': recent_views.get(resource['id'], 0),
+                }
+                for resource in trending
+            ],
             'recent_resources': list(
                 Resource.objects.filter(is_published=True).order_by('-created_at')[:5].values(
                     'title', 'slug', 'created_at'
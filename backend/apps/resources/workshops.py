@@ -0,0 +1,148 @@
+"""
+Workshop seats and waitlist.
+
+``Workshop.active_registrations`` counts the seats taken. A seat is claimed
+with a single conditional UPDATE (``... WHERE active_registrations <
+max_participants``), so concurrent sign-ups can never push a workshop past
+capacity, whatever the interleaving; whoever doesn't get a seat joins the
+waitlist. Cancelling a seat hands it to the longest-waiting registrant.
+
+A registration is in one of three states:
+
+- seated: ``is_active`` is set
+- waitlisted: ``waitlisted_at`` is set (the queue is FIFO on it)
+- cancelled: neither
+"""
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+REGISTERED = 'registered'
+WAITLISTED = 'waitlisted'
+ALREADY_REGISTERED = 'already_registered'
+ALREADY_WAITLISTED = 'already_waitlisted'
+
+
+def workshop_models():
+    from .models import Workshop, WorkshopRegistration
+
+    return Workshop, WorkshopRegistration
+
+
+def claim_seat(workshop_id):
+    """Take a seat if one is free; True when it was taken"""
+    workshop_model, _ = workshop_models()
+    return bool(
+        workshop_model.objects
+        .filter(pk=workshop_id)
+        .filter(Q(max_participants__isnull=True) | Q(active_registrations__lt=F('max_participants')))
+        .update(active_registrations=F('active_registrations') + 1)
+    )
+
+
+def release_seat(workshop_id):
+    workshop_model, _ = workshop_models()
+    workshop_model.objects.filter(pk=workshop_id, active_registrations__gt=0).update(
+        active_registrations=F('active_registrations') - 1
+    )
+
+
+def seat(registration_id, **current):
+    """Move a registration matching ``current`` into a seat; False if it changed under us"""
+    _, registration_model = workshop_models()
+    return bool(
+        registration_model.objects.filter(pk=registration_id, is_active=False, **current)
+        .update(is_active=True, waitlisted_at=None)
+    )
+
+
+@transaction.atomic
+def register(workshop, user):
+    """
+    Give ``user`` a seat, or a place on the waitlist when the workshop is
+    full. Returns ``(registration, outcome)``.
+    """
+    _, registration_model = workshop_models()
+    registration, _ = registration_model.objects.get_or_create(
+        workshop=workshop, user=user, defaults={'is_active': False}
+    )
+    if registration.is_active:
+        return registration, ALREADY_REGISTERED
+    if registration.waitlisted_at:
+        return registration, ALREADY_WAITLISTED
+
+    if claim_seat(workshop.pk):
+        if seat(registration.pk, waitlisted_at__isnull=True):
+            registration.refresh_from_db()
+            return registration, REGISTERED
+        # A concurrent request from the same user got there first
+        release_seat(workshop.pk)
+    else:
+        registration_model.objects.filter(
+            pk=registration.pk, is_active=False, waitlisted_at__isnull=True
+        ).update(waitlisted_at=timezone.now())
+
+    registration.refresh_from_db()
+    return registration, REGISTERED if registration.is_active else WAITLISTED
+
+
+@transaction.atomic
+def cancel(registration):
+    """Give up a seat or a waitlist place; a freed seat goes to the head of the waitlist"""
+    _, registration_model = workshop_models()
+    freed = registration_model.objects.filter(pk=registration.pk, is_active=True).update(is_active=False)
+    if freed:
+        release_seat(registration.workshop_id)
+        promote_waitlist(registration.workshop_id)
+    else:
+        registration_model.objects.filter(pk=registration.pk).update(waitlisted_at=None)
+    registration.refresh_from_db()
+
+
+def promote_waitlist(workshop_id):
+    """Seat waitlisted registrants, oldest first, while seats are free; returns the ids promoted"""
+    _, registration_model = workshop_models()
+    promoted = []
+    with transaction.atomic():
+        while True:
+            candidate = (
+                registration_model.objects
+                .filter(workshop_id=workshop_id, waitlisted_at__isnull=False)
+                .order_by('waitlisted_at', 'id')
+                .values_list('id', flat=True)
+                .first()
+            )
+            if candidate is None or not claim_seat(workshop_id):
+                return promoted
+            if seat(candidate, waitlisted_at__isnull=False):
+                promoted.append(candidate)
+            else:
+                # Left the waitlist in the meantime; put the seat back and try the next one
+                release_seat(workshop_id)
+
+
+def waitlist_position(registration):
+    """1-based place in the waitlist, or None when not waitlisted"""
+    _, registration_model = workshop_models()
+    if not registration.waitlisted_at:
+        return None
+    ahead = registration_model.objects.filter(
+        Q(waitlisted_at__lt=registration.waitlisted_at)
+        | Q(waitlisted_at=registration.waitlisted_at, id__lt=registration.id),
+        workshop_id=registration.workshop_id,
+    ).count()
+    return ahead + 1
+
+
+def sync_active_registrations():
+    """Recompute every workshop's seat counter from its registrations"""
+    workshop_model, registration_model = workshop_models()
+    seats = (
+        registration_model.objects
+        .filter(workshop=OuterRef('pk'), is_active=True)
+        .values('workshop')
+        .annotate(count=Count('id'))
+        .values('count')
+    )
+    return workshop_model.objects.update(active_registrations=Coalesce(Subquery(seats), Value(0)))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from apps.tracker.snapshots import PERIOD_TYPES, SNAPSHOT_BATCH_SIZE, build_snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        'Build weekly/monthly progress snapshots for every completed period not built yet '
+        '(run daily, e.g. from cron; an interrupted run resumes where it stopped)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--period', choices=PERIOD_TYPES, help='Only this period type (default: both)')
+        parser.add_argument('--backfill', type=int, default=12,
+                            help='Periods to build on the first run, before any have been built')
+        parser.add_argument('--rebuild', type=int, default=0,
+                            help='Recompute the last this many completed periods instead')
+        parser.add_argument('--batch-size', type=int, default=SNAPSHOT_BATCH_SIZE, help='Users per transaction')
+
+    def handle(self, *args, **options):
+        built = build_snapshots(
+            period_types=[options['period']] if options['period'] else PERIOD_TYPES,
+            backfill=options['backfill'],
+            rebuild=options['rebuild'],
+            batch_size=options['batch_size'],
+        )
+        for period_type, start, written in built:
+            self.stdout.write(f'{period_type} from {start}: {written} snapshots')
+        self.stdout.write(self.style.SUCCESS(f'Built {len(built)} period(s)'))
@@ -134,6 +134,9 @@ class Activity(models.Model):
     class Meta:
         db_table = 'tracker_activities'
         ordering = ['-activity_date']
+        indexes = [
+            models.Index(fields=['user', 'activity_date']),
+        ]
     
     def __str__(self):
         return f"{self.user.get_full_name()} - {self.title} ({self.activity_date.date()})"
@@ -222,3 +225,22 @@ class ProgressSnapshot(models.Model):
     
     def __str__(self):
         return f"{self.user.get_full_name()} - {self.period_type} {self.period_start}"
+
+
+class SnapshotRun(models.Model):
+    """
+    Checkpoint of progress snapshot generation for one period
+    """
+    period_type = models.CharField(max_length=10, choices=ProgressSnapshot.PERIOD_TYPES)
+    period_start = models.DateField()
+    last_user_id = models.BigIntegerField(default=0, help_text="Users up to this id are snapshotted")
+    started_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        db_table = 'tracker_snapshot_runs'
+        unique_together = ['period_type', 'period_start']
+        ordering = ['-period_start']
+    
+    def __str__(self):
+        return f"{self.period_type} snapshots from {self.period_start}"
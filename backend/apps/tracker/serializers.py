@@ -122,6 +122,8 @@ class TrackerDashboardSerializer(serializers.Serializer):
     active_habits = HabitSerializer(many=True)
     progress_this_week = serializers.DictField()
     upcoming_milestones = MilestoneSerializer(many=True)
+    weekly_trend = ProgressSnapshotSerializer(many=True)
+    monthly_trend = ProgressSnapshotSerializer(many=True)
     
     def get_goals_summary(self, obj):
         user = obj['user']
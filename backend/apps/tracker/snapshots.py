@@ -0,0 +1,220 @@
+"""
+Weekly and monthly ``ProgressSnapshot`` generation.
+
+For each completed period and each chunk of users, every metric is one
+grouped COUNT over the period's date range; the results are upserted with
+``bulk_create(update_conflicts=True)`` and snapshots of users with nothing
+left to report are removed, so recomputing a period is idempotent. Users
+with no tracker data in a period get no snapshot (readers treat a missing
+period as all zeros).
+
+Each period is a ``SnapshotRun``; the last user id processed is saved with
+every chunk, so an interrupted run resumes where it stopped.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .timeline import day_bounds
+
+WEEKLY = 'weekly'
+MONTHLY = 'monthly'
+PERIOD_TYPES = (WEEKLY, MONTHLY)
+
+METRIC_FIELDS = [
+    'goals_active', 'goals_completed', 'milestones_completed', 'activities_count',
+    'habits_completion_rate', 'applications_submitted', 'interviews_attended',
+]
+
+SNAPSHOT_BATCH_SIZE = 2000
+
+# Completed periods shown in dashboard trends
+TREND_PERIODS = {WEEKLY: 8, MONTHLY: 6}
+
+
+def period_bounds(period_type, day):
+    """First and last day of the week (Monday first) or month containing ``day``"""
+    if period_type == WEEKLY:
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=6)
+    start = day.replace(day=1)
+    return start, (start.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+
+
+def completed_periods(period_type, count, today=None):
+    """Start dates of the last ``count`` periods that have ended, oldest first"""
+    today = today or timezone.localdate()
+    start, _ = period_bounds(period_type, today)
+    starts = []
+    for _ in range(count):
+        start, _ = period_bounds(period_type, start - timedelta(days=1))
+        starts.append(start)
+    return starts[::-1]
+
+
+def grouped(queryset, user_field, **aggregates):
+    aggregates = aggregates or {'count': Count('id')}
+    return {row.pop(user_field): row for row in queryset.values(user_field).annotate(**aggregates)}
+
+
+def compute_metrics(period_type, start, lo, hi):
+    """``{user_id: {metric: value}}`` for users in (lo, hi] with anything to report"""
+    from apps.applications.models import Application, InterviewSchedule
+
+    from .models import Activity, Goal, HabitEntry, Milestone
+
+    _, end = period_bounds(period_type, start)
+    lower, upper = day_bounds(start, end)
+    users = {'user_id__gt': lo, 'user_id__lte': hi}
+
+    metrics = {
+        # Goals that existed by the end of the period and weren't finished before it began
+        'goals_active': grouped(
+            Goal.objects.filter(**users, created_at__lt=upper)
+            .exclude(status='abandoned')
+            .filter(Q(completed_date__isnull=True) | Q(completed_date__gte=start)),
+            'user_id',
+        ),
+        'goals_completed': grouped(
+            Goal.objects.filter(**users, completed_date__range=(start, end)), 'user_id'
+        ),
+        'milestones_completed': grouped(
+            Milestone.objects.filter(goal__user_id__gt=lo, goal__user_id__lte=hi, completed_date__range=(start, end)),
+            'goal__user_id',
+        ),
+        'activities_count': grouped(
+            Activity.objects.filter(**users, activity_date__gte=lower, activity_date__lt=upper), 'user_id'
+        ),
+        'applications_submitted': grouped(
+            Application.objects.filter(**users, submitted_at__gte=lower, submitted_at__lt=upper), 'user_id'
+        ),
+        'interviews_attended': grouped(
+            InterviewSchedule.objects.filter(
+                application__user_id__gt=lo, application__user_id__lte=hi, status='completed',
+                scheduled_date__gte=lower, scheduled_date__lt=upper,
+            ),
+            'application__user_id',
+        ),
+    }
+    # Share of the habit check-ins logged in the period that were completions
+    habits = grouped(
+        HabitEntry.objects.filter(habit__user_id__gt=lo, habit__user_id__lte=hi, date__range=(start, end)),
+        'habit__user_id',
+        logged=Count('id'),
+        completed=Count('id', filter=Q(completed=True)),
+    )
+
+    results = {}
+    for metric, rows in metrics.items():
+        for user_id, row in rows.items():
+            results.setdefault(user_id, {})[metric] = row['count']
+    for user_id, row in habits.items():
+        rate = Decimal(row['completed'] * 100) / row['logged']
+        results.setdefault(user_id, {})['habits_completion_rate'] = rate.quantize(Decimal('0.01'))
+    return results
+
+
+def write_snapshots(period_type, start, lo, hi, results):
+    from .models import ProgressSnapshot
+
+    _, end = period_bounds(period_type, start)
+    ProgressSnapshot.objects.bulk_create(
+        [
+            ProgressSnapshot(user_id=user_id, period_type=period_type, period_start=start, period_end=end, **metrics)
+            for user_id, metrics in results.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['user', 'period_type', 'period_start'],
+        update_fields=['period_end', *METRIC_FIELDS],
+    )
+    ProgressSnapshot.objects.filter(
+        period_type=period_type, period_start=start, user_id__gt=lo, user_id__lte=hi
+    ).exclude(user_id__in=list(results)).delete()
+
+
+def build_period(period_type, start, batch_size=SNAPSHOT_BATCH_SIZE):
+    """Snapshot one period for every user, resuming from its checkpoint; returns the snapshots written"""
+    from .models import SnapshotRun
+
+    run, _ = SnapshotRun.objects.get_or_create(period_type=period_type, period_start=start)
+    if run.completed_at:
+        return 0
+    user_ids = get_user_model().objects.order_by('id').values_list('id', flat=True)
+    written = 0
+    while True:
+        batch = list(user_ids.filter(id__gt=run.last_user_id)[:batch_size])
+        if not batch:
+            break
+        with transaction.atomic():
+            results = compute_metrics(period_type, start, run.last_user_id, batch[-1])
+            write_snapshots(period_type, start, run.last_user_id, batch[-1], results)
+            # Saved with the chunk, so the checkpoint never gets ahead of the work
+            run.last_user_id = batch[-1]
+            run.save(update_fields=['last_user_id'])
+        written += len(results)
+    run.completed_at = timezone.now()
+    run.save(update_fields=['completed_at'])
+    return written
+
+
+def pending_periods(period_type, backfill=1, today=None):
+    """
+    Completed periods to build, oldest first: everything after the last
+    finished run, or the last ``backfill`` periods when there is none.
+    """
+    from .models import SnapshotRun
+
+    last_run = (
+        SnapshotRun.objects.filter(period_type=period_type, completed_at__isnull=False)
+        .order_by('-period_start').values_list('period_start', flat=True).first()
+    )
+    if not last_run:
+        return completed_periods(period_type, backfill, today)
+    latest = completed_periods(period_type, 1, today)[-1]
+    starts = []
+    start = period_bounds(period_type, last_run)[1] + timedelta(days=1)
+    while start <= latest:
+        starts.append(start)
+        start = period_bounds(period_type, start)[1] + timedelta(days=1)
+    return starts
+
+
+def build_snapshots(period_types=PERIOD_TYPES, backfill=1, rebuild=0, today=None, batch_size=SNAPSHOT_BATCH_SIZE):
+    """
+    Build pending snapshots for each period type, or with ``rebuild``,
+    recompute the last that many completed periods. Returns
+    ``[(period_type, start, written)]``.
+    """
+    from .models import SnapshotRun
+
+    built = []
+    for period_type in period_types:
+        if rebuild:
+            starts = completed_periods(period_type, rebuild, today)
+            SnapshotRun.objects.filter(period_type=period_type, period_start__in=starts).delete()
+        else:
+            starts = pending_periods(period_type, backfill, today)
+        for start in starts:
+            built.append((period_type, start, build_period(period_type, start, batch_size)))
+    return built
+
+
+def trend(user, period_type, count, today=None):
+    """The user's last ``count`` completed periods, oldest first, with unsaved zero snapshots for gaps"""
+    from .models import ProgressSnapshot
+
+    starts = completed_periods(period_type, count, today)
+    saved = {
+        snapshot.period_start: snapshot
+        for snapshot in ProgressSnapshot.objects.filter(user=user, period_type=period_type, period_start__in=starts)
+    }
+    return [
+        saved.get(start) or ProgressSnapshot(
+            user=user, period_type=period_type, period_start=start, period_end=period_bounds(period_type, start)[1]
+        )
+        for start in starts
+    ]
@@ -1,3 +1,47 @@
+from datetime import date, datetime, time
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.utils import timezone
+
+from .models import Activity
+from .timeline import MONTH, WEEK, timeline
+
+User = get_user_model()
+
+
+def at(day):
+    return timezone.make_aware(datetime.combine(day, time(12)))
+
+
+class TimelineTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='tracker', email='tracker@example.com', password='password')
+
+    def log(self, *days):
+        Activity.objects.bulk_create([
+            Activity(user=self.user, title='Practice', activity_type='skill_practice', activity_date=at(day))
+            for day in days
+        ])
+
+    def test_week_edge_buckets_count_the_whole_week(self):
+        # 2026-01-05 and 2026-01-19 are Mondays
+        self.log(date(2026, 1, 5), date(2026, 1, 8), date(2026, 1, 20), date(2026, 1, 25), date(2026, 1, 26))
+
+        buckets = timeline(Activity.objects.filter(user=self.user), date(2026, 1, 7), date(2026, 1, 20), WEEK)
+
+        self.assertEqual(buckets, [
+            {'date': date(2026, 1, 5), 'count': 2},
+            {'date': date(2026, 1, 12), 'count': 0},
+            {'date': date(2026, 1, 19), 'count': 2},
+        ])
+
+    def test_month_edge_buckets_count_the_whole_month(self):
+        self.log(date(2026, 1, 2), date(2026, 1, 20), date(2026, 2, 27), date(2026, 2, 28), date(2026, 3, 1))
+
+        buckets = timeline(Activity.objects.filter(user=self.user), date(2026, 1, 15), date(2026, 2, 10), MONTH)
 
-# Create your tests here.
+        self.assertEqual(buckets, [
+            {'date': date(2026, 1, 1), 'count': 2},
+            {'date': date(2026, 2, 1), 'count': 2},
+        ])
@@ -0,0 +1,76 @@
+"""
+Activity counts over time (dashboard timelines, calendar heatmaps).
+
+A timeline is one grouped COUNT over a plain ``activity_date`` range, so
+it can use the (user, activity_date) index; empty buckets are filled in
+with zeros afterwards.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db.models import Count, DateField
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+
+DAY = 'day'
+WEEK = 'week'
+MONTH = 'month'
+
+TRUNCATE = {
+    DAY: TruncDate,
+    WEEK: TruncWeek,
+    MONTH: TruncMonth,
+}
+
+# Longest range a timeline may cover
+MAX_TIMELINE_DAYS = 3 * 366
+
+
+def day_bounds(start, end):
+    """Aware datetimes from the start of ``start`` up to (not including) the day after ``end``"""
+    lower = timezone.make_aware(datetime.combine(start, time.min))
+    upper = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min))
+    return lower, upper
+
+
+def bucket_start(granularity, day):
+    if granularity == WEEK:
+        return day - timedelta(days=day.weekday())
+    if granularity == MONTH:
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(granularity, day):
+    if granularity == WEEK:
+        return day + timedelta(days=7)
+    if granularity == MONTH:
+        return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return day + timedelta(days=1)
+
+
+def timeline(queryset, start, end, granularity=DAY, field='activity_date'):
+    """
+    ``[{'date', 'count'}]`` per day/week/month from ``start`` to ``end``, zero-filled.
+
+    Weeks and months are counted whole, so the first and last buckets cover
+    their full period even where it reaches outside ``start``..``end``.
+    """
+    first = bucket_start(granularity, start)
+    last = next_bucket(granularity, bucket_start(granularity, end)) - timedelta(days=1)
+    lower, upper = day_bounds(first, last)
+    truncate = TRUNCATE[granularity]
+    counts = dict(
+        queryset
+        .filter(**{f'{field}__gte': lower, f'{field}__lt': upper})
+        .annotate(bucket=truncate(field, output_field=DateField()))
+        .values('bucket')
+        .annotate(count=Count('id'))
+        .values_list('bucket', 'count')
+    )
+
+    buckets = []
+    bucket = first
+    while bucket <= end:
+        buckets.append({'date': bucket, 'count': counts.get(bucket, 0)})
+        bucket = next_bucket(granularity, bucket)
+    return buckets
@@ -2,7 +2,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     GoalViewSet, MilestoneViewSet, ActivityViewSet, 
-    HabitViewSet
+    HabitViewSet, ProgressSnapshotViewSet
 )
 
 router = DefaultRouter()
@@ -10,6 +10,7 @@ router.register(r'goals', GoalViewSet, basename='goal')
 router.register(r'milestones', MilestoneViewSet, basename='milestone')
 router.register(r'activities', ActivityViewSet, basename='activity')
 router.register(r'habits', HabitViewSet, basename='habit')
+router.register(r'snapshots', ProgressSnapshotViewSet, basename='progress-snapshot')
 
 urlpatterns = [
     path('', include(router.urls)),
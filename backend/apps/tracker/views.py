@@ -1,10 +1,13 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.db.models import Q, Count
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from datetime import date, timedelta
+from . import snapshots, timeline
 from .models import Goal, Milestone, Activity, Habit, HabitEntry, ProgressSnapshot
 from .serializers import (
     GoalSerializer, MilestoneSerializer, ActivitySerializer,
@@ -13,6 +16,17 @@ from .serializers import (
 )
 
 
+def query_date(request, name):
+    """Date from the ``name`` query parameter, None when absent; ValueError when it doesn't parse"""
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    parsed = parse_date(value)
+    if parsed is None:
+        raise ValueError(f'Invalid {name}: {value}')
+    return parsed
+
+
 class GoalViewSet(viewsets.ModelViewSet):
     serializer_class = GoalSerializer
     permission_classes = [IsAuthenticated]
@@ -81,6 +95,9 @@ class GoalViewSet(viewsets.ModelViewSet):
             'active_habits': active_habits,
             'progress_this_week': progress_this_week,
             'upcoming_milestones': upcoming_milestones,
+            # Completed periods come from the prebuilt snapshots
+            'weekly_trend': snapshots.trend(user, snapshots.WEEKLY, snapshots.TREND_PERIODS[snapshots.WEEKLY]),
+            'monthly_trend': snapshots.trend(user, snapshots.MONTHLY, snapshots.TREND_PERIODS[snapshots.MONTHLY]),
         }
         
         serializer = TrackerDashboardSerializer(dashboard_data)
@@ -138,7 +155,12 @@ class ActivityViewSet(viewsets.ModelViewSet):
         start_date = self.request.query_params.get('start_date')
         end_date = self.request.query_params.get('end_date')
         if start_date and end_date:
-            queryset = queryset.filter(activity_date__date__range=[start_date, end_date])
+            try:
+                lower, upper = timeline.day_bounds(parse_date(start_date), parse_date(end_date))
+            except (TypeError, ValueError):
+                raise ValidationError({'error': 'Invalid date'})
+            # A plain range (not __date) so the (user, activity_date) index applies
+            queryset = queryset.filter(activity_date__gte=lower, activity_date__lt=upper)
         
         # Filter by goal
         goal_id = self.request.query_params.get('goal')
@@ -152,6 +174,12 @@ class ActivityViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def analytics(self, request):
+        """
+        Activity type counts and a timeline. The timeline covers the last 30
+        days by default; ``start_date``/``end_date`` (YYYY-MM-DD) and
+        ``granularity`` (day, week or month) pick another range, e.g. a year
+        of days for a calendar heatmap.
+        """
         user = request.user
         
         # Activity types count
@@ -159,29 +187,44 @@ class ActivityViewSet(viewsets.ModelViewSet):
             count=Count('id')
         ).order_by('-count')
         
-        # Activities over time (last 30 days)
-        end_date = timezone.now().date()
-        start_date = end_date - timedelta(days=30)
-        
-        activities_timeline = []
-        current_date = start_date
-        while current_date <= end_date:
-            count = Activity.objects.filter(
-                user=user,
-                activity_date__date=current_date
-            ).count()
-            activities_timeline.append({
-                'date': current_date,
-                'count': count
-            })
-            current_date += timedelta(days=1)
+        granularity = request.query_params.get('granularity', timeline.DAY)
+        if granularity not in timeline.TRUNCATE:
+            return Response(
+                {'error': f"granularity must be one of {', '.join(timeline.TRUNCATE)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            end_date = query_date(request, 'end_date') or timezone.localdate()
+            start_date = query_date(request, 'start_date') or end_date - timedelta(days=30)
+        except ValueError:
+            return Response({'error': 'Dates must be valid YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+        if start_date > end_date or (end_date - start_date).days > timeline.MAX_TIMELINE_DAYS:
+            return Response(
+                {'error': f'start_date must be on or before end_date, at most {timeline.MAX_TIMELINE_DAYS} days apart'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         return Response({
             'activity_types': activity_types,
-            'activities_timeline': activities_timeline,
+            'activities_timeline': timeline.timeline(
+                Activity.objects.filter(user=user), start_date, end_date, granularity
+            ),
         })
 
 
+class ProgressSnapshotViewSet(viewsets.ReadOnlyModelViewSet):
+    """The user's weekly/monthly progress snapshots, newest first (``?period_type=weekly``)"""
+    serializer_class = ProgressSnapshotSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        queryset = ProgressSnapshot.objects.filter(user=self.request.user)
+        period_type = self.request.query_params.get('period_type')
+        if period_type:
+            queryset = queryset.filter(period_type=period_type)
+        return queryset
+
+
 class HabitViewSet(viewsets.ModelViewSet):
     serializer_class = HabitSerializer
     permission_classes = [IsAuthenticated]
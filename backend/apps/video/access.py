@@ -0,0 +1,62 @@
+"""
+Cached answers to "may this user join this session's room".
+
+Connections look the answer up by (room, user). A room names the session
+with that meeting id, or, when no session has it and the room is numeric,
+the session with that id (see ``room_sessions``). Whenever a session is
+saved or deleted, the entries of its old and new participants under every
+room it is or was reachable by are dropped once the change commits, so a
+grant never outlives a change of mentor, mentee or meeting id. A numeric
+meeting id can shadow another session's id, so that session's participants
+are dropped for those rooms too.
+"""
+from django.core.cache import cache
+from django.db import transaction
+
+
+def access_cache_key(session_id, user_id):
+    return f'video_access:{session_id}:{user_id}'
+
+
+def room_sessions(model, room):
+    """Sessions reachable as ``room``: by meeting id first, by id only if no meeting id matches"""
+    sessions = model.objects.filter(meeting_id=room)
+    if room.isdigit() and not sessions.exists():
+        sessions = model.objects.filter(id=int(room))
+    return sessions
+
+
+def participants(sender, pk):
+    """``(mentor user id, mentee id, meeting id)`` of the saved session ``pk``, or None"""
+    return sender.objects.filter(pk=pk).values_list('mentor__user_id', 'mentee_id', 'meeting_id').first()
+
+
+def forget_access(sender, session_id, rows):
+    """Drop cached access of the participants in ``rows`` once the transaction commits"""
+    rows = list(filter(None, rows))
+    rooms = {str(session_id)} | {meeting_id for _, _, meeting_id in rows if meeting_id}
+    user_ids = {user_id for mentor_user_id, mentee_id, _ in rows for user_id in (mentor_user_id, mentee_id)}
+    # A numeric meeting id shares its room with the session of that id
+    shadowed = [int(room) for room in rooms if room.isdigit() and room != str(session_id)]
+    if shadowed:
+        for mentor_user_id, mentee_id in sender.objects.filter(id__in=shadowed).values_list(
+            'mentor__user_id', 'mentee_id'
+        ):
+            user_ids.update((mentor_user_id, mentee_id))
+    keys = [access_cache_key(room, user_id) for room in rooms for user_id in user_ids]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def session_saving(sender, instance, **kwargs):
+    """Note who had access before the save"""
+    instance._previous_participants = participants(sender, instance.pk) if instance.pk else None
+
+
+def session_saved(sender, instance, **kwargs):
+    current = (instance.mentor.user_id, instance.mentee_id, instance.meeting_id)
+    forget_access(sender, instance.pk, [getattr(instance, '_previous_participants', None), current])
+
+
+def session_deleting(sender, instance, **kwargs):
+    forget_access(sender, instance.pk, [participants(sender, instance.pk)])
@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_save, pre_delete, pre_save
 
 
 class VideoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.video'
+
+    def ready(self):
+        from . import access
+
+        # Cached room access follows changes to a session's participants
+        pre_save.connect(access.session_saving, sender='mentors.MentorshipSession', dispatch_uid='video.session_saving')
+        post_save.connect(access.session_saved, sender='mentors.MentorshipSession', dispatch_uid='video.session_saved')
+        pre_delete.connect(
+            access.session_deleting, sender='mentors.MentorshipSession', dispatch_uid='video.session_deleting'
+        )
@@ -1,30 +1,59 @@
-import json
+import asyncio
 import logging
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
 from apps.mentors.models import MentorshipSession
+from .access import access_cache_key, room_sessions
+from .presence import HEARTBEAT_INTERVAL as PRESENCE_HEARTBEAT_INTERVAL, presence
+from .signaling import (
+    ICE_BATCH_MAX_SIZE,
+    ICE_BATCH_WINDOW,
+    RELAYED_MESSAGE_TYPES,
+    FrameError,
+    decode_frame,
+    encode_frame,
+    wants_binary_frames,
+)
 
 logger = logging.getLogger(__name__)
 
+# Seconds a (user, session) authorization result is reused by new connections
+ACCESS_CACHE_TIMEOUT = getattr(settings, 'VIDEO_ACCESS_CACHE_TIMEOUT', 300)
+ACCESS_DENIED_CACHE_TIMEOUT = getattr(settings, 'VIDEO_ACCESS_DENIED_CACHE_TIMEOUT', 30)
+
 
 class VideoCallConsumer(AsyncWebsocketConsumer):
+    # Seconds to coalesce outgoing ICE candidates; 0 relays them immediately
+    ice_batch_window = ICE_BATCH_WINDOW
+    ice_batch_max_size = ICE_BATCH_MAX_SIZE
+
     async def connect(self):
         # Get session ID from URL route
         self.session_id = self.scope['url_route']['kwargs']['session_id']
         self.room_group_name = f'video_call_{self.session_id}'
-        
+
+        # Channel names of the other peers in the room, so signaling can be
+        # addressed to them directly instead of broadcast to the whole group
+        self.peers = {}
+        self.pending_ice = []
+        self.ice_flush_task = None
+        self.heartbeat_task = None
+        self.binary_frames = wants_binary_frames(self.scope)
+
         # Check if user is authenticated and authorized for this session
-        # if isinstance(self.scope['user'], AnonymousUser):
-        #     await self.close(code=4001)  # Unauthorized
-        #     print(f"Connecting to video call session {self.session_id} {self.scope['user']}")
-        #     return
-            
-        # # Verify user has access to this session
-        # has_access = await self.check_session_access()
-        # if not has_access:
-        #     await self.close(code=4003)  # Forbidden
-        #     return
+        if isinstance(self.scope['user'], AnonymousUser):
+            await self.close(code=4001)  # Unauthorized
+            return
+
+        # Verify user has access to this session; the answer is kept for the
+        # lifetime of the connection
+        self.has_access = await self.check_session_access()
+        if not self.has_access:
+            await self.close(code=4003)  # Forbidden
+            return
 
         # Join room group
         await self.channel_layer.group_add(
@@ -33,112 +62,261 @@ class VideoCallConsumer(AsyncWebsocketConsumer):
         )
 
         await self.accept()
-        
-        # Notify others that user joined
+
+        participants = await presence.join(
+            self.room_group_name,
+            self.channel_name,
+            self.scope['user'].id,
+            self.scope['user'].username,
+        )
+        self.heartbeat_task = asyncio.ensure_future(self.heartbeat_loop())
+
+        await self.send_frame({
+            'type': 'participants',
+            'participants': [
+                {'user_id': entry['user_id'], 'username': entry['username'], 'joined_at': entry['joined_at']}
+                for entry in participants.values()
+            ],
+        })
+
+        # Notify others that user joined; they answer with a direct
+        # peer_present message so we learn their channel names too
         await self.channel_layer.group_send(
             self.room_group_name,
             {
                 'type': 'user_joined',
                 'user_id': self.scope['user'].id,
-                'username': self.scope['user'].username
+                'username': self.scope['user'].username,
+                'channel_name': self.channel_name,
             }
         )
-        
+
         logger.info(f"User {self.scope['user'].username} joined video call {self.session_id}")
 
     async def disconnect(self, close_code):
+        if not getattr(self, 'has_access', False):
+            # Rejected before joining the room
+            return
+
+        if self.heartbeat_task is not None:
+            self.heartbeat_task.cancel()
+            self.heartbeat_task = None
+        await presence.leave(self.room_group_name, self.channel_name)
+
+        if self.ice_flush_task is not None:
+            self.ice_flush_task.cancel()
+            self.ice_flush_task = None
+        self.pending_ice = []
+
         # Leave room group
         await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name
         )
-        
+
         # Notify others that user left
-        if hasattr(self, 'room_group_name'):
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    'type': 'user_left',
-                    'user_id': self.scope['user'].id if self.scope['user'] else None,
-                    'username': self.scope['user'].username if self.scope['user'] else None
-                }
-            )
-            
+        await self.channel_layer.group_send(
+            self.room_group_name,
+            {
+                'type': 'user_left',
+                'user_id': self.scope['user'].id if self.scope['user'] else None,
+                'username': self.scope['user'].username if self.scope['user'] else None,
+                'channel_name': self.channel_name,
+            }
+        )
+
         logger.info(f"User disconnected from video call {self.session_id}")
 
-    async def receive(self, text_data):
+    async def receive(self, text_data=None, bytes_data=None):
+        if bytes_data is not None:
+            # A client that speaks binary gets binary back
+            self.binary_frames = True
+
         try:
-            text_data_json = json.loads(text_data)
-            message_type = text_data_json.get('type')
-            
+            message = decode_frame(text_data=text_data, bytes_data=bytes_data)
+            message_type = message.get('type')
+
             # Handle different types of signaling messages
-            if message_type in ['offer', 'answer', 'ice-candidate', 'chat']:
-                await self.channel_layer.group_send(
-                    self.room_group_name,
-                    {
-                        'type': 'signaling_message',
-                        'message': text_data_json,
-                        'sender_id': self.scope['user'].id,
-                        'sender_username': self.scope['user'].username
-                    }
-                )
+            if message_type == 'heartbeat':
+                await self.heartbeat()
+            elif message_type == 'ice-candidate':
+                await self.queue_ice_candidate(message)
+            elif message_type in RELAYED_MESSAGE_TYPES:
+                # Candidates gathered before an offer/answer must not overtake it
+                await self.flush_ice_candidates()
+                await self.relay({
+                    'type': 'signaling_message',
+                    'message': message,
+                })
             else:
                 logger.warning(f"Unknown message type: {message_type}")
-                
-        except json.JSONDecodeError:
-            logger.error(f"Invalid JSON received: {text_data}")
+
+        except FrameError as e:
+            logger.error(f"Invalid signaling frame received: {str(e)}")
         except Exception as e:
             logger.error(f"Error processing message: {str(e)}")
 
+    async def heartbeat_loop(self):
+        try:
+            while True:
+                await asyncio.sleep(PRESENCE_HEARTBEAT_INTERVAL)
+                await self.heartbeat()
+        except asyncio.CancelledError:
+            pass
+
+    async def heartbeat(self):
+        evicted = await presence.heartbeat(
+            self.room_group_name,
+            self.channel_name,
+            self.scope['user'].id,
+            self.scope['user'].username,
+        )
+        for channel_name, entry in evicted.items():
+            # A peer whose worker went away without saying goodbye
+            if self.peers.pop(channel_name, None) is not None:
+                await self.send_frame({
+                    'type': 'user-left',
+                    'user_id': entry['user_id'],
+                    'username': entry['username']
+                })
+
+    async def send_frame(self, message):
+        await self.send(**encode_frame(message, binary=self.binary_frames))
+
+    async def relay(self, event):
+        """Send an event to every other peer in the room"""
+        event['sender_id'] = self.scope['user'].id
+        event['sender_username'] = self.scope['user'].username
+        event['sender_channel'] = self.channel_name
+
+        if not self.peers:
+            # Nobody announced yet; a peer may be joining right now, so fall
+            # back to the group and let recipients drop their own echo
+            await self.channel_layer.group_send(self.room_group_name, event)
+            return
+
+        for channel_name in list(self.peers):
+            await self.channel_layer.send(channel_name, event)
+
+    async def queue_ice_candidate(self, message):
+        if not self.ice_batch_window:
+            await self.relay({'type': 'ice_candidates', 'messages': [message]})
+            return
+
+        self.pending_ice.append(message)
+        if len(self.pending_ice) >= self.ice_batch_max_size:
+            await self.flush_ice_candidates()
+        elif self.ice_flush_task is None:
+            self.ice_flush_task = asyncio.ensure_future(self.delayed_ice_flush())
+
+    async def delayed_ice_flush(self):
+        try:
+            await asyncio.sleep(self.ice_batch_window)
+        except asyncio.CancelledError:
+            return
+        self.ice_flush_task = None
+        await self.flush_ice_candidates()
+
+    async def flush_ice_candidates(self):
+        if self.ice_flush_task is not None:
+            if self.ice_flush_task is not asyncio.current_task():
+                self.ice_flush_task.cancel()
+            self.ice_flush_task = None
+
+        if not self.pending_ice:
+            return
+
+        messages, self.pending_ice = self.pending_ice, []
+        await self.relay({'type': 'ice_candidates', 'messages': messages})
+
+    def is_own_echo(self, event):
+        return event.get('sender_channel') == self.channel_name
+
     # Handler for signaling messages
     async def signaling_message(self, event):
-        message = event['message']
-        sender_id = event['sender_id']
-        
-        # Don't send message back to sender
-        if sender_id != self.scope['user'].id:
-            await self.send(text_data=json.dumps(message))
+        # Don't send message back to sender (only possible on group fallback)
+        if not self.is_own_echo(event):
+            await self.send_frame(event['message'])
+
+    # Handler for a batch of ICE candidates; clients still receive one
+    # ice-candidate frame per candidate
+    async def ice_candidates(self, event):
+        if self.is_own_echo(event):
+            return
+        for message in event['messages']:
+            await self.send_frame(message)
 
     # Handler for user joined event
     async def user_joined(self, event):
+        if event.get('channel_name') == self.channel_name:
+            return
+
         user_id = event['user_id']
         username = event['username']
-        
-        # Don't send to the user who just joined
-        if user_id != self.scope['user'].id:
-            await self.send(text_data=json.dumps({
-                'type': 'user-joined',
-                'user_id': user_id,
-                'username': username
-            }))
+        self.peers[event['channel_name']] = user_id
+
+        # Tell the newcomer where to reach us directly
+        await self.channel_layer.send(
+            event['channel_name'],
+            {
+                'type': 'peer_present',
+                'user_id': self.scope['user'].id,
+                'username': self.scope['user'].username,
+                'channel_name': self.channel_name,
+            }
+        )
+
+        await self.send_frame({
+            'type': 'user-joined',
+            'user_id': user_id,
+            'username': username
+        })
+
+    # Handler for a peer that was already in the room when we joined
+    async def peer_present(self, event):
+        self.peers[event['channel_name']] = event['user_id']
 
     # Handler for user left event
     async def user_left(self, event):
-        user_id = event['user_id']
-        username = event['username']
-        
-        # Don't send to the user who left (they're already disconnected)
-        if user_id != self.scope['user'].id:
-            await self.send(text_data=json.dumps({
-                'type': 'user-left',
-                'user_id': user_id,
-                'username': username
-            }))
+        if event.get('channel_name') == self.channel_name:
+            return
 
-    @database_sync_to_async
-    def check_session_access(self):
+        self.peers.pop(event.get('channel_name'), None)
+
+        await self.send_frame({
+            'type': 'user-left',
+            'user_id': event['user_id'],
+            'username': event['username']
+        })
+
+    async def check_session_access(self):
         """Check if the current user has access to this session"""
+        user_id = self.scope['user'].id
+        cache_key = access_cache_key(self.session_id, user_id)
+
+        # Cached across connections so reconnect storms don't hit the database;
+        # session changes drop the entry (see access.py)
+        has_access = await cache.aget(cache_key)
+        if has_access is None:
+            has_access = await self.fetch_session_access(user_id)
+            await cache.aset(
+                cache_key,
+                has_access,
+                ACCESS_CACHE_TIMEOUT if has_access else ACCESS_DENIED_CACHE_TIMEOUT,
+            )
+        return has_access
+
+    @database_sync_to_async
+    def fetch_session_access(self, user_id):
         try:
-            session = MentorshipSession.objects.get(id=self.session_id)
-            user = self.scope['user']
-            
-            # User has access if they are either the mentor or the mentee
-            return (
-                (hasattr(user, 'mentor_profile') and session.mentor == user.mentor_profile) or
-                session.mentee == user
+            participants = (
+                room_sessions(MentorshipSession, self.session_id)
+                .values_list('mentor__user_id', 'mentee_id')
+                .first()
             )
-        except MentorshipSession.DoesNotExist:
-            return False
         except Exception as e:
             logger.error(f"Error checking session access: {str(e)}")
             return False
+
+        # User has access if they are either the mentor or the mentee
+        return participants is not None and user_id in participants
@@ -0,0 +1,403 @@
+"""
+Load-test harness for the video call signaling websocket.
+
+Simulated peers join rooms on ``ws/video-call/<session_id>/`` and replay a
+realistic offer/answer/trickle-ICE exchange. Peers talk either to the ASGI
+application in-process through Channels' ``WebsocketCommunicator`` or to a
+running Daphne server through a minimal asyncio websocket client, so the
+same scenario measures both the consumer itself and a deployed process.
+
+Driven by the ``loadtest_video`` management command.
+"""
+import asyncio
+import base64
+import os
+import random
+import ssl
+import statistics
+import struct
+import time
+from urllib.parse import urlparse
+
+from . import signaling
+
+
+class ConnectionClosed(Exception):
+    def __init__(self, code=None):
+        super().__init__(f'Connection closed ({code})')
+        self.code = code
+
+
+class RawWebSocketClient:
+    """
+    Minimal RFC 6455 client on top of asyncio streams.
+
+    Only what the signaling protocol needs: text and binary frames, ping/pong
+    and close. Frames from the server are never masked; ours always are.
+    """
+
+    def __init__(self, url):
+        self.url = urlparse(url)
+        self.reader = None
+        self.writer = None
+
+    async def connect(self, timeout=10):
+        secure = self.url.scheme == 'wss'
+        port = self.url.port or (443 if secure else 80)
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(
+                self.url.hostname,
+                port,
+                ssl=ssl.create_default_context() if secure else None,
+            ),
+            timeout,
+        )
+
+        path = self.url.path or '/'
+        if self.url.query:
+            path += f'?{self.url.query}'
+        key = base64.b64encode(os.urandom(16)).decode()
+        self.writer.write((
+            f'GET {path} HTTP/1.1\r\n'
+            f'Host: {self.url.netloc}\r\n'
+            'Upgrade: websocket\r\n'
+            'Connection: Upgrade\r\n'
+            f'Sec-WebSocket-Key: {key}\r\n'
+            'Sec-WebSocket-Version: 13\r\n'
+            '\r\n'
+        ).encode())
+        await self.writer.drain()
+
+        response = await asyncio.wait_for(self.reader.readuntil(b'\r\n\r\n'), timeout)
+        status_line = response.split(b'\r\n', 1)[0].decode('latin-1')
+        if ' 101 ' not in f'{status_line} ':
+            raise ConnectionClosed(status_line)
+
+    async def send(self, text_data=None, bytes_data=None):
+        if bytes_data is not None:
+            opcode, payload = 0x2, bytes_data
+        else:
+            opcode, payload = 0x1, text_data.encode()
+        await self._write_frame(opcode, payload)
+
+    async def _write_frame(self, opcode, payload):
+        header = bytearray([0x80 | opcode])
+        length = len(payload)
+        if length < 126:
+            header.append(0x80 | length)
+        elif length < 1 << 16:
+            header.append(0x80 | 126)
+            header += struct.pack('!H', length)
+        else:
+            header.append(0x80 | 127)
+            header += struct.pack('!Q', length)
+
+        mask = os.urandom(4)
+        masked = bytes(byte ^ mask[index % 4] for index, byte in enumerate(payload))
+        self.writer.write(bytes(header) + mask + masked)
+        await self.writer.drain()
+
+    async def receive(self):
+        """Return the next data frame as ``{'text_data': ...}`` or ``{'bytes_data': ...}``"""
+        message_opcode, chunks = None, []
+        while True:
+            first, second = await self.reader.readexactly(2)
+            fin, opcode = first & 0x80, first & 0x0F
+            length = second & 0x7F
+            if length == 126:
+                length, = struct.unpack('!H', await self.reader.readexactly(2))
+            elif length == 127:
+                length, = struct.unpack('!Q', await self.reader.readexactly(8))
+            payload = await self.reader.readexactly(length)
+
+            if opcode == 0x8:
+                code = struct.unpack('!H', payload[:2])[0] if len(payload) >= 2 else None
+                raise ConnectionClosed(code)
+            if opcode == 0x9:
+                await self._write_frame(0xA, payload)
+                continue
+            if opcode == 0xA:
+                continue
+
+            if opcode != 0x0:
+                message_opcode = opcode
+            chunks.append(payload)
+            if fin:
+                data = b''.join(chunks)
+                if message_opcode == 0x2:
+                    return {'bytes_data': data}
+                return {'text_data': data.decode()}
+
+    async def close(self):
+        if self.writer is None:
+            return
+        try:
+            await self._write_frame(0x8, struct.pack('!H', 1000))
+        except (ConnectionError, RuntimeError):
+            pass
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except (ConnectionError, ssl.SSLError):
+            pass
+
+
+class CommunicatorClient:
+    """Same interface as RawWebSocketClient, talking to an in-process ASGI app"""
+
+    def __init__(self, application, path):
+        from channels.testing import WebsocketCommunicator
+
+        self.communicator = WebsocketCommunicator(application, path)
+
+    async def connect(self, timeout=10):
+        connected, code = await self.communicator.connect(timeout=timeout)
+        if not connected:
+            raise ConnectionClosed(code)
+
+    async def send(self, text_data=None, bytes_data=None):
+        await self.communicator.send_to(text_data=text_data, bytes_data=bytes_data)
+
+    async def receive(self):
+        output = await self.communicator.receive_output(timeout=None)
+        if output['type'] == 'websocket.close':
+            raise ConnectionClosed(output.get('code'))
+        if output.get('bytes') is not None:
+            return {'bytes_data': output['bytes']}
+        return {'text_data': output['text']}
+
+    async def close(self):
+        await self.communicator.disconnect()
+
+
+def with_user(application, user):
+    """Inject a simulated user into the scope, standing in for AuthMiddlewareStack"""
+    async def app(scope, receive, send):
+        return await application(dict(scope, user=user), receive, send)
+    return app
+
+
+async def grant_access(consumer):
+    return True
+
+
+def in_process_application(**attrs):
+    """
+    The video call route served by a VideoCallConsumer whose session
+    authorization is skipped, so simulated users need no database rows.
+    Extra keyword arguments override consumer class attributes.
+    """
+    from channels.routing import URLRouter
+    from django.urls import re_path
+
+    from .consumers import VideoCallConsumer
+
+    consumer = type('LoadTestVideoCallConsumer', (VideoCallConsumer,), {
+        'check_session_access': grant_access,
+        **attrs,
+    })
+    return URLRouter([
+        re_path(r'ws/video-call/(?P<session_id>\w+)/$', consumer.as_asgi()),
+    ])
+
+
+def percentiles(values, points=(50, 95, 99)):
+    """Nearest-rank percentiles of ``values`` in milliseconds"""
+    if not values:
+        return {}
+    ordered = sorted(values)
+    result = {
+        f'p{point}': ordered[min(len(ordered) - 1, max(0, int(round(point / 100 * len(ordered))) - 1))] * 1000
+        for point in points
+    }
+    result['max'] = ordered[-1] * 1000
+    result['mean'] = statistics.fmean(ordered) * 1000
+    return result
+
+
+class LoadTestStats:
+    def __init__(self):
+        self.connect_latencies = []
+        self.fanout_latencies = []
+        self.connect_errors = {}
+        self.sent = 0
+        self.expected_deliveries = 0
+        self.delivered = 0
+        self.open_connections = 0
+        self.exchange_timeouts = 0
+        self.elapsed = 0
+
+    def connect_failed(self, reason):
+        reason = str(reason)
+        self.connect_errors[reason] = self.connect_errors.get(reason, 0) + 1
+
+
+class Peer:
+    def __init__(self, client, room, index, binary, stats):
+        self.client = client
+        self.room = room
+        self.index = index
+        self.binary = binary
+        self.stats = stats
+        self.inbox = asyncio.Queue()
+        self.reader_task = None
+        self.sent = 0
+        self.received = 0
+
+    async def connect(self):
+        started = time.perf_counter()
+        await self.client.connect()
+        self.stats.open_connections += 1
+        self.reader_task = asyncio.ensure_future(self.read())
+        # The server greets every accepted connection with the room roster
+        await self.wait_for('participants')
+        self.stats.connect_latencies.append(time.perf_counter() - started)
+
+    async def read(self):
+        try:
+            while True:
+                frame = await self.client.receive()
+                message = signaling.decode_frame(**frame)
+                if 'lt_sent_at' in message:
+                    self.received += 1
+                    self.stats.delivered += 1
+                    self.stats.fanout_latencies.append(time.time() - message['lt_sent_at'])
+                # Candidates are only counted; nothing in the scenario waits on them
+                if message.get('type') != 'ice-candidate':
+                    await self.inbox.put(message)
+        except (ConnectionClosed, asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+    async def wait_for(self, message_type, timeout=30):
+        while True:
+            message = await asyncio.wait_for(self.inbox.get(), timeout)
+            if message.get('type') == message_type:
+                return message
+
+    async def send(self, message, fanout):
+        message['lt_sent_at'] = time.time()
+        self.sent += 1
+        self.stats.sent += 1
+        self.stats.expected_deliveries += fanout
+        await self.client.send(**signaling.encode_frame(message, binary=self.binary))
+
+    async def close(self):
+        await self.client.close()
+        if self.reader_task is not None:
+            self.reader_task.cancel()
+            self.stats.open_connections -= 1
+
+
+def fake_sdp(kind, room, index):
+    return {
+        'type': kind,
+        'sdp': (
+            f'v=0\r\no=- {room}{index} 2 IN IP4 127.0.0.1\r\ns=-\r\nt=0 0\r\n'
+            'a=group:BUNDLE 0 1\r\nm=audio 9 UDP/TLS/RTP/SAVPF 111\r\n'
+            'm=video 9 UDP/TLS/RTP/SAVPF 96 97\r\n'
+        ),
+    }
+
+
+def fake_candidate(room, index, number):
+    return {
+        'candidate': (
+            f'candidate:{number} 1 udp {2122260223 - number} '
+            f'10.{room % 250}.{index % 250}.{number % 250} {50000 + number} typ host'
+        ),
+        'sdpMid': str(number % 2),
+        'sdpMLineIndex': number % 2,
+    }
+
+
+async def drain(peers, timeout):
+    """Wait until every peer received everything the others sent"""
+    total_sent = sum(peer.sent for peer in peers)
+    deadline = time.perf_counter() + timeout
+    while any(peer.received < total_sent - peer.sent for peer in peers):
+        if time.perf_counter() > deadline:
+            raise asyncio.TimeoutError
+        await asyncio.sleep(0.01)
+
+
+async def run_room(make_client, room, session_id, peers_per_room, candidates, ice_jitter,
+                   hold, binary, stats, connect_slots, drain_timeout=30):
+    """Replay one call: everyone joins, the first peer offers, the rest answer, all trickle ICE"""
+    peers = []
+    fanout = peers_per_room - 1
+    try:
+        for index in range(peers_per_room):
+            peer = Peer(make_client(session_id, index), room, index, binary, stats)
+            async with connect_slots:
+                try:
+                    await peer.connect()
+                except (ConnectionClosed, OSError, asyncio.TimeoutError) as e:
+                    stats.connect_failed(e.__class__.__name__ if not str(e) else e)
+                    await peer.close()
+                    continue
+            peers.append(peer)
+
+        if len(peers) < 2:
+            return
+
+        caller, callees = peers[0], peers[1:]
+        fanout = len(peers) - 1
+
+        async def trickle(peer):
+            for number in range(candidates):
+                await asyncio.sleep(random.uniform(0, ice_jitter))
+                await peer.send({
+                    'type': 'ice-candidate',
+                    'candidate': fake_candidate(room, peer.index, number),
+                }, fanout)
+
+        try:
+            await caller.send({'type': 'offer', 'offer': fake_sdp('offer', room, 0)}, fanout)
+            for callee in callees:
+                await callee.wait_for('offer')
+                await callee.send({'type': 'answer', 'answer': fake_sdp('answer', room, callee.index)}, fanout)
+            await asyncio.gather(*[trickle(peer) for peer in peers])
+            await drain(peers, drain_timeout)
+        except asyncio.TimeoutError:
+            stats.exchange_timeouts += 1
+        await asyncio.sleep(hold)
+    finally:
+        for peer in peers:
+            await peer.close()
+
+
+async def run_load_test(make_client, rooms, peers_per_room, candidates, ice_jitter=0.05,
+                        hold=1.0, binary=False, concurrency=200, session_ids=None,
+                        on_connected=None):
+    """
+    Run ``rooms`` concurrent calls and return a LoadTestStats.
+
+    ``make_client(session_id, peer_index)`` builds the client for one peer.
+    ``on_connected`` is awaited once every room has finished connecting,
+    while all connections are still held open (used to sample memory).
+    """
+    stats = LoadTestStats()
+    started = time.perf_counter()
+    connect_slots = asyncio.Semaphore(concurrency)
+    session_ids = session_ids or [f'loadtest{room}' for room in range(rooms)]
+
+    tasks = [
+        asyncio.ensure_future(run_room(
+            make_client, room, session_ids[room % len(session_ids)], peers_per_room,
+            candidates, ice_jitter, hold, binary, stats, connect_slots,
+        ))
+        for room in range(rooms)
+    ]
+
+    expected_connections = rooms * peers_per_room
+    if on_connected is not None:
+        while (
+            len(stats.connect_latencies) + sum(stats.connect_errors.values()) < expected_connections
+            and not all(task.done() for task in tasks)
+        ):
+            await asyncio.sleep(0.05)
+        await on_connected(stats)
+
+    await asyncio.gather(*tasks)
+    stats.elapsed = time.perf_counter() - started
+    return stats
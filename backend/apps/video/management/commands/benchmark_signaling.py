@@ -0,0 +1,157 @@
+import asyncio
+import json
+import logging
+import statistics
+import time
+from types import SimpleNamespace
+
+from channels.layers import InMemoryChannelLayer
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from apps.video import signaling
+from apps.video.loadtest import in_process_application, with_user
+
+
+class CountingChannelLayer(InMemoryChannelLayer):
+    """In-memory channel layer that counts the traffic passing through it"""
+
+    counters = {'send': 0, 'group_send': 0}
+
+    async def send(self, channel, message):
+        self.counters['send'] += 1
+        return await super().send(channel, message)
+
+    async def group_send(self, group, message):
+        self.counters['group_send'] += 1
+        return await super().group_send(group, message)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark video call signaling over N simulated two-peer rooms'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=100, help='Number of simulated rooms')
+        parser.add_argument('--candidates', type=int, default=12, help='ICE candidates sent by each peer')
+        parser.add_argument('--batch-window', type=float, default=None,
+                            help='ICE batching window in seconds (default: VIDEO_ICE_BATCH_WINDOW)')
+        parser.add_argument('--binary', action='store_true', help='Use msgpack binary frames')
+        parser.add_argument('--compare', action='store_true',
+                            help='Also run with ICE batching disabled for comparison')
+
+    def handle(self, *args, **options):
+        if options['binary'] and not signaling.binary_frames_available():
+            self.stdout.write(self.style.ERROR('msgpack is not installed; binary frames unavailable'))
+            return
+
+        # Per-connection join/leave logging would dominate the timings
+        logging.getLogger('apps.video.consumers').setLevel(logging.WARNING)
+
+        window = options['batch_window']
+        if window is None:
+            window = signaling.ICE_BATCH_WINDOW
+
+        runs = [window]
+        if options['compare'] and window:
+            runs.insert(0, 0)
+
+        for batch_window in runs:
+            result = asyncio.run(self.run_benchmark(
+                rooms=options['rooms'],
+                candidates=options['candidates'],
+                batch_window=batch_window,
+                binary=options['binary'],
+            ))
+            self.report(batch_window, result)
+
+    async def run_benchmark(self, rooms, candidates, batch_window, binary):
+        CountingChannelLayer.counters = {'send': 0, 'group_send': 0}
+        layers = {'default': {'BACKEND': f'{__name__}.CountingChannelLayer'}}
+        router = in_process_application(ice_batch_window=batch_window)
+
+        with override_settings(CHANNEL_LAYERS=layers):
+            latencies = []
+            started = time.perf_counter()
+            await asyncio.gather(*[
+                self.simulate_room(router, room, candidates, binary, latencies)
+                for room in range(rooms)
+            ])
+            elapsed = time.perf_counter() - started
+
+        return {
+            'rooms': rooms,
+            'elapsed': elapsed,
+            'frames': len(latencies),
+            'latencies': latencies,
+            'counters': dict(CountingChannelLayer.counters),
+        }
+
+    async def simulate_room(self, router, room, candidates, binary, latencies):
+        path = f'/ws/video-call/bench{room}/'
+        if binary:
+            path += '?format=msgpack'
+
+        caller = WebsocketCommunicator(
+            with_user(router, SimpleNamespace(id=room * 2 + 1, username=f'caller{room}')), path
+        )
+        callee = WebsocketCommunicator(
+            with_user(router, SimpleNamespace(id=room * 2 + 2, username=f'callee{room}')), path
+        )
+
+        await caller.connect()
+        await self.receive(caller, binary)  # participants
+        await callee.connect()
+        await self.receive(callee, binary)  # participants
+        await self.receive(caller, binary)  # user-joined for the callee
+
+        await self.send(caller, binary, {'type': 'offer', 'offer': {'type': 'offer', 'sdp': 'v=0'}})
+        latencies.append(await self.receive(callee, binary))
+        await self.send(callee, binary, {'type': 'answer', 'answer': {'type': 'answer', 'sdp': 'v=0'}})
+        latencies.append(await self.receive(caller, binary))
+
+        for index in range(candidates):
+            candidate = {'candidate': f'candidate:{index} 1 udp 2122260223 10.0.0.{index} 5000{index} typ host'}
+            await self.send(caller, binary, {'type': 'ice-candidate', 'candidate': candidate})
+            await self.send(callee, binary, {'type': 'ice-candidate', 'candidate': candidate})
+        for _ in range(candidates):
+            latencies.append(await self.receive(caller, binary))
+            latencies.append(await self.receive(callee, binary))
+
+        await caller.disconnect()
+        await callee.disconnect()
+
+    async def send(self, communicator, binary, message):
+        message['sent_at'] = time.perf_counter()
+        frame = signaling.encode_frame(message, binary=binary)
+        await communicator.send_to(**frame)
+
+    async def receive(self, communicator, binary):
+        if binary:
+            message = signaling.decode_frame(bytes_data=await communicator.receive_from(timeout=5))
+        else:
+            message = json.loads(await communicator.receive_from(timeout=5))
+        if 'sent_at' in message:
+            return time.perf_counter() - message['sent_at']
+        return None
+
+    def report(self, batch_window, result):
+        latencies = sorted(value for value in result['latencies'] if value is not None)
+        counters = result['counters']
+        layer_ops = counters['send'] + counters['group_send']
+
+        self.stdout.write(self.style.SUCCESS(f'ICE batch window: {batch_window * 1000:.0f}ms'))
+        self.stdout.write(f"  rooms:               {result['rooms']}")
+        self.stdout.write(f"  relayed frames:      {result['frames']}")
+        self.stdout.write(f"  elapsed:             {result['elapsed']:.3f}s")
+        self.stdout.write(
+            f"  channel layer ops:   {layer_ops} "
+            f"(send={counters['send']}, group_send={counters['group_send']}, "
+            f"{layer_ops / max(result['rooms'], 1):.1f}/room)"
+        )
+        if latencies:
+            self.stdout.write(
+                f'  delivery latency:    p50={statistics.median(latencies) * 1000:.2f}ms '
+                f'p95={latencies[int(len(latencies) * 0.95) - 1] * 1000:.2f}ms '
+                f'max={latencies[-1] * 1000:.2f}ms'
+            )
@@ -0,0 +1,207 @@
+import asyncio
+import itertools
+import logging
+import os
+import tracemalloc
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.video import signaling
+from apps.video.loadtest import (
+    CommunicatorClient,
+    RawWebSocketClient,
+    in_process_application,
+    percentiles,
+    run_load_test,
+    with_user,
+)
+
+
+def read_rss(pid):
+    """Resident set size of a process in bytes, from /proc (Linux only)"""
+    try:
+        with open(f'/proc/{pid}/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-test the video call signaling websocket with simulated peers, either '
+        'in-process or against a running Daphne server (--url)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=1000, help='Number of concurrent rooms')
+        parser.add_argument('--peers-per-room', type=int, default=2, help='Peers joining each room')
+        parser.add_argument('--candidates', type=int, default=10, help='ICE candidates trickled by each peer')
+        parser.add_argument('--ice-jitter', type=float, default=0.05,
+                            help='Maximum delay in seconds between two candidates of one peer')
+        parser.add_argument('--hold', type=float, default=2.0,
+                            help='Seconds each room stays connected after the exchange')
+        parser.add_argument('--concurrency', type=int, default=200, help='Maximum simultaneous connection attempts')
+        parser.add_argument('--binary', action='store_true', help='Use msgpack binary frames')
+        parser.add_argument('--trace-memory', action='store_true',
+                            help='In-process: also measure Python allocations with tracemalloc (slow)')
+        parser.add_argument('--url', help='Base URL of a running server, e.g. ws://127.0.0.1:8000')
+        parser.add_argument('--tokens-file',
+                            help='With --url: lines of "<session_id> <access token> [<access token> ...]", '
+                                 'one token per peer of that session')
+        parser.add_argument('--server-pid', type=int, help='With --url: server process to sample memory from')
+
+    def handle(self, *args, **options):
+        if options['peers_per_room'] < 2:
+            raise CommandError('--peers-per-room must be at least 2')
+        if options['binary'] and not signaling.binary_frames_available():
+            raise CommandError('msgpack is not installed; binary frames unavailable')
+
+        # Per-connection join/leave logging would dominate the timings
+        logging.getLogger('apps.video.consumers').setLevel(logging.WARNING)
+
+        if options['url']:
+            stats, memory = asyncio.run(self.run_remote(options))
+        else:
+            stats, memory = asyncio.run(self.run_in_process(options))
+        self.report(options, stats, memory)
+
+    async def run_in_process(self, options):
+        application = in_process_application()
+        user_ids = itertools.count(1)
+
+        def make_client(session_id, index):
+            user_id = next(user_ids)
+            user = SimpleNamespace(id=user_id, username=f'peer{user_id}')
+            path = f'/ws/video-call/{session_id}/'
+            if options['binary']:
+                path += '?format=msgpack'
+            return CommunicatorClient(with_user(application, user), path)
+
+        memory = {}
+
+        async def sample_memory(stats):
+            memory['connections'] = stats.open_connections
+            if tracemalloc.is_tracing():
+                memory['traced'] = tracemalloc.get_traced_memory()[0] - memory['traced_baseline']
+            rss = read_rss(os.getpid())
+            if rss is not None:
+                memory['rss'] = rss - memory['rss_baseline']
+
+        if options['trace_memory']:
+            tracemalloc.start()
+            memory['traced_baseline'] = tracemalloc.get_traced_memory()[0]
+        memory['rss_baseline'] = read_rss(os.getpid()) or 0
+        try:
+            stats = await run_load_test(
+                make_client,
+                rooms=options['rooms'],
+                peers_per_room=options['peers_per_room'],
+                candidates=options['candidates'],
+                ice_jitter=options['ice_jitter'],
+                hold=options['hold'],
+                binary=options['binary'],
+                concurrency=options['concurrency'],
+                on_connected=sample_memory,
+            )
+        finally:
+            if options['trace_memory']:
+                tracemalloc.stop()
+        return stats, memory
+
+    async def run_remote(self, options):
+        base_url = options['url'].rstrip('/')
+        tokens = {}
+        if options['tokens_file']:
+            with open(options['tokens_file']) as tokens_file:
+                for line in tokens_file:
+                    parts = line.split()
+                    if parts:
+                        tokens[parts[0]] = parts[1:]
+            if len(tokens) < options['rooms']:
+                raise CommandError(
+                    f"--tokens-file lists {len(tokens)} sessions but --rooms is {options['rooms']}"
+                )
+
+        def make_client(session_id, index):
+            params = []
+            session_tokens = tokens.get(session_id)
+            if session_tokens:
+                params.append(f'token={session_tokens[index % len(session_tokens)]}')
+            if options['binary']:
+                params.append('format=msgpack')
+            query = f"?{'&'.join(params)}" if params else ''
+            return RawWebSocketClient(f'{base_url}/ws/video-call/{session_id}/{query}')
+
+        memory = {}
+        server_pid = options['server_pid']
+
+        async def sample_memory(stats):
+            memory['connections'] = stats.open_connections
+            rss = read_rss(server_pid)
+            if rss is not None:
+                memory['rss'] = rss - memory['rss_baseline']
+
+        if server_pid:
+            memory['rss_baseline'] = read_rss(server_pid) or 0
+
+        stats = await run_load_test(
+            make_client,
+            rooms=options['rooms'],
+            peers_per_room=options['peers_per_room'],
+            candidates=options['candidates'],
+            ice_jitter=options['ice_jitter'],
+            hold=options['hold'],
+            binary=options['binary'],
+            concurrency=options['concurrency'],
+            session_ids=list(tokens) or None,
+            on_connected=sample_memory if server_pid else None,
+        )
+        return stats, memory
+
+    def report(self, options, stats, memory):
+        target = options['url'] or 'in-process'
+        peers = options['rooms'] * options['peers_per_room']
+        connected = len(stats.connect_latencies)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Video signaling load test ({target}): {options['rooms']} rooms x "
+            f"{options['peers_per_room']} peers, {'msgpack' if options['binary'] else 'json'} frames"
+        ))
+        self.stdout.write(f'  elapsed:            {stats.elapsed:.2f}s')
+        self.stdout.write(f'  connected:          {connected}/{peers}')
+        for reason, count in stats.connect_errors.items():
+            self.stdout.write(self.style.WARNING(f'  connect failed:     {count} x {reason}'))
+        if stats.exchange_timeouts:
+            self.stdout.write(self.style.WARNING(f'  exchange timeouts:  {stats.exchange_timeouts} rooms'))
+        self.write_percentiles('connect latency', stats.connect_latencies)
+
+        lost = stats.expected_deliveries - stats.delivered
+        self.stdout.write(
+            f'  messages:           {stats.sent} sent, {stats.delivered}/{stats.expected_deliveries} '
+            f'delivered ({lost} lost)'
+        )
+        self.write_percentiles('fan-out latency', stats.fanout_latencies)
+
+        connections = memory.get('connections')
+        if connections:
+            if 'traced' in memory:
+                self.stdout.write(
+                    f"  memory/connection:  {memory['traced'] / connections / 1024:.1f} KiB traced "
+                    f'(Python allocations, includes the simulated clients)'
+                )
+            if 'rss' in memory:
+                self.stdout.write(
+                    f"  RSS/connection:     {memory['rss'] / connections / 1024:.1f} KiB "
+                    f'over {connections} open connections'
+                )
+
+    def write_percentiles(self, label, values):
+        if not values:
+            return
+        points = percentiles(values)
+        self.stdout.write(
+            f'  {label + ":":<20}'
+            f"p50={points['p50']:.2f}ms p95={points['p95']:.2f}ms p99={points['p99']:.2f}ms "
+            f"max={points['max']:.2f}ms"
+        )
@@ -0,0 +1,44 @@
+import logging
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken
+
+logger = logging.getLogger(__name__)
+
+
+@database_sync_to_async
+def get_user_for_token(raw_token):
+    try:
+        token = AccessToken(raw_token)
+    except TokenError as e:
+        logger.warning(f"Rejected websocket token: {str(e)}")
+        return None
+
+    User = get_user_model()
+    try:
+        return User.objects.get(id=token['user_id'], is_active=True)
+    except (User.DoesNotExist, KeyError):
+        return None
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """
+    Authenticate websocket connections with the same JWT access token the
+    REST API uses, passed as ``?token=<access token>``.
+
+    Connections without a token keep whatever user the session-based
+    AuthMiddlewareStack resolved.
+    """
+
+    async def __call__(self, scope, receive, send):
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        raw_token = query.get('token', [None])[0]
+        if raw_token:
+            user = await get_user_for_token(raw_token)
+            if user is not None:
+                scope = dict(scope, user=user)
+        return await super().__call__(scope, receive, send)
@@ -0,0 +1,111 @@
+"""
+Room presence registry for video calls.
+
+Participants are kept per room in the Django cache, so the registry is
+process-local with the default local-memory cache and shared between Daphne
+workers once a Redis cache is configured. Each connection refreshes its
+entry on a heartbeat; entries whose heartbeat lapses (for example because
+the worker holding the socket died) are evicted the next time the room is
+read.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Seconds between heartbeats sent by each connection
+HEARTBEAT_INTERVAL = getattr(settings, 'VIDEO_PRESENCE_HEARTBEAT_INTERVAL', 15)
+
+# Participants silent for longer than this are considered gone
+HEARTBEAT_TIMEOUT = getattr(settings, 'VIDEO_PRESENCE_HEARTBEAT_TIMEOUT', 45)
+
+
+class PresenceRegistry:
+    """
+    Tracks who is in each video call room.
+
+    Each room is stored as one cache entry mapping channel names to
+    ``{'user_id', 'username', 'joined_at', 'last_heartbeat'}``. Updates are
+    read-modify-write, so two workers touching the same room at the same
+    instant can drop one write; the dropped participant reappears on its
+    next heartbeat.
+    """
+
+    key_prefix = 'video_presence'
+
+    def __init__(self, backend=None, heartbeat_timeout=HEARTBEAT_TIMEOUT):
+        self.cache = backend or cache
+        self.heartbeat_timeout = heartbeat_timeout
+
+    def get_key(self, room):
+        return f'{self.key_prefix}:{room}'
+
+    async def _load(self, room):
+        return await self.cache.aget(self.get_key(room)) or {}
+
+    async def _store(self, room, participants):
+        key = self.get_key(room)
+        if participants:
+            # Abandoned rooms expire on their own
+            await self.cache.aset(key, participants, self.heartbeat_timeout * 4)
+        else:
+            await self.cache.adelete(key)
+
+    def _prune(self, participants, now):
+        cutoff = now - self.heartbeat_timeout
+        evicted = {
+            channel_name: entry
+            for channel_name, entry in participants.items()
+            if entry['last_heartbeat'] < cutoff
+        }
+        for channel_name in evicted:
+            del participants[channel_name]
+        return evicted
+
+    async def join(self, room, channel_name, user_id, username):
+        """Register a connection and return the room's live participants"""
+        now = time.time()
+        participants = await self._load(room)
+        self._prune(participants, now)
+        participants[channel_name] = {
+            'user_id': user_id,
+            'username': username,
+            'joined_at': now,
+            'last_heartbeat': now,
+        }
+        await self._store(room, participants)
+        return participants
+
+    async def heartbeat(self, room, channel_name, user_id, username):
+        """
+        Refresh a connection's heartbeat, re-registering it if its entry was lost.
+
+        Returns the participants evicted while doing so, keyed by channel name.
+        """
+        now = time.time()
+        participants = await self._load(room)
+        evicted = self._prune(participants, now)
+        entry = participants.setdefault(channel_name, {
+            'user_id': user_id,
+            'username': username,
+            'joined_at': now,
+        })
+        entry['last_heartbeat'] = now
+        await self._store(room, participants)
+        return evicted
+
+    async def leave(self, room, channel_name):
+        participants = await self._load(room)
+        if participants.pop(channel_name, None) is not None:
+            self._prune(participants, time.time())
+            await self._store(room, participants)
+
+    async def participants(self, room):
+        """Live participants of a room, oldest first"""
+        participants = await self._load(room)
+        if self._prune(participants, time.time()):
+            await self._store(room, participants)
+        return sorted(participants.values(), key=lambda entry: entry['joined_at'])
+
+
+presence = PresenceRegistry()
@@ -0,0 +1,74 @@
+"""
+Wire helpers for the WebRTC signaling consumer.
+
+Clients may speak plain JSON text frames (the default) or compact msgpack
+binary frames. A connection opts into binary frames either by connecting
+with ``?format=msgpack`` or simply by sending a binary frame.
+"""
+import json
+import logging
+
+from django.conf import settings
+
+try:
+    import msgpack
+except ImportError:  # msgpack ships with channels-redis, but stay optional
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+# Message types relayed between peers in a room
+RELAYED_MESSAGE_TYPES = ('offer', 'answer', 'ice-candidate', 'chat')
+
+# How long ICE candidates are held back so they can be relayed together
+ICE_BATCH_WINDOW = getattr(settings, 'VIDEO_ICE_BATCH_WINDOW', 0.025)
+
+# Upper bound on candidates coalesced into a single relay
+ICE_BATCH_MAX_SIZE = getattr(settings, 'VIDEO_ICE_BATCH_MAX_SIZE', 32)
+
+
+class FrameError(ValueError):
+    """Raised when an incoming frame cannot be decoded"""
+
+
+def binary_frames_available():
+    return msgpack is not None
+
+
+def wants_binary_frames(scope):
+    """Check the connection query string for ``format=msgpack``"""
+    query_string = scope.get('query_string', b'').decode('latin-1')
+    params = dict(
+        part.split('=', 1) for part in query_string.split('&') if '=' in part
+    )
+    return params.get('format') == 'msgpack' and binary_frames_available()
+
+
+def decode_frame(text_data=None, bytes_data=None):
+    """Decode a text (JSON) or binary (msgpack) frame into a dict"""
+    try:
+        if bytes_data is not None:
+            if msgpack is None:
+                raise FrameError('Binary frames are not supported on this server')
+            message = msgpack.unpackb(bytes_data, raw=False)
+        else:
+            message = json.loads(text_data)
+    except (ValueError, TypeError) as e:
+        raise FrameError(str(e)) from e
+    except Exception as e:  # msgpack raises its own exception hierarchy
+        raise FrameError(str(e)) from e
+
+    if not isinstance(message, dict):
+        raise FrameError('Signaling frames must be objects')
+    return message
+
+
+def encode_frame(message, binary=False):
+    """
+    Encode a message for ``AsyncWebsocketConsumer.send``.
+
+    Returns the keyword arguments to pass to ``send``.
+    """
+    if binary and msgpack is not None:
+        return {'bytes_data': msgpack.packb(message, use_bin_type=True)}
+    return {'text_data': json.dumps(message)}
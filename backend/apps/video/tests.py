@@ -0,0 +1,279 @@
+import asyncio
+from datetime import timedelta
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock, skipUnless
+
+from channels.db import database_sync_to_async
+from channels.layers import InMemoryChannelLayer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.mentors.models import MentorProfile, MentorshipSession
+
+from .consumers import VideoCallConsumer
+from .loadtest import in_process_application, with_user
+from .presence import presence
+from .signaling import binary_frames_available, msgpack
+from .routing import websocket_urlpatterns
+
+User = get_user_model()
+
+
+def connect_as(user, room, application=None, query=''):
+    application = application or URLRouter(websocket_urlpatterns)
+    communicator = WebsocketCommunicator(application, f'/ws/video-call/{room}/{query}')
+    if user is not None:
+        communicator.scope['user'] = user
+    return communicator
+
+
+def create_session(mentor_user, mentee, meeting_id=''):
+    mentor, _ = MentorProfile.objects.get_or_create(user=mentor_user, defaults={
+        'current_position': 'Engineer', 'current_company': 'Acme', 'industry': 'Software',
+        'expertise_level': 'senior', 'years_of_experience': 10, 'specializations': 'Careers',
+    })
+    start = timezone.now()
+    return MentorshipSession.objects.create(
+        mentor=mentor, mentee=mentee, session_type='video', meeting_id=meeting_id,
+        scheduled_start=start, scheduled_end=start + timedelta(hours=1),
+    )
+
+
+class VideoCallAccessTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.mentor = User.objects.create_user('mentor', 'mentor@example.com', 'password')
+        cls.mentee = User.objects.create_user('mentee', 'mentee@example.com', 'password')
+        cls.stranger = User.objects.create_user('stranger', 'stranger@example.com', 'password')
+        cls.session = create_session(cls.mentor, cls.mentee)
+
+    def setUp(self):
+        cache.clear()
+
+    async def assert_rejected(self, communicator, code):
+        connected, close_code = await communicator.connect()
+        self.assertFalse(connected)
+        self.assertEqual(close_code, code)
+
+    async def assert_accepted(self, communicator):
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        self.assertEqual((await communicator.receive_json_from())['type'], 'participants')
+        await communicator.disconnect()
+
+    async def test_anonymous_users_are_rejected(self):
+        await self.assert_rejected(connect_as(AnonymousUser(), self.session.pk), 4001)
+
+    async def test_non_participants_are_rejected(self):
+        await self.assert_rejected(connect_as(self.stranger, self.session.pk), 4003)
+
+    async def test_mentor_and_mentee_are_accepted(self):
+        await self.assert_accepted(connect_as(self.mentor, self.session.pk))
+        await self.assert_accepted(connect_as(self.mentee, self.session.pk))
+
+    async def test_access_token_in_query_string(self):
+        from core.asgi import application
+
+        token = await database_sync_to_async(AccessToken.for_user)(self.mentee)
+        await self.assert_accepted(connect_as(None, self.session.pk, application, f'?token={token}'))
+        await self.assert_rejected(connect_as(None, self.session.pk, application, '?token=invalid'), 4001)
+
+    async def test_meeting_id_wins_over_another_sessions_id(self):
+        other = await database_sync_to_async(create_session)(self.stranger, self.mentee, str(self.session.pk))
+        await self.assert_accepted(connect_as(self.stranger, self.session.pk))
+        await self.assert_rejected(connect_as(self.mentor, self.session.pk), 4003)
+        self.assertEqual(other.meeting_id, str(self.session.pk))
+
+    async def test_cached_access_follows_a_change_of_mentee(self):
+        await self.assert_accepted(connect_as(self.mentee, self.session.pk))
+
+        def change_mentee():
+            with self.captureOnCommitCallbacks(execute=True):
+                self.session.mentee = self.stranger
+                self.session.save()
+
+        await database_sync_to_async(change_mentee)()
+        await self.assert_rejected(connect_as(self.mentee, self.session.pk), 4003)
+        await self.assert_accepted(connect_as(self.stranger, self.session.pk))
+
+    async def test_cached_access_follows_a_change_of_mentor(self):
+        await self.assert_rejected(connect_as(self.stranger, self.session.pk), 4003)
+
+        def change_mentor():
+            with self.captureOnCommitCallbacks(execute=True):
+                self.session.mentor = create_session(self.stranger, self.mentee).mentor
+                self.session.save()
+
+        await database_sync_to_async(change_mentor)()
+        await self.assert_accepted(connect_as(self.stranger, self.session.pk))
+        await self.assert_rejected(connect_as(self.mentor, self.session.pk), 4003)
+
+    async def test_peer_is_evicted_after_missed_heartbeats(self):
+        mentor = connect_as(self.mentor, self.session.pk)
+        mentee = connect_as(self.mentee, self.session.pk)
+        await mentor.connect()
+        await mentor.receive_json_from()
+        await mentee.connect()
+        await mentee.receive_json_from()
+        self.assertEqual((await mentor.receive_json_from())['type'], 'user-joined')
+
+        # The mentee's worker dies without disconnecting: its heartbeats stop
+        key = presence.get_key(f'video_call_{self.session.pk}')
+        participants = await cache.aget(key)
+        for entry in participants.values():
+            if entry['user_id'] == self.mentee.pk:
+                entry['last_heartbeat'] -= presence.heartbeat_timeout + 1
+        await cache.aset(key, participants)
+
+        await mentor.send_json_to({'type': 'heartbeat'})
+        left = await mentor.receive_json_from()
+        self.assertEqual((left['type'], left['user_id']), ('user-left', self.mentee.pk))
+        remaining = await presence.participants(f'video_call_{self.session.pk}')
+        self.assertEqual([entry['user_id'] for entry in remaining], [self.mentor.pk])
+
+        await mentee.disconnect()
+        await mentor.disconnect()
+
+
+class RecordingChannelLayer(InMemoryChannelLayer):
+    """In-memory channel layer that remembers group broadcasts"""
+
+    group_sends = []
+
+    async def group_send(self, group, message):
+        self.group_sends.append(message)
+        return await super().group_send(group, message)
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': f'{__name__}.RecordingChannelLayer'}})
+class VideoCallSignalingTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        RecordingChannelLayer.group_sends = []
+        self.relayed = []
+
+    def connect(self, application, user_id, query=''):
+        user = SimpleNamespace(id=user_id, username=f'peer{user_id}')
+        return WebsocketCommunicator(with_user(application, user), f'/ws/video-call/signaling/{query}')
+
+    async def join_pair(self, application):
+        caller, callee = self.connect(application, 1), self.connect(application, 2)
+        await caller.connect()
+        await caller.receive_json_from()
+        await callee.connect()
+        await callee.receive_json_from()
+        # Once the caller has seen the callee join, it addresses it directly
+        self.assertEqual((await caller.receive_json_from())['type'], 'user-joined')
+        RecordingChannelLayer.group_sends = []
+        return caller, callee
+
+    def record_relays(self):
+        relay = VideoCallConsumer.relay
+
+        async def recording_relay(consumer, event):
+            self.relayed.append(event)
+            await relay(consumer, event)
+
+        return mock.patch.object(VideoCallConsumer, 'relay', recording_relay)
+
+    def candidate(self, number):
+        return {'type': 'ice-candidate', 'candidate': {'candidate': f'candidate:{number}', 'sdpMLineIndex': 0}}
+
+    async def test_candidates_reach_the_other_peer_as_one_batch(self):
+        caller, callee = await self.join_pair(in_process_application(ice_batch_window=0.05))
+        with self.record_relays():
+            for number in range(3):
+                await caller.send_json_to(self.candidate(number))
+            received = [await callee.receive_json_from(timeout=1) for _ in range(3)]
+
+        self.assertEqual(received, [self.candidate(number) for number in range(3)])
+        self.assertEqual([(event['type'], len(event['messages'])) for event in self.relayed], [('ice_candidates', 3)])
+        self.assertEqual(RecordingChannelLayer.group_sends, [])
+        self.assertTrue(await caller.receive_nothing())
+        await callee.disconnect()
+        await caller.disconnect()
+
+    async def test_pending_candidates_are_flushed_before_an_offer(self):
+        caller, callee = await self.join_pair(in_process_application(ice_batch_window=60))
+        offer = {'type': 'offer', 'offer': {'type': 'offer', 'sdp': 'v=0'}}
+        await caller.send_json_to(self.candidate(0))
+        await caller.send_json_to(self.candidate(1))
+        await caller.send_json_to(offer)
+
+        received = [await callee.receive_json_from(timeout=1) for _ in range(3)]
+        self.assertEqual(received, [self.candidate(0), self.candidate(1), offer])
+
+        answer = {'type': 'answer', 'answer': {'type': 'answer', 'sdp': 'v=0'}}
+        await callee.send_json_to(self.candidate(2))
+        await callee.send_json_to(answer)
+        received = [await caller.receive_json_from(timeout=1) for _ in range(2)]
+        self.assertEqual(received, [self.candidate(2), answer])
+        await callee.disconnect()
+        await caller.disconnect()
+
+    async def test_relays_fall_back_to_the_group_until_peers_are_known(self):
+        caller = self.connect(in_process_application(), 1)
+        await caller.connect()
+        await caller.receive_json_from()
+        RecordingChannelLayer.group_sends = []
+
+        offer = {'type': 'offer', 'offer': {'type': 'offer', 'sdp': 'v=0'}}
+        await caller.send_json_to(offer)
+        await asyncio.sleep(0.05)
+
+        self.assertEqual([event['type'] for event in RecordingChannelLayer.group_sends], ['signaling_message'])
+        self.assertEqual(RecordingChannelLayer.group_sends[0]['message'], offer)
+        # Its own broadcast is not echoed back
+        self.assertTrue(await caller.receive_nothing())
+        await caller.disconnect()
+
+    @skipUnless(binary_frames_available(), 'msgpack is not installed')
+    async def test_msgpack_frames_round_trip(self):
+        application = in_process_application(ice_batch_window=0)
+        caller = self.connect(application, 1, '?format=msgpack')
+        callee = self.connect(application, 2)
+        await caller.connect()
+        participants = await caller.receive_from()
+        self.assertIsInstance(participants, bytes)
+        self.assertEqual(msgpack.unpackb(participants)['type'], 'participants')
+        await callee.connect()
+        await callee.receive_json_from()
+        await caller.receive_from()
+
+        offer = {'type': 'offer', 'offer': {'type': 'offer', 'sdp': 'v=0'}}
+        await caller.send_to(bytes_data=msgpack.packb(offer))
+        self.assertEqual(await callee.receive_json_from(timeout=1), offer)
+
+        answer = {'type': 'answer', 'answer': {'type': 'answer', 'sdp': 'v=0'}}
+        await callee.send_json_to(answer)
+        self.assertEqual(msgpack.unpackb(await caller.receive_from(timeout=1)), answer)
+        await callee.disconnect()
+        await caller.disconnect()
+
+
+class LoadTestCommandTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_in_process_run_reports_latency_and_memory(self):
+        out = StringIO()
+        call_command(
+            'loadtest_video', rooms=2, peers_per_room=2, candidates=3, ice_jitter=0, hold=0,
+            trace_memory=True, stdout=out,
+        )
+        report = out.getvalue()
+
+        self.assertIn('connected:          4/4', report)
+        self.assertIn('(0 lost)', report)
+        for label in ('connect latency:', 'fan-out latency:'):
+            line = next(line for line in report.splitlines() if label in line)
+            self.assertRegex(line, r'p50=[\d.]+ms p95=[\d.]+ms p99=[\d.]+ms max=[\d.]+ms')
+        self.assertRegex(report, r'memory/connection: +-?[\d.]+ KiB traced')
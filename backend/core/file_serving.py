@@ -0,0 +1,203 @@
+"""
+Serve stored files with HTTP range support.
+
+``serve_file`` answers conditional requests (ETag / Last-Modified) with 304,
+single byte ranges (``Range``, honouring ``If-Range``) with 206, and
+everything else with a ``FileResponse``, which the WSGI server can hand to
+``sendfile``. When a fronting proxy is configured (``FILE_OFFLOAD``) the
+body is left to the proxy altogether via X-Accel-Redirect (nginx) or
+X-Sendfile (Apache, lighttpd); the proxy then deals with ranges itself.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+from .storage import blob_storage, digest_from_name
+
+# '' to stream from Django, 'x-accel-redirect' or 'x-sendfile' to offload
+FILE_OFFLOAD = getattr(settings, 'FILE_OFFLOAD', '')
+
+# nginx internal location that maps onto MEDIA_ROOT, for X-Accel-Redirect
+FILE_OFFLOAD_PREFIX = getattr(settings, 'FILE_OFFLOAD_PREFIX', '/protected-media/')
+
+STREAM_CHUNK_SIZE = 256 * 1024
+
+# One year, the conventional maximum for immutable assets
+BLOB_MAX_AGE = 365 * 24 * 60 * 60
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header, size):
+    """
+    ``(start, end)`` (inclusive) for a single byte range, or None when the
+    header is absent, malformed or asks for several ranges, in which case
+    the whole file is served.
+    """
+    match = RANGE_RE.match(header.replace(' ', '')) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the last N bytes
+        if not last:
+            return None
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiable()
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        raise RangeNotSatisfiable()
+    return start, end
+
+
+def if_range_matches(request, etag, last_modified):
+    """Whether a Range request may be honoured given its If-Range precondition"""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        # Weak ETags never satisfy If-Range; ours are strong
+        return if_range == etag
+    return parse_http_date_safe(if_range) == int(last_modified)
+
+
+def iter_file_range(file, start, length, chunk_size=STREAM_CHUNK_SIZE):
+    try:
+        file.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = file.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+def file_stat(storage, name):
+    """(size, modified timestamp) of a stored file, from one stat() where the storage is local"""
+    try:
+        stat = os.stat(storage.path(name))
+        return stat.st_size, stat.st_mtime
+    except NotImplementedError:
+        return storage.size(name), storage.get_modified_time(name).timestamp()
+
+
+def serve_file(request, storage, name, filename=None, as_attachment=True, etag=None, cache_control=None):
+    """
+    Response streaming the stored file ``name`` to the client.
+
+    ``etag`` defaults to one derived from size and modification time; pass a
+    content digest when the storage knows it. ``cache_control`` is a dict of
+    Cache-Control directives for ``patch_cache_control``.
+    """
+    filename = filename or os.path.basename(name)
+    size, modified = file_stat(storage, name)
+    etag = etag or f'"{size:x}-{int(modified * 1000):x}"'
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    def finish(response):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(modified)
+        response['Accept-Ranges'] = 'bytes'
+        if cache_control:
+            patch_cache_control(response, **cache_control)
+        return response
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(modified))
+    if not_modified is not None:
+        return finish(not_modified)
+
+    disposition = content_disposition_header(as_attachment, filename)
+
+    if FILE_OFFLOAD:
+        response = HttpResponse(content_type=content_type)
+        if FILE_OFFLOAD == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = FILE_OFFLOAD_PREFIX.rstrip('/') + '/' + quote(name)
+        else:
+            response['X-Sendfile'] = storage.path(name)
+        response['Content-Disposition'] = disposition
+        return finish(response)
+
+    byte_range = None
+    if if_range_matches(request, etag, modified):
+        try:
+            byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return finish(response)
+
+    if byte_range is None:
+        if request.method == 'HEAD':
+            response = HttpResponse(content_type=content_type)
+            response['Content-Disposition'] = disposition
+        else:
+            response = FileResponse(
+                storage.open(name, 'rb'), as_attachment=as_attachment, filename=filename, content_type=content_type
+            )
+        response['Content-Length'] = size
+        return finish(response)
+
+    start, end = byte_range
+    length = end - start + 1
+    if request.method == 'HEAD':
+        response = HttpResponse(status=206, content_type=content_type)
+    else:
+        response = StreamingHttpResponse(
+            iter_file_range(storage.open(name, 'rb'), start, length), status=206, content_type=content_type
+        )
+    response['Content-Length'] = length
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Disposition'] = disposition
+    return finish(response)
+
+
+def serve_blob(request, path):
+    """Serve a content-addressed blob; its name pins its content, so it is cacheable forever"""
+    digest = digest_from_name(path)
+    if not digest or not blob_storage.exists(path):
+        raise Http404('File not found')
+    return serve_file(
+        request,
+        blob_storage,
+        path,
+        as_attachment=False,
+        etag=f'"{digest}"',
+        cache_control={'public': True, 'max_age': BLOB_MAX_AGE, 'immutable': True},
+    )
+
+
+def serve_derivative(request, digest, width, extension):
+    """Serve a resized image derivative (rendered when its image was uploaded)"""
+    from .images import DERIVATIVE_FORMATS, DERIVATIVE_WIDTHS, derivative_name, derivative_storage
+
+    if width not in DERIVATIVE_WIDTHS or extension not in DERIVATIVE_FORMATS or not DIGEST_RE.match(digest):
+        raise Http404('File not found')
+    name = derivative_name(digest, width, extension)
+    if not derivative_storage.exists(name):
+        raise Http404('File not found')
+    return serve_file(
+        request,
+        derivative_storage,
+        name,
+        as_attachment=False,
+        etag=f'"{digest}-{width}-{extension}"',
+        cache_control={'public': True, 'max_age': BLOB_MAX_AGE, 'immutable': True},
+    )
@@ -0,0 +1,227 @@
+"""
+Responsive derivatives for uploaded images.
+
+When an image lands in content-addressed storage, a worker pool renders it
+as WebP and JPEG under ``derivatives/<digest>/<width>.<webp|jpg>``, at each
+of a few fixed widths up to the original's own (images are never upscaled).
+Files are written to a temporary name and renamed into place, so concurrent
+renders of the same image just replace each other. Once every derivative is
+in place a ``manifest.json`` listing the rendered widths is written last.
+
+Derivatives are keyed by the original's digest, so they are rendered once
+per distinct image and never go stale. Serializers expose them as srcsets
+(``ResponsiveImageField``) from the manifest; until it exists, the original
+is offered on its own. Derivatives are plain files under ``MEDIA_ROOT``, so
+whatever serves media in production serves them too.
+"""
+import functools
+import io
+import json
+import logging
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from rest_framework import serializers
+
+from .storage import blob_storage, digest_from_name
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVE_WIDTHS = (64, 160, 320, 640, 1280)
+
+# Width used for the plain ``src`` fallback
+SRC_WIDTH = 320
+
+# Extension on disk -> Pillow format name and encoder options
+DERIVATIVE_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp'}
+
+DERIVATIVE_DIRECTORY = 'derivatives'
+
+# Threads rendering derivatives in the background; 0 renders inline
+IMAGE_DERIVATIVE_WORKERS = getattr(settings, 'IMAGE_DERIVATIVE_WORKERS', 2)
+
+# Derivatives are written as-is, next to the blobs
+derivative_storage = FileSystemStorage()
+
+executor = None
+
+
+def is_image_name(name):
+    return os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+
+
+def derivative_name(digest, width, extension):
+    return f'{DERIVATIVE_DIRECTORY}/{digest}/{width}.{extension}'
+
+
+def manifest_name(digest):
+    return f'{DERIVATIVE_DIRECTORY}/{digest}/manifest.json'
+
+
+def derivative_widths(original_width):
+    """``DERIVATIVE_WIDTHS`` an image ``original_width`` pixels wide can be rendered at"""
+    return [width for width in DERIVATIVE_WIDTHS if width <= original_width]
+
+
+def write_derivative(name, data):
+    """Write ``data`` under ``name`` via a temporary file, replacing any existing file"""
+    path = derivative_storage.path(name)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    handle, temporary = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(handle, 'wb') as output:
+            output.write(data)
+        if derivative_storage.file_permissions_mode is not None:
+            os.chmod(temporary, derivative_storage.file_permissions_mode)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def render_derivative(image, width, extension):
+    """Encode ``image`` (a Pillow image) scaled down to ``width``; never upscales"""
+    from PIL import Image
+
+    pillow_format, options = DERIVATIVE_FORMATS[extension]
+    resized = image.copy()
+    if resized.mode not in ('RGB', 'RGBA', 'L'):
+        resized = resized.convert('RGBA')
+    resized.thumbnail((width, width * 10), Image.LANCZOS)
+    if pillow_format == 'JPEG' and resized.mode == 'RGBA':
+        # JPEG has no alpha; flatten onto white
+        background = Image.new('RGB', resized.size, (255, 255, 255))
+        rgba = resized.convert('RGBA')
+        background.paste(rgba, mask=rgba.split()[-1])
+        resized = background
+    output = io.BytesIO()
+    resized.save(output, pillow_format, **options)
+    return output.getvalue()
+
+
+def open_original(blob):
+    from PIL import Image, ImageOps
+
+    with blob_storage.open(blob, 'rb') as original:
+        image = Image.open(original)
+        image.load()
+    # Apply camera rotation before throwing EXIF away
+    return ImageOps.exif_transpose(image)
+
+
+def generate_derivatives(blob):
+    """Render the derivatives of ``blob`` that are missing and write its manifest; returns the number rendered"""
+    digest = digest_from_name(blob)
+    if derivative_storage.exists(manifest_name(digest)):
+        return 0
+
+    image = open_original(blob)
+    widths = derivative_widths(image.width)
+    rendered = 0
+    for width in widths:
+        for extension in DERIVATIVE_FORMATS:
+            name = derivative_name(digest, width, extension)
+            if not derivative_storage.exists(name):
+                write_derivative(name, render_derivative(image, width, extension))
+                rendered += 1
+    write_derivative(manifest_name(digest), json.dumps({'width': image.width, 'widths': widths}).encode())
+    return rendered
+
+
+@functools.lru_cache(maxsize=4096)
+def rendered_widths(digest):
+    """
+    Widths rendered for ``digest``, from its manifest. Raises FileNotFoundError
+    until the manifest is written (so a missing one isn't cached).
+    """
+    with derivative_storage.open(manifest_name(digest), 'rb') as manifest:
+        return tuple(json.load(manifest)['widths'])
+
+
+def _generate_in_background(blob):
+    try:
+        generate_derivatives(blob)
+    except Exception as e:
+        logger.error(f"Error generating image derivatives for {blob}: {str(e)}")
+
+
+def schedule_derivatives(blob):
+    """Queue derivative rendering for a newly stored image blob"""
+    global executor
+    if not IMAGE_DERIVATIVE_WORKERS:
+        _generate_in_background(blob)
+        return
+    if executor is None:
+        executor = ThreadPoolExecutor(max_workers=IMAGE_DERIVATIVE_WORKERS, thread_name_prefix='image-derivatives')
+    executor.submit(_generate_in_background, blob)
+
+
+def delete_derivatives(blob):
+    digest = digest_from_name(blob)
+    if not digest:
+        return
+    directory = f'{DERIVATIVE_DIRECTORY}/{digest}'
+    try:
+        _, files = derivative_storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for filename in files:
+        derivative_storage.delete(f'{directory}/{filename}')
+    rendered_widths.cache_clear()
+
+
+class ResponsiveImageField(serializers.Field):
+    """
+    Read-only srcset description of an image stored in content-addressed
+    storage::
+
+        {"src": ".../320.jpg", "srcset": ".../64.webp 64w, ...", "fallback_srcset": ".../64.jpg 64w, ..."}
+
+    Srcsets stop at the original's width. Images stored elsewhere (uploaded
+    before content addressing), images whose derivatives aren't rendered yet
+    and images narrower than every derivative width get their original URL as
+    ``src`` and empty srcsets.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        request = self.context.get('request')
+
+        def absolute(url):
+            return request.build_absolute_uri(url) if request is not None else url
+
+        digest = digest_from_name(value.name)
+        widths = ()
+        if digest and is_image_name(value.name):
+            try:
+                widths = rendered_widths(digest)
+            except FileNotFoundError:
+                pass
+        if not widths:
+            return {'src': absolute(value.url), 'srcset': '', 'fallback_srcset': ''}
+
+        def url(width, extension):
+            return absolute(derivative_storage.url(derivative_name(digest, width, extension)))
+
+        def srcset(extension):
+            return ', '.join(f'{url(width, extension)} {width}w' for width in widths)
+
+        return {
+            'src': url(min(SRC_WIDTH, widths[-1]), 'jpg'),
+            'srcset': srcset('webp'),
+            'fallback_srcset': srcset('jpg'),
+        }
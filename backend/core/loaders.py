@@ -0,0 +1,93 @@
+"""
+Per-request batch loading for viewer-specific serializer fields.
+
+Fields such as "is bookmarked by me" or "my rating" depend on the
+requesting user and used to cost one query per serialized object. A
+``ViewerLoader`` declared on the serializer resolves them for a whole page
+instead: ``ViewerBatchListSerializer`` (set as the serializer's
+``list_serializer_class``) queues the ids of every object on the page, and
+the first lookup fetches all queued ids with a single ``IN`` query. Results
+live in the serializer context, so they are shared by every serializer
+rendering the same response and discarded with it.
+
+    class ResourceSerializer(serializers.ModelSerializer):
+        bookmarked_loader = ViewerLoader(
+            lambda user, ids: dict.fromkeys(
+                ResourceBookmark.objects.filter(user=user, resource_id__in=ids)
+                .values_list('resource_id', flat=True),
+                True,
+            ),
+            default=False,
+        )
+
+        class Meta:
+            list_serializer_class = ViewerBatchListSerializer
+
+        def get_is_bookmarked(self, obj):
+            return self.bookmarked_loader.load(self, obj)
+"""
+from django.db.models.manager import BaseManager
+from rest_framework import serializers
+
+
+class ViewerLoader:
+    """
+    One viewer-specific value for many objects.
+
+    ``fetch(user, ids)`` returns ``{id: value}`` for the given object ids;
+    ids it leaves out get ``default``, as do anonymous viewers.
+    """
+
+    def __init__(self, fetch, default=None):
+        self.fetch = fetch
+        self.default = default
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = f'{owner.__module__}.{owner.__qualname__}.{name}'
+
+    def state(self, context):
+        loaders = context.setdefault('viewer_loaders', {})
+        return loaders.setdefault(self.name, {'pending': set(), 'results': {}})
+
+    def prime(self, context, ids):
+        """Queue ``ids`` so they are fetched with the next lookup"""
+        state = self.state(context)
+        state['pending'].update(pk for pk in ids if pk not in state['results'])
+
+    def load(self, serializer, obj):
+        request = serializer.context.get('request')
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_authenticated:
+            return self.default
+
+        state = self.state(serializer.context)
+        if obj.pk not in state['results']:
+            ids = state['pending'] | {obj.pk}
+            found = self.fetch(user, ids)
+            for pk in ids:
+                state['results'][pk] = found.get(pk, self.default)
+            state['pending'].clear()
+        return state['results'][obj.pk]
+
+
+def viewer_loaders(serializer_class):
+    for klass in serializer_class.__mro__:
+        for value in vars(klass).values():
+            if isinstance(value, ViewerLoader):
+                yield value
+
+
+class ViewerBatchListSerializer(serializers.ListSerializer):
+    """Primes the child serializer's viewer loaders with every object on the page"""
+
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, BaseManager) else data)
+        batch = self.batch_items(items)
+        for loader in viewer_loaders(type(self.child)):
+            loader.prime(self.context, [item.pk for item in batch])
+        return super().to_representation(items)
+
+    def batch_items(self, items):
+        """Objects to prime for; subclasses can add nested objects rendered by the same serializer"""
+        return items
@@ -135,6 +135,15 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Let the fronting proxy send downloaded files: '' (stream from Django),
+# 'x-accel-redirect' (nginx, internal location FILE_OFFLOAD_PREFIX -> MEDIA_ROOT)
+# or 'x-sendfile' (Apache/lighttpd)
+FILE_OFFLOAD = config('FILE_OFFLOAD', default='')
+FILE_OFFLOAD_PREFIX = config('FILE_OFFLOAD_PREFIX', default='/protected-media/')
+
+# Threads rendering resized image derivatives after upload (0 renders inline)
+IMAGE_DERIVATIVE_WORKERS = config('IMAGE_DERIVATIVE_WORKERS', default=2, cast=int)
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -255,4 +264,40 @@ CHANNEL_LAYERS = {
     'default': {
         'BACKEND': 'channels.layers.InMemoryChannelLayer',
     }
-}
\ No newline at end of file
+}
+# Video call signaling: ICE candidates are coalesced for this many seconds
+# before being relayed to the other peers (0 relays them immediately)
+VIDEO_ICE_BATCH_WINDOW = config('VIDEO_ICE_BATCH_WINDOW', default=0.025, cast=float)
+VIDEO_ICE_BATCH_MAX_SIZE = config('VIDEO_ICE_BATCH_MAX_SIZE', default=32, cast=int)
+
+# Video call presence and authorization
+VIDEO_PRESENCE_HEARTBEAT_INTERVAL = config('VIDEO_PRESENCE_HEARTBEAT_INTERVAL', default=15, cast=int)
+VIDEO_PRESENCE_HEARTBEAT_TIMEOUT = config('VIDEO_PRESENCE_HEARTBEAT_TIMEOUT', default=45, cast=int)
+VIDEO_ACCESS_CACHE_TIMEOUT = config('VIDEO_ACCESS_CACHE_TIMEOUT', default=300, cast=int)
+VIDEO_ACCESS_DENIED_CACHE_TIMEOUT = config('VIDEO_ACCESS_DENIED_CACHE_TIMEOUT', default=30, cast=int)
+
+# Buffered view tracking (discussions, opportunities, resources)
+VIEW_TRACKING_FLUSH_INTERVAL = config('VIEW_TRACKING_FLUSH_INTERVAL', default=10, cast=int)
+VIEW_TRACKING_MAX_BUFFER = config('VIEW_TRACKING_MAX_BUFFER', default=5000, cast=int)
+VIEW_TRACKING_DEDUP_WINDOW = config('VIEW_TRACKING_DEDUP_WINDOW', default=1800, cast=int)
+
+# Forum "hot" ranking: score decay exponent and how far back the decay sweep looks
+FORUM_HOT_GRAVITY = config('FORUM_HOT_GRAVITY', default=1.5, cast=float)
+FORUM_HOT_DECAY_HORIZON_DAYS = config('FORUM_HOT_DECAY_HORIZON_DAYS', default=30, cast=int)
+
+# Resource popularity/trending windows over the daily activity rollups
+RESOURCE_POPULAR_WINDOW_DAYS = config('RESOURCE_POPULAR_WINDOW_DAYS', default=30, cast=int)
+RESOURCE_TRENDING_WINDOW_DAYS = config('RESOURCE_TRENDING_WINDOW_DAYS', default=7, cast=int)
+
+# PostgreSQL text search configuration (language) for resource search
+RESOURCE_SEARCH_CONFIG = config('RESOURCE_SEARCH_CONFIG', default='english')
+
+# Seconds before a process rebuilds its in-memory points leaderboard to pick up
+# changes made by other processes
+LEADERBOARD_REFRESH_INTERVAL = config('LEADERBOARD_REFRESH_INTERVAL', default=300, cast=int)
+
+# Seconds before a process reloads its badge rules to pick up badges edited elsewhere
+BADGE_RULES_REFRESH_INTERVAL = config('BADGE_RULES_REFRESH_INTERVAL', default=300, cast=int)
+
+# Seconds before a process reloads its cached level table to pick up levels edited elsewhere
+LEVEL_TABLE_REFRESH_INTERVAL = config('LEVEL_TABLE_REFRESH_INTERVAL', default=300, cast=int)
@@ -0,0 +1,167 @@
+"""
+Content-addressed storage for uploaded media.
+
+Every upload is stored as ``<upload_to>/blobs/<ab>/<sha256><ext>``, so
+identical files uploaded to the same field (the same company logo, the same
+template PDF) are kept once no matter how many rows point at them. Blobs are
+written to a temporary file and renamed into place, so concurrent uploads of
+the same content end up under the same name. Since a blob's content never
+changes under its name, it is served with far-future immutable cache
+headers. New image blobs get resized derivatives rendered in the background
+(see ``core.images``).
+
+Blobs are reference counted by the rows that point at them: ``delete()``
+(called by django_cleanup when a row is deleted or its file replaced) only
+removes the blob once no field using this storage references it any more.
+"""
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+import uuid
+
+from django.apps import apps
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.utils import validate_file_name
+from django.db import models
+from django.utils.deconstruct import deconstructible
+
+BLOB_DIRECTORY = 'blobs'
+
+BLOB_NAME_RE = re.compile(rf'^(?:.+/)?{BLOB_DIRECTORY}/[0-9a-f]{{2}}/([0-9a-f]{{64}})(?:\.[^/]*)?$')
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def content_digest(content):
+    """SHA-256 of a Django File, leaving it rewound"""
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def blob_name(digest, original_name):
+    """Blob name for content ``digest`` uploaded as ``original_name``, kept under its upload_to directory"""
+    directory, filename = posixpath.split(original_name)
+    extension = posixpath.splitext(filename)[1].lower()
+    prefix = f'{directory}/' if directory else ''
+    return f'{prefix}{BLOB_DIRECTORY}/{digest[:2]}/{digest}{extension}'
+
+
+def digest_from_name(name):
+    """The content digest of a blob name, or None for files stored elsewhere"""
+    match = BLOB_NAME_RE.match(name or '')
+    return match.group(1) if match else None
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        validate_file_name(name, allow_relative_path=True)
+
+        name = self.fit_name(blob_name(content_digest(content), name), max_length)
+        if not self.exists(name):
+            name = self._save(name, content)
+            self.blob_created(name)
+        return name
+
+    def fit_name(self, name, max_length):
+        """Drop the extension if ``name`` is too long for the column; it is never needed to find the blob"""
+        if max_length is None or len(name) <= max_length:
+            return name
+        name = posixpath.splitext(name)[0]
+        if len(name) > max_length:
+            raise SuspiciousFileOperation(
+                'Storage can not find an available filename for "%s". '
+                'Please make sure that the corresponding file field '
+                'allows sufficient "max_length".' % name
+            )
+        return name
+
+    def _save(self, name, content):
+        """Write via a temporary file renamed into place; a concurrent save of the same blob just replaces it"""
+        path = self.path(name)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        handle, temporary = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(handle, 'wb') as file:
+                for chunk in content.chunks():
+                    file.write(chunk)
+            os.chmod(temporary, self.file_permissions_mode or 0o644)
+            os.replace(temporary, path)
+        except BaseException:
+            os.remove(temporary)
+            raise
+        return name
+
+    def delete(self, name):
+        """
+        Remove an unreferenced blob.
+
+        The blob is moved aside before references are counted again, and put
+        back if a row picked it up meanwhile. A save that found the blob in
+        place but whose row is not yet committed by the second count can
+        still lose it; re-uploading the file writes the blob again.
+        """
+        if not name or self.references(name):
+            return
+        path = self.path(name)
+        aside = f'{path}.deleting-{uuid.uuid4().hex}'
+        try:
+            os.rename(path, aside)
+        except FileNotFoundError:
+            return
+        if self.references(name):
+            os.replace(aside, path)
+            return
+        os.remove(aside)
+        self.blob_deleted(name)
+
+    def blob_created(self, name):
+        from .images import is_image_name, schedule_derivatives
+
+        if is_image_name(name):
+            schedule_derivatives(name)
+
+    def blob_deleted(self, name):
+        from .images import delete_derivatives
+
+        # Derivatives are keyed by digest, so the same content under another upload_to may still use them
+        digest = digest_from_name(name)
+        if digest and not any(
+            model._default_manager.filter(**{f'{field.name}__contains': digest}).exists()
+            for model, field in self.referencing_fields()
+        ):
+            delete_derivatives(name)
+
+    def references(self, name):
+        """Number of rows, across every field stored here, that point at ``name``"""
+        return sum(
+            model._default_manager.filter(**{field.name: name}).count()
+            for model, field in self.referencing_fields()
+        )
+
+    def referencing_fields(self):
+        for model in apps.get_models():
+            for field in model._meta.concrete_fields:
+                if isinstance(field, models.FileField) and isinstance(field.storage, ContentAddressedStorage):
+                    yield model, field
+
+
+blob_storage = ContentAddressedStorage()
+
+
+def get_blob_storage():
+    """Storage callable for FileField(storage=...), so migrations don't serialize the instance"""
+    return blob_storage
@@ -2,10 +2,12 @@
 URL configuration for beBrivus project.
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from core.file_serving import serve_blob, serve_derivative
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     
@@ -24,6 +26,18 @@ urlpatterns = [
     
     # Admin API endpoints
     path('api/admin/', include('apps.accounts.admin_urls')),
+    
+    # Content-addressed uploads, served with immutable cache headers
+    re_path(
+        rf"^{settings.MEDIA_URL.strip('/')}/(?P<path>(?:.+/)?blobs/[0-9a-f]{{2}}/[0-9a-f]{{64}}(?:\.[^/]*)?)$",
+        serve_blob,
+        name='media-blob',
+    ),
+    path(
+        f"{settings.MEDIA_URL.strip('/')}/derivatives/<str:digest>/<int:width>.<str:extension>",
+        serve_derivative,
+        name='media-derivative',
+    ),
 ]
 
 # Serve media files in development
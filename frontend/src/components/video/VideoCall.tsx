@@ -79,7 +79,9 @@ const VideoCall: React.FC<VideoCallProps> = ({
   const connectWebSocket = useCallback(() => {
     // Replace with your WebSocket URL
     const wsProtocol = window.location.protocol === "https:" ? "wss:" : "ws:";
-    const wsUrl = `${wsProtocol}//bebrivus.nexventures.net/ws/video-call/${sessionId}/`;
+    const token = localStorage.getItem("access_token");
+    const query = token ? `?token=${encodeURIComponent(token)}` : "";
+    const wsUrl = `${wsProtocol}//bebrivus.nexventures.net/ws/video-call/${sessionId}/${query}`;
 
     socketRef.current = new WebSocket(wsUrl);
 